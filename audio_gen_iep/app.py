@@ -3,11 +3,10 @@ import os
 from dotenv import load_dotenv
 from pathlib import Path
 from openai import OpenAI
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
 from prometheus_client import start_http_server, Counter, generate_latest, Histogram
 import threading
 from flask_cors import CORS
+from openai_limiter import RateLimiter, estimate_tokens
 
 SYNTH_CALLS = Counter(
     'gpt_iep_synthesize_calls_total',
@@ -33,7 +32,10 @@ CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+limiter = RateLimiter.from_env()
+
+SPEECH_MODEL = "gpt-4o-mini-tts"
 
 @app.route('/synthesize', methods=['POST'])
 def synthesize():
@@ -57,14 +59,18 @@ def synthesize():
                 "You will be addressing students, so you must be both fun and academic."
             )
 
-            with client.audio.speech.with_streaming_response.create(
-                model="gpt-4o-mini-tts",
-                voice="onyx",
-                input=text,
-                instructions=instructions,
-                speed=1.25
-            ) as response:
-                response.stream_to_file(speech_file_path)
+            def send():
+                with client.audio.speech.with_streaming_response.create(
+                    model=SPEECH_MODEL,
+                    voice="onyx",
+                    input=text,
+                    instructions=instructions,
+                    speed=1.25
+                ) as response:
+                    response.stream_to_file(speech_file_path)
+                return response
+
+            limiter.call(SPEECH_MODEL, send, tokens=estimate_tokens(text, instructions))
 
             return send_file(
                 speech_file_path,
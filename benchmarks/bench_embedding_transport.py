@@ -0,0 +1,70 @@
+"""
+Payload size and serialization cost of the embeddings IEP response formats
+(JSON float lists, base64 float32 in JSON, raw float32), from the IEP building
+the response to the EEP holding a NumPy matrix.
+
+Usage:
+    python benchmarks/bench_embedding_transport.py [--batches 1 64 512] [--dim 3072] [--repeat 20]
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+import requests
+from flask import Flask
+
+from paths import add_import_paths
+add_import_paths("embeddings_iep", "eep")
+
+from transport import embeddings_response
+from tools.embeddings_client import decode_embeddings
+
+FORMATS = ["json", "base64", "binary"]
+
+
+def to_client_response(flask_response):
+    response = requests.Response()
+    response.status_code = flask_response.status_code
+    response._content = flask_response.get_data()
+    response.headers.update(dict(flask_response.headers))
+    return response
+
+
+def median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 64, 512])
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    space = {"model": "text-embedding-3-large", "dimensions": args.dim}
+    print(f"{'format':<8} {'texts':>6} {'body KB':>10} {'encode ms':>10} {'decode ms':>10}")
+    with app.app_context():
+        for batch in args.batches:
+            # What the IEP holds after an OpenAI call: Python float lists
+            embeddings = np.random.default_rng(batch).standard_normal((batch, args.dim), dtype=np.float32).tolist()
+            for response_format in FORMATS:
+                encode_ms, flask_response = median_ms(
+                    lambda: embeddings_response(embeddings, space, response_format), args.repeat)
+                response = to_client_response(flask_response)
+                # A fresh Response per run, so that requests' cached JSON is not reused
+                decode_ms, matrix = median_ms(
+                    lambda: decode_embeddings(to_client_response(flask_response), "embeddings"), args.repeat)
+                assert matrix.shape == (batch, args.dim)
+                print(f"{response_format:<8} {batch:>6} {len(response.content) / 1024:>10.1f} "
+                      f"{encode_ms:>10.2f} {decode_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
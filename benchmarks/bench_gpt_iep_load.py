@@ -0,0 +1,189 @@
+"""
+Load test of the GPT IEP against a local OpenAI stub that answers chat completions
+after a fixed delay. Compares the async service (pooled httpx client, one process)
+with the previous design, a threaded Flask server making one requests.post per call
+without a session, at the same concurrency.
+
+The stub speaks plain HTTP, so the TLS handshakes the pool saves against the real
+API are not part of the numbers; they only add to the gap.
+
+Usage:
+    python benchmarks/bench_gpt_iep_load.py [--requests 2000] [--concurrency 50 200 400] [--latency 0.5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from paths import ROOT
+
+STUB_PORT = 5990
+LEGACY_PORT = 5991
+IEP_PORT = 5002
+COMPLETION = {
+    "choices": [{"message": {"role": "assistant", "content": "Paris is the capital of France."}}],
+    "usage": {"prompt_tokens": 20, "completion_tokens": 8, "total_tokens": 28},
+}
+PROMPT = {"system_message": "Answer in one sentence.", "context": "What is the capital of France?"}
+
+
+def serve_stub(latency):
+    from fastapi import FastAPI
+    import uvicorn
+
+    stub = FastAPI()
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions():
+        await asyncio.sleep(latency)
+        return COMPLETION
+
+    uvicorn.run(stub, host="127.0.0.1", port=STUB_PORT, log_level="warning", backlog=4096)
+
+
+def serve_legacy():
+    """The GPT IEP's /get_response as it was before the async rewrite."""
+    import logging
+    import requests
+    from flask import Flask, request, jsonify
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    legacy = Flask(__name__)
+
+    @legacy.route("/get_response", methods=["POST"])
+    def get_response():
+        data = request.get_json()
+        response = requests.post(
+            f"http://127.0.0.1:{STUB_PORT}/v1/chat/completions",
+            headers={"Content-Type": "application/json", "Authorization": "Bearer sk-benchmark"},
+            json={"model": "gpt-4o", "messages": [{"role": "system", "content": data["system_message"]},
+                                                  {"role": "user", "content": data["context"]}]},
+        )
+        response.raise_for_status()
+        return jsonify({"response": response.json()["choices"][0]["message"]["content"]})
+
+    legacy.run(host="127.0.0.1", port=LEGACY_PORT)
+
+
+def start(args, port, cwd=ROOT, env=None):
+    process = subprocess.Popen(args, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(args)} exited with status {process.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.terminate()
+    raise TimeoutError(f"{' '.join(args)} did not listen on port {port}")
+
+
+async def post(connection, port, body):
+    """POST `body` to /get_response over a keep-alive connection; returns (status, connection)."""
+    if connection is None:
+        connection = await asyncio.open_connection("127.0.0.1", port)
+    reader, writer = connection
+    writer.write(f"POST /get_response HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length, close = 0, False
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+        elif name.lower() == "connection":
+            close = value.strip().lower() == "close"
+    await reader.readexactly(length)
+    if close:
+        writer.close()
+        connection = None
+    return status, connection
+
+
+async def load(port, total, concurrency):
+    """
+    Send `total` requests, `concurrency` at a time; returns (seconds, latencies, errors).
+
+    A minimal HTTP/1.1 client keeps the load generator cheap: on a small machine it
+    shares the CPU with the service and the stub.
+    """
+    latencies, errors = [], 0
+    queue = iter(range(total))
+    body = json.dumps(PROMPT).encode()
+
+    async def worker():
+        nonlocal errors
+        connection = None
+        for _ in queue:
+            started = time.perf_counter()
+            try:
+                status, connection = await post(connection, port, body)
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                status, connection = None, None
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+        if connection is not None:
+            connection[1].close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 400])
+    parser.add_argument("--latency", type=float, default=0.5, help="stub seconds per completion")
+    parser.add_argument("--serve", choices=["stub", "legacy"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve == "stub":
+        serve_stub(args.latency)
+        return
+    if args.serve == "legacy":
+        serve_legacy()
+        return
+
+    env = {**os.environ, "OPENAI_API_KEY": "sk-benchmark", "PYTHONPATH": ROOT,
+           "OPENAI_BASE_URL": f"http://127.0.0.1:{STUB_PORT}/v1"}
+    targets = {
+        "flask + requests": ([sys.executable, __file__, "--serve", "legacy"], LEGACY_PORT, ROOT),
+        "async + pool": ([sys.executable, "app.py"], IEP_PORT, os.path.join(ROOT, "gpt_iep")),
+    }
+
+    stub = start([sys.executable, __file__, "--serve", "stub", "--latency", str(args.latency)], STUB_PORT)
+    try:
+        print(f"stub latency {args.latency}s, {args.requests} requests per run")
+        print(f"{'service':<18} {'concurrency':>11} {'req/s':>8} {'p50 s':>7} {'p95 s':>7} {'errors':>7}")
+        for name, (command, port, cwd) in targets.items():
+            server = start(command, port, cwd, env)
+            try:
+                for concurrency in args.concurrency:
+                    seconds, latencies, errors = asyncio.run(
+                        load(port, args.requests, concurrency))
+                    p50 = statistics.median(latencies) if latencies else float("nan")
+                    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else float("nan")
+                    print(f"{name:<18} {concurrency:>11} {len(latencies) / seconds:>8.1f} "
+                          f"{p50:>7.3f} {p95:>7.3f} {errors:>7}", flush=True)
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Cold-start cost of each IEP: the time to import its app module, and the time from
+launching the service to its first successful response (for the SBERT service,
+to /ready, i.e. model loaded and warmed up).
+
+The services listen on their usual ports, which must be free.
+
+Usage:
+    python benchmarks/bench_iep_startup.py [--runs 3] [--only embeddings gpt ...]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+from paths import ROOT
+
+# name -> (directory, module, port, probe path)
+SERVICES = {
+    "embeddings": ("embeddings_iep", "app", 5001, "/metrics"),
+    "gpt": ("gpt_iep", "app", 5002, "/metrics"),
+    "audio_gen": ("audio_gen_iep", "app", 5003, "/metrics"),
+    "course_creator": ("course_creator", "app", 5004, "/metrics"),
+    "sbert": ("embeddings_iep", "sbert", 3001, "/ready"),
+}
+STARTUP_TIMEOUT = 300
+
+
+def service_env():
+    # The services import the shared packages at the repository root
+    pythonpath = os.pathsep.join(filter(None, [ROOT, os.getenv("PYTHONPATH")]))
+    return {**os.environ, "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "sk-benchmark"), "PYTHONPATH": pythonpath}
+
+
+def import_seconds(directory, module):
+    code = f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=os.path.join(ROOT, directory),
+                            env=service_env(), capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def first_response_seconds(directory, module, port, path):
+    """Seconds until `path` first answers 200, and until the port first answers at all."""
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, f"{module}.py"], cwd=os.path.join(ROOT, directory),
+                               env=service_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    listening = None
+    try:
+        while time.perf_counter() - started < STARTUP_TIMEOUT:
+            if process.poll() is not None:
+                raise RuntimeError(f"{directory}/{module}.py exited with status {process.returncode}")
+            try:
+                response = requests.get(f"http://127.0.0.1:{port}{path}", timeout=1)
+            except requests.ConnectionError:
+                time.sleep(0.02)
+                continue
+            listening = listening or time.perf_counter() - started
+            if response.status_code == 200:
+                return time.perf_counter() - started, listening
+            if response.status_code == 500:
+                raise RuntimeError(f"{directory}/{module}.py failed to start: {response.text.strip()}")
+            time.sleep(0.02)
+        raise TimeoutError(f"{directory}/{module}.py did not answer within {STARTUP_TIMEOUT}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=list(SERVICES))
+    args = parser.parse_args()
+
+    print(f"{'service':<15} {'import s':>9} {'listening s':>12} {'first 200 s':>12}")
+    for name in args.only or SERVICES:
+        directory, module, port, path = SERVICES[name]
+        try:
+            imports = [import_seconds(directory, module) for _ in range(args.runs)]
+            starts = [first_response_seconds(directory, module, port, path) for _ in range(args.runs)]
+        except (subprocess.CalledProcessError, RuntimeError, TimeoutError) as e:
+            print(f"{name:<15} failed: {e}", flush=True)
+            continue
+        print(f"{name:<15} {statistics.median(imports):>9.2f} "
+              f"{statistics.median(s[1] for s in starts):>12.2f} {statistics.median(s[0] for s in starts):>12.2f}",
+              flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compare serial and process-pool PDF text extraction in FileProcessorService.
+
+Usage:
+    python benchmarks/bench_pdf_extraction.py [--pdf path/to/file.pdf | --pages 300] [--workers 4]
+"""
+import argparse
+import os
+import statistics
+import time
+
+from paths import add_import_paths
+add_import_paths("eep")
+
+from benchmarks.synthetic import make_text_pdf
+from tools.file_processor_service import FileProcessorService
+
+
+def run(source, workers, pages_per_task, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        pages = FileProcessorService.extract_pdf_pages(source, workers=workers, pages_per_task=pages_per_task)
+        timings.append(time.perf_counter() - started)
+    return min(timings), pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pdf", help="PDF to extract (default: a synthetic PDF)")
+    parser.add_argument("--pages", type=int, default=300, help="Pages of the synthetic PDF")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    source = args.pdf or make_text_pdf(args.pages)
+
+    # Warm the pool so process start-up is not counted
+    FileProcessorService.extract_pdf_pages(source, workers=args.workers, pages_per_task=args.pages_per_task)
+
+    serial, pages = run(source, 1, args.pages_per_task, args.repeats)
+    parallel, _ = run(source, args.workers, args.pages_per_task, args.repeats)
+
+    page_seconds = [page.seconds for page in pages]
+    print(f"pages:                {len(pages)}")
+    print(f"characters:           {sum(len(page.text) for page in pages)}")
+    print(f"per-page mean / p95:  {statistics.mean(page_seconds) * 1000:.2f} ms / "
+          f"{sorted(page_seconds)[int(len(page_seconds) * 0.95) - 1] * 1000:.2f} ms")
+    print(f"serial:               {serial:.3f} s")
+    print(f"parallel ({args.workers} workers): {parallel:.3f} s")
+    print(f"speed-up:             {serial / parallel:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
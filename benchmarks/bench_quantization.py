@@ -0,0 +1,92 @@
+"""
+Recall, latency and storage of the NumPy vector store's embedding formats
+(float32, float16, int8, with and without full-precision rescoring) on a
+synthetic clustered corpus.
+
+Usage:
+    python benchmarks/bench_quantization.py [--size 20000] [--dim 3072] [--queries 100] [-k 10]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from paths import add_import_paths
+add_import_paths("eep")
+
+from database.numpy_store import NumpyVectorStore
+
+CONFIGS = [
+    ("float32", False),
+    ("float16", False),
+    ("float16", True),
+    ("int8", False),
+    ("int8", True),
+]
+
+
+def make_corpus(size, dim, queries, clusters=200, seed=0):
+    """Unit vectors around random topic centres, like chunks of related notes."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim), dtype=np.float32)
+    corpus = centres[rng.integers(clusters, size=size)] + 0.6 * rng.standard_normal((size, dim), dtype=np.float32)
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+    picks = corpus[rng.integers(size, size=queries)]
+    query_vectors = picks + 3 / np.sqrt(dim) * rng.standard_normal((queries, dim), dtype=np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return corpus, query_vectors
+
+
+def exact_top_k(corpus, queries, k):
+    distances = (corpus ** 2).sum(axis=1)[None, :] - 2 * queries @ corpus.T
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    corpus, queries = make_corpus(args.size, args.dim, args.queries)
+    truth = exact_top_k(corpus, queries, args.k)
+    ids = [f"doc-0-{i}" for i in range(args.size)]
+
+    directory = tempfile.mkdtemp()
+    try:
+        print(f"corpus: {args.size} x {args.dim}, {args.queries} queries, recall@{args.k}")
+        print(f"{'format':<18} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'matrix MB':>10} {'on disk MB':>11}")
+        for dtype, rescore in CONFIGS:
+            store = NumpyVectorStore(os.path.join(directory, f"{dtype}-{rescore}"), dtype=dtype, rescore=rescore)
+            collection = store.get_or_create_collection(name="bench")
+            for start in range(0, args.size, 1000):
+                collection.add(ids=ids[start:start + 1000], embeddings=corpus[start:start + 1000])
+
+            latencies, hits = [], 0
+            for query, expected in zip(queries, truth):
+                started = time.perf_counter()
+                result = collection.query(query_embeddings=[query], n_results=args.k, include=["distances"])
+                latencies.append(time.perf_counter() - started)
+                found = {int(chunk_id.rsplit("-", 1)[1]) for chunk_id in result["ids"][0]}
+                hits += len(found & set(expected.tolist()))
+
+            latencies.sort()
+            # The scanned matrix is what has to stay in memory; the float32 sidecar is only sampled
+            scanned = args.size * args.dim * np.dtype(dtype).itemsize + (args.size * 4 if dtype == "int8" else 0)
+            label = dtype + (" + rescore" if rescore else "")
+            print(f"{label:<18} {hits / truth.size:>7.3f} {statistics.median(latencies) * 1000:>8.2f} "
+                  f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:>8.2f} {scanned / 2**20:>10.1f} "
+                  f"{collection.storage_bytes() / 2**20:>11.1f}")
+            store.delete_collection("bench")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Compare the SBERT service's backends on CPU: PyTorch SentenceTransformer, and
+ONNX Runtime with the float32 and int8 exports (run embeddings_iep/export_onnx.py
+--quantize first). Each backend runs in its own process so that resident memory
+is measured separately.
+
+Usage:
+    python benchmarks/bench_sbert_backends.py [--texts 512] [--batch-size 32] [--threads 0]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from paths import ROOT, add_import_paths
+add_import_paths("embeddings_iep")
+
+MODEL_DIR = os.path.join(ROOT, "embeddings_iep", "model", "all-MiniLM-L6-v2")
+BACKENDS = {
+    "torch": None,
+    "onnx float32": os.path.join(MODEL_DIR, "onnx", "model.onnx"),
+    "onnx int8": os.path.join(MODEL_DIR, "onnx", "model_int8.onnx"),
+}
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def load(backend, threads):
+    if BACKENDS[backend] is None:
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            torch.set_num_threads(threads)
+        return SentenceTransformer(MODEL_DIR)
+    from onnx_encoder import OnnxSentenceEncoder
+    return OnnxSentenceEncoder(MODEL_DIR, BACKENDS[backend], intra_op_threads=threads)
+
+
+def measure(backend, args):
+    """Runs in the child process; prints one JSON line of results."""
+    from benchmarks.synthetic import make_text
+
+    texts = [make_text(8 + (i * 37) % 120, seed=i) for i in range(args.texts)]
+    before = rss_mb()
+    started = time.perf_counter()
+    model = load(backend, args.threads)
+    load_seconds = time.perf_counter() - started
+    model.encode(texts[:args.batch_size], batch_size=args.batch_size)  # warm-up
+
+    started = time.perf_counter()
+    embeddings = model.encode(texts, batch_size=args.batch_size)
+    throughput = len(texts) / (time.perf_counter() - started)
+
+    latencies = []
+    for text in texts[:100]:
+        started = time.perf_counter()
+        model.encode(text)
+        latencies.append(time.perf_counter() - started)
+
+    print(json.dumps({
+        "load_s": load_seconds,
+        "texts_per_s": throughput,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "rss_mb": rss_mb() - before,
+        "embeddings": [list(map(float, row)) for row in embeddings[:16]],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads (0: library default)")
+    parser.add_argument("--child", choices=list(BACKENDS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args.child, args)
+        return
+
+    import numpy as np
+
+    results = {}
+    for backend, path in BACKENDS.items():
+        if path is not None and not os.path.exists(path):
+            print(f"skipping {backend}: {path} not found")
+            continue
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", backend, "--texts", str(args.texts),
+             "--batch-size", str(args.batch_size), "--threads", str(args.threads)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        results[backend] = json.loads(output.strip().splitlines()[-1])
+
+    reference = np.array(results["torch"]["embeddings"]) if "torch" in results else None
+    print(f"{'backend':<14} {'load s':>7} {'texts/s':>9} {'p50 ms':>8} {'RSS MB':>8} {'min cos vs torch':>17}")
+    for backend, result in results.items():
+        agreement = ""
+        if reference is not None:
+            embeddings = np.array(result["embeddings"])
+            cosines = (embeddings * reference).sum(axis=1) / (
+                np.linalg.norm(embeddings, axis=1) * np.linalg.norm(reference, axis=1))
+            agreement = f"{cosines.min():.5f}"
+        print(f"{backend:<14} {result['load_s']:>7.2f} {result['texts_per_s']:>9.1f} {result['p50_ms']:>8.2f} "
+              f"{result['rss_mb']:>8.1f} {agreement:>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Throughput and latency of the SBERT service's encoding under concurrent load:
+one model.encode per request (the previous behaviour) against the MicroBatcher.
+
+Needs sentence-transformers and the model weights under embeddings_iep/model.
+
+Usage:
+    python benchmarks/bench_sbert_batching.py [--clients 1 8 32] [--requests 40] [--wait-ms 5] [--max-batch 64]
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+
+from paths import ROOT, add_import_paths
+add_import_paths("embeddings_iep")
+
+from sentence_transformers import SentenceTransformer
+
+from benchmarks.synthetic import make_text
+from micro_batcher import MicroBatcher
+
+MODEL_PATH = os.path.join(ROOT, "embeddings_iep", "model", "all-MiniLM-L6-v2")
+
+
+def run_load(encode_one, clients, requests_per_client, texts):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(offset):
+        for i in range(requests_per_client):
+            started = time.perf_counter()
+            encode_one(texts[(offset + i) % len(texts)])
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client, args=(n * requests_per_client,)) for n in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=40, help="requests per client")
+    parser.add_argument("--wait-ms", type=float, default=5)
+    parser.add_argument("--max-batch", type=int, default=64)
+    args = parser.parse_args()
+
+    model = SentenceTransformer(MODEL_PATH)
+    # Short answers and passages, like quiz grading sends
+    texts = [make_text(8 + (i * 37) % 120, seed=i) for i in range(256)]
+    model.encode(texts[:8])  # warm-up
+
+    batch_sizes = []
+    batcher = MicroBatcher(
+        lambda batch: batch_sizes.append(len(batch)) or model.encode(batch, batch_size=len(batch)),
+        max_batch_size=args.max_batch,
+        max_wait=args.wait_ms / 1000,
+    )
+    modes = {
+        "per request": lambda text: model.encode(text),
+        "micro-batched": lambda text: batcher.submit([text])[0],
+    }
+
+    print(f"{'mode':<14} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'mean batch':>11}")
+    for clients in args.clients:
+        for label, encode_one in modes.items():
+            batch_sizes.clear()
+            throughput, p50, p95 = run_load(encode_one, clients, args.requests, texts)
+            mean_batch = statistics.mean(batch_sizes) if batch_sizes else 1
+            print(f"{label:<14} {clients:>7} {throughput:>8.1f} {p50 * 1000:>8.2f} {p95 * 1000:>8.2f} {mean_batch:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Compare the NumPy vector store with Chroma (PersistentClient, and HttpClient
+when --chroma-host is given) at several collection sizes.
+
+Usage:
+    python benchmarks/bench_vector_store.py [--sizes 1000 10000] [--dim 3072] [--chroma-host localhost:8000]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from paths import add_import_paths
+add_import_paths("eep")
+
+from database.numpy_store import NumpyVectorStore
+
+ADD_BATCH_SIZE = 500
+
+
+def random_embeddings(count, dim, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dim), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_stores(args, directory):
+    stores = {
+        "numpy float32": lambda: NumpyVectorStore(os.path.join(directory, "np32"), dtype="float32"),
+        "numpy float16": lambda: NumpyVectorStore(os.path.join(directory, "np16"), dtype="float16"),
+    }
+    try:
+        from chromadb import PersistentClient, HttpClient
+    except ImportError:
+        return stores
+    stores["chroma persistent"] = lambda: PersistentClient(path=os.path.join(directory, "chroma"))
+    if args.chroma_host:
+        host, _, port = args.chroma_host.partition(":")
+        stores["chroma http"] = lambda: HttpClient(host=host, port=int(port or 8000))
+    return stores
+
+
+def bench(client, size, dim, queries, n_results):
+    name = f"bench-{uuid.uuid4().hex[:8]}"
+    collection = client.get_or_create_collection(name=name)
+    vectors = random_embeddings(size, dim)
+
+    started = time.perf_counter()
+    for start in range(0, size, ADD_BATCH_SIZE):
+        batch = vectors[start:start + ADD_BATCH_SIZE]
+        collection.add(
+            ids=[f"doc-0-{i}" for i in range(start, start + len(batch))],
+            embeddings=batch.tolist(),
+            documents=["chunk"] * len(batch),
+            metadatas=[{"original_doc": 0}] * len(batch),
+        )
+    add_seconds = time.perf_counter() - started
+
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        collection.query(query_embeddings=[query.tolist()], n_results=n_results,
+                         include=["documents", "metadatas", "distances"])
+        latencies.append(time.perf_counter() - started)
+
+    client.delete_collection(name)
+    latencies.sort()
+    return add_seconds, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--n-results", type=int, default=15)
+    parser.add_argument("--chroma-host", help="host:port of a Chroma server to include HttpClient")
+    args = parser.parse_args()
+
+    queries = random_embeddings(args.queries, args.dim, seed=1)
+    directory = tempfile.mkdtemp()
+    try:
+        stores = make_stores(args, directory)
+        print(f"{'store':<18} {'size':>7} {'add s':>8} {'query p50 ms':>13} {'query p95 ms':>13}")
+        for size in args.sizes:
+            for label, factory in stores.items():
+                add_seconds, p50, p95 = bench(factory(), size, args.dim, queries, args.n_results)
+                print(f"{label:<18} {size:>7} {add_seconds:>8.2f} {p50 * 1000:>13.2f} {p95 * 1000:>13.2f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
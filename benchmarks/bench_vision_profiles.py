@@ -0,0 +1,130 @@
+"""
+Compare vision encoding profiles: payload size, encode time and image tokens.
+
+Token counts are estimated with OpenAI's image pricing rules. With --gpt-iep the
+pages are also sent to a running GPT IEP, which reports latency and real usage.
+
+Usage:
+    python benchmarks/bench_vision_profiles.py [--pdf path/to/file.pdf | --pages 10] [--gpt-iep http://localhost:5002]
+"""
+import argparse
+import base64
+import json
+import math
+import random
+import statistics
+import time
+from io import BytesIO
+
+import requests
+from PIL import Image, ImageDraw
+
+from paths import add_import_paths
+add_import_paths("eep")
+
+from benchmarks.synthetic import make_text
+from tools.rasterizer import RASTER_DPI, VISION_PROFILES, encode_image
+
+PROMPT = "Extract all key ideas from these images and create concise study notes from them."
+
+
+def make_page_images(page_count, dpi=RASTER_DPI, seed=0):
+    """
+    Draw A4 pages of text at `dpi`, standing in for rasterized PDF pages when
+    poppler is not available. Every fourth page is left nearly blank.
+    """
+    width, height = round(8.27 * dpi), round(11.69 * dpi)
+    line_height = max(12, dpi // 6)
+    pages = []
+    for number in range(page_count):
+        img = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(img)
+        if number % 4 == 3:
+            draw.text((width // 3, height // 2), f"Chapter {number // 4 + 2}", fill="black")
+        else:
+            rng = random.Random(seed + number)
+            for y in range(dpi, height - dpi, line_height):
+                draw.text((dpi, y), make_text(rng.randint(8, 14), seed + number * 1000 + y), fill="black")
+        pages.append(img)
+    return pages
+
+
+def render_pdf(path, dpi=RASTER_DPI):
+    from pdf2image import convert_from_path
+    return convert_from_path(path, dpi=dpi)
+
+
+def estimate_image_tokens(width, height, detail):
+    """OpenAI's published cost of one image for gpt-4o."""
+    if detail == "low":
+        return 85
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def run_profile(images, profile, gpt_iep=None, batch_size=5):
+    encode_seconds = []
+    pages = []
+    for img in images:
+        started = time.perf_counter()
+        pages.append(encode_image(img, profile))
+        encode_seconds.append(time.perf_counter() - started)
+
+    estimated_tokens = 0
+    for page in pages:
+        with Image.open(BytesIO(base64.b64decode(page.data))) as decoded:
+            estimated_tokens += estimate_image_tokens(decoded.width, decoded.height, page.detail)
+
+    batches = [pages[i:i + batch_size] for i in range(0, len(pages), batch_size)]
+    bodies = [{"prompt": PROMPT, "images": [{"data": page.data, "detail": page.detail} for page in batch]}
+              for batch in batches]
+    result = {
+        "payload_bytes": sum(len(json.dumps(body)) for body in bodies),
+        "encode_ms": statistics.mean(encode_seconds) * 1000,
+        "low_detail_pages": sum(page.detail == "low" for page in pages),
+        "estimated_tokens": estimated_tokens,
+    }
+
+    if gpt_iep:
+        latencies = []
+        prompt_tokens = 0
+        for body in bodies:
+            started = time.perf_counter()
+            response = requests.post(f"{gpt_iep}/get_image_description", json=body)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+            prompt_tokens += response.json().get("usage", {}).get("prompt_tokens", 0)
+        result["latency_s"] = statistics.mean(latencies)
+        result["prompt_tokens"] = prompt_tokens
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pdf", help="PDF to rasterize (needs poppler; default: synthetic pages)")
+    parser.add_argument("--pages", type=int, default=8, help="Number of synthetic pages")
+    parser.add_argument("--profiles", nargs="+", default=list(VISION_PROFILES), choices=list(VISION_PROFILES))
+    parser.add_argument("--gpt-iep", help="URL of a running GPT IEP to measure latency and real token usage")
+    args = parser.parse_args()
+
+    images = render_pdf(args.pdf) if args.pdf else make_page_images(args.pages)
+    print(f"pages: {len(images)}  rendered size: {images[0].width}x{images[0].height}")
+
+    columns = f"{'profile':<10} {'payload KB':>11} {'encode ms':>10} {'low pages':>10} {'est. tokens':>12}"
+    if args.gpt_iep:
+        columns += f" {'latency s':>10} {'prompt tokens':>14}"
+    print(columns)
+    for name in args.profiles:
+        result = run_profile(images, VISION_PROFILES[name], args.gpt_iep)
+        line = (f"{name:<10} {result['payload_bytes'] / 1024:>11.1f} {result['encode_ms']:>10.1f} "
+                f"{result['low_detail_pages']:>10} {result['estimated_tokens']:>12}")
+        if args.gpt_iep:
+            line += f" {result['latency_s']:>10.2f} {result['prompt_tokens']:>14}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
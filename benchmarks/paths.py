@@ -0,0 +1,26 @@
+"""
+Import paths for the benchmarks, which run as scripts from this directory.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def add_import_paths(*services):
+    """
+    Make the repository root (the shared packages, `benchmarks.synthetic`) and
+    the given service directories, e.g. "eep" or "embeddings_iep", importable.
+    """
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    for service in services:
+        path = os.path.join(ROOT, service)
+        if path in sys.path:
+            continue
+        if service == "eep":
+            # Appended, not prepended: eep/secrets.py would shadow the standard library
+            # module for everything imported afterwards (requests, urllib3, ...)
+            sys.path.append(path)
+        else:
+            sys.path.insert(0, path)
@@ -0,0 +1,58 @@
+"""
+Synthetic inputs shared by the benchmarks (and a few tests).
+"""
+import random
+
+WORDS = (
+    "vector matrix gradient entropy theorem lemma integral derivative protocol "
+    "kernel process thread memory cache latency throughput algorithm graph tree "
+    "node edge proof function variable constant limit series sequence probability"
+).split()
+
+
+def make_text(words, seed=0):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def make_text_pdf(page_count, lines_per_page=40, words_per_line=10, seed=0):
+    """
+    Build a PDF whose pages hold `lines_per_page` lines of random words in Helvetica.
+
+    Returns:
+        bytes: The PDF file content.
+    """
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for _ in range(page_count):
+        lines = []
+        for line in range(lines_per_page):
+            words = " ".join(rng.choice(WORDS) for _ in range(words_per_line))
+            lines.append(f"BT /F1 10 Tf 40 {800 - line * 18} Td ({words}) Tj ET")
+        stream = "\n".join(lines).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, page_count)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
@@ -1,7 +1,5 @@
 from flask import Flask, request, jsonify 
 from flask_cors import CORS
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
 from prometheus_client import start_http_server, Counter, generate_latest, Histogram
 import threading
 import os
@@ -1,6 +1,16 @@
 import json
+import os
 from openai import OpenAI
 import asyncio
+from openai_limiter import RateLimiter, estimate_tokens
+
+COURSE_MODEL = "gpt-4o"
+# Completion tokens counted against the tokens-per-minute budget for each request,
+# which sets no max_output_tokens
+RESPONSE_TOKEN_ESTIMATE = int(os.getenv("RESPONSE_TOKEN_ESTIMATE", "2000"))
+
+limiter = RateLimiter.from_env()
+
 def extract_text_from_response(response):
     """
     Extracts the text from the OpenAI RESPONSE API response.
@@ -46,17 +56,17 @@ def parse_urls(response_parsed):
 
 def send_to_api(prompt , api_key):
     
-    client = OpenAI(api_key=api_key)
+    client = OpenAI(api_key=api_key, max_retries=0)
 
     # Send the prompt to the ChatGPT API
-    response = client.responses.create(
-        model="gpt-4o",  
+    response = limiter.call(COURSE_MODEL, lambda: client.responses.with_raw_response.create(
+        model=COURSE_MODEL,  
         input = prompt,
         tools=[
             {
                 "type": "web_search"
             }]
-    )
+    ), tokens=estimate_tokens(prompt) + RESPONSE_TOKEN_ESTIMATE).parse()
     return extract_text_from_response(response)
     
 
@@ -1,17 +1,23 @@
 from flask import Flask, request, jsonify, abort ,Response
 from flask_cors import CORS
 import openai
-from routes.document_upload import document_upload_route
+from routes.document_upload import document_upload_route, job_queue, ingest_document
 from routes.auth_routes import auth_routes
 from routes.quiz_generation import quiz_routes
 from routes.course_creator import iep_course_creator_routes
 from database.database import db
+from database.migrations import add_missing_columns
+from tools.ingestion_workers import start_ingestion_workers
+from tools.upload_spool import SpoolingRequest
 import os
 from secrets import OPENAI_API_KEY, mysql_password, ssl_cert
 import requests
+from prometheus_client import generate_latest
 openai.api_key = OPENAI_API_KEY
 
 app = Flask(__name__)
+# Stream uploaded files straight into the ingestion spool
+app.request_class = SpoolingRequest
 CORS(app, resources={r"/*": {"origins": [
             "http://localhost:3000",
             "http://localhost:3001",
@@ -33,6 +39,11 @@ def healthcheck():
     return jsonify({"status": "ok"}), 200
 
 
+@app.route("/metrics")
+def metrics():
+    return generate_latest(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
+
 LOCAL = os.getenv("LOCAL", "false")
 
 
@@ -89,12 +100,20 @@ with app.app_context():
     from model.user import User
     from model.doc import Doc
     from model.course import Course
+    from model.job import IngestionJob
+    from model.lexical import LexicalChunk, LexicalPosting
 
     if app.config["SQLALCHEMY_DATABASE_URI"]:
         
         db.create_all()
+        add_missing_columns(db)
+
 
+# Ingestion worker threads started next to the API. Set to 0 when running
+# dedicated workers (worker.py) with INGEST_QUEUE_BACKEND=sql.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
 
 if __name__ == '__main__':
+    start_ingestion_workers(app, job_queue, ingest_document, INGEST_WORKERS)
     app.run(host="0.0.0.0", port=5000)
     
\ No newline at end of file
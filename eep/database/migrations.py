@@ -0,0 +1,31 @@
+import logging
+from sqlalchemy import inspect, text
+
+
+def add_missing_columns(db):
+    """
+    Add columns that exist on the models but not in the database.
+
+    `db.create_all()` only creates missing tables, so columns added to an
+    existing model would otherwise never reach deployed databases. Only
+    nullable columns are added; anything else needs a manual migration.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = inspector.get_table_names()
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            if not column.nullable:
+                logging.error(f"Cannot add non-nullable column {table.name}.{column.name} automatically")
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                for index in table.indexes:
+                    if [c.name for c in index.columns] == [column.name]:
+                        connection.execute(text(f"CREATE INDEX {index.name} ON {table.name} ({column.name})"))
+            logging.info(f"Added column {table.name}.{column.name}")
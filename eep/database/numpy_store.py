@@ -0,0 +1,390 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+
+# Rows multiplied per block when scoring, bounding the float32 copies made of
+# float16 matrices
+QUERY_BLOCK_ROWS = 4096
+# Compact a collection once more than this share of its matrix rows are deleted
+COMPACT_DEAD_RATIO = 0.5
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+# With rescoring, this many times n_results candidates are re-ranked at full precision
+RESCORE_FACTOR = 4
+
+
+class NumpyVectorStore:
+    """
+    Local alternative to a Chroma client: one directory per collection holding
+    a memory-mapped embedding matrix and an SQLite side table of ids, documents
+    and metadata. Meant for LOCAL mode and small single-process deployments.
+
+    Exposes the part of the Chroma client API the EEP uses:
+    `get_or_create_collection`, `get_collection` and `delete_collection`.
+
+    dtype: how new collections store embeddings: "float32", "float16" (half the
+           size) or "int8" (a quarter, scalar-quantized with one scale per vector).
+    rescore: for float16/int8, also keep a float32 copy of every vector on disk and
+             re-rank the best `RESCORE_FACTOR * n_results` candidates of each query
+             with it. Only the candidates' rows of that copy are read.
+    """
+
+    def __init__(self, path, dtype="float32", rescore=False):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported vector dtype: '{dtype}'. Supported types are {', '.join(SUPPORTED_DTYPES)}.")
+        self.path = path
+        self.dtype = dtype
+        self.rescore = rescore and dtype != "float32"
+        self._collections = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _collection_dir(self, name):
+        if not re.fullmatch(r"[\w.\-]+", name):
+            raise ValueError(f"Invalid collection name: '{name}'")
+        return os.path.join(self.path, name)
+
+    def get_or_create_collection(self, name, metadata=None):
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = NumpyCollection(
+                    name, self._collection_dir(name), self.dtype, metadata, self.rescore)
+            return collection
+
+    def get_collection(self, name):
+        if not os.path.exists(os.path.join(self._collection_dir(name), "rows.sqlite")):
+            raise ValueError(f"Collection {name} does not exist.")
+        return self.get_or_create_collection(name)
+
+    def delete_collection(self, name):
+        with self._lock:
+            collection = self._collections.pop(name, None)
+        if collection is None and os.path.exists(self._collection_dir(name)):
+            collection = NumpyCollection(name, self._collection_dir(name), self.dtype)
+        if collection is not None:
+            collection._destroy()
+
+
+class NumpyCollection:
+    """
+    A collection stored as row-aligned, append-only matrix files (memory-mapped
+    for reads) plus `rows.sqlite` mapping matrix rows to ids, documents and metadata:
+
+    - `vectors.<generation>.<dtype>`: the embeddings in the collection's dtype.
+    - `scales.<generation>.float32`: int8 only, the per-vector dequantization scale.
+    - `full.<generation>.float32`: with rescoring, the embeddings at full precision.
+
+    Distances are squared L2, like Chroma's default space.
+    Supported `where` filters: {"key": value} and {"key": {"$eq" | "$ne" | "$in" | "$nin": ...}}.
+    """
+
+    def __init__(self, name, directory, dtype="float32", metadata=None, rescore=False):
+        self.name = name
+        self.directory = directory
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+
+        self._db = sqlite3.connect(os.path.join(directory, "rows.sqlite"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rows (row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, document TEXT, metadata TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+
+        # Storage settings are fixed when the collection is created
+        settings = dict(self._db.execute("SELECT key, value FROM settings"))
+        self.dtype = settings.get("dtype", dtype)
+        self.rescore = settings.get("rescore", str(rescore and self.dtype != "float32")) == "True"
+        self.dimension = int(settings["dimension"]) if "dimension" in settings else None
+        self.metadata = json.loads(settings["metadata"]) if "metadata" in settings else metadata
+        if "metadata" not in settings and metadata is not None:
+            self._set_setting("metadata", json.dumps(metadata))
+        self._set_setting("dtype", self.dtype)
+        self._set_setting("rescore", self.rescore)
+
+        # Compaction writes a new generation of the matrix files, switched to in the
+        # same SQLite transaction that renumbers the rows
+        self._generation = int(settings.get("generation", 0))
+        self._parts = {"vectors": self.dtype}
+        if self.dtype == "int8":
+            self._parts["scales"] = "float32"
+        if self.rescore:
+            self._parts["full"] = "float32"
+
+        self._maps = None  # part -> memmap
+        self._norms = None  # squared norms of the stored (dequantized) vectors
+        self._live = None  # boolean mask of rows still referenced by the side table
+
+    # ---------------------------------------------------------------- storage
+
+    def _part_path(self, part, generation=None):
+        generation = self._generation if generation is None else generation
+        return os.path.join(self.directory, f"{part}.{generation}.{self._parts[part]}")
+
+    def _part_width(self, part):
+        return 1 if part == "scales" else self.dimension
+
+    def _set_setting(self, key, value):
+        self._db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, str(value)))
+        self._db.commit()
+
+    def _row_count(self):
+        path = self._part_path("vectors")
+        if self.dimension is None or not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // (self.dimension * np.dtype(self.dtype).itemsize)
+
+    def _encode(self, vectors):
+        """Split float32 vectors into the arrays appended to each part."""
+        encoded = {}
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1
+            encoded["vectors"] = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+            encoded["scales"] = scales.astype(np.float32)[:, None]
+        else:
+            encoded["vectors"] = vectors.astype(self.dtype)
+        if "full" in self._parts:
+            encoded["full"] = vectors
+        return encoded
+
+    def _decode(self, start, end):
+        """The stored vectors of rows [start, end) as float32."""
+        block = np.asarray(self._maps["vectors"][start:end], dtype=np.float32)
+        if "scales" in self._maps:
+            block *= self._maps["scales"][start:end]
+        return block
+
+    def _blocks(self):
+        for start in range(0, len(self._maps["vectors"]), QUERY_BLOCK_ROWS):
+            yield self._decode(start, start + QUERY_BLOCK_ROWS)
+
+    def _exact(self, rows):
+        """Vectors of the given rows at the best precision available."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if "full" in self._maps:
+            return np.asarray(self._maps["full"][rows], dtype=np.float32)
+        block = np.asarray(self._maps["vectors"][rows], dtype=np.float32)
+        if "scales" in self._maps:
+            block *= self._maps["scales"][rows]
+        return block
+
+    def _load(self):
+        """Map the matrix files and rebuild the row norms and live mask if rows were added."""
+        rows = self._row_count()
+        if self._maps is not None and len(self._maps["vectors"]) == rows:
+            return
+        if rows == 0:
+            self._maps = {part: np.empty((0, self._part_width(part) or 0), dtype=dtype)
+                          for part, dtype in self._parts.items()}
+            self._norms = np.empty(0, dtype=np.float32)
+            self._live = np.zeros(0, dtype=bool)
+            return
+
+        self._maps = {
+            part: np.memmap(self._part_path(part), dtype=dtype, mode="r", shape=(rows, self._part_width(part)))
+            for part, dtype in self._parts.items()
+        }
+        self._norms = np.concatenate([np.einsum("ij,ij->i", block, block) for block in self._blocks()])
+        self._live = np.zeros(rows, dtype=bool)
+        live_rows = np.fromiter((row for (row,) in self._db.execute("SELECT row FROM rows")), dtype=np.int64)
+        self._live[live_rows[live_rows < rows]] = True
+
+    def _destroy(self):
+        with self._lock:
+            self._maps = None
+            self._db.close()
+            for filename in os.listdir(self.directory):
+                os.remove(os.path.join(self.directory, filename))
+            os.rmdir(self.directory)
+
+    def storage_bytes(self):
+        """Size of the matrix files on disk."""
+        return sum(os.path.getsize(self._part_path(part)) for part in self._parts
+                   if os.path.exists(self._part_path(part)))
+
+    # ------------------------------------------------------------- filtering
+
+    @staticmethod
+    def _where_sql(where):
+        clauses, params = [], []
+        for key, condition in (where or {}).items():
+            if key.startswith("$"):
+                raise ValueError(f"Unsupported where operator: '{key}'")
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            path = f"$.{key}"
+            for operator, value in condition.items():
+                if operator == "$eq":
+                    clauses.append("json_extract(metadata, ?) = ?")
+                    params += [path, value]
+                elif operator == "$ne":
+                    clauses.append("(json_extract(metadata, ?) IS NULL OR json_extract(metadata, ?) != ?)")
+                    params += [path, path, value]
+                elif operator in ("$in", "$nin"):
+                    placeholders = ", ".join("?" * len(value)) or "NULL"
+                    negate = "NOT " if operator == "$nin" else ""
+                    clauses.append(f"{negate}json_extract(metadata, ?) IN ({placeholders})")
+                    params += [path, *value]
+                else:
+                    raise ValueError(f"Unsupported where operator: '{operator}'")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _select(self, ids=None, where=None, columns="row, id, document, metadata", limit=None):
+        sql, params = self._where_sql(where)
+        if ids is not None:
+            sql += (" AND " if sql else " WHERE ") + f"id IN ({', '.join('?' * len(ids)) or 'NULL'})"
+            params += list(ids)
+        if limit is not None:
+            sql += " ORDER BY row LIMIT ?"
+            params.append(int(limit))
+        else:
+            sql += " ORDER BY row"
+        return self._db.execute(f"SELECT {columns} FROM rows{sql}", params).fetchall()
+
+    # ----------------------------------------------------------- Chroma API
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM rows").fetchone()[0]
+
+    def modify(self, metadata=None):
+        with self._lock:
+            if metadata is not None:
+                self.metadata = metadata
+                self._set_setting("metadata", json.dumps(metadata))
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("Expected one embedding per id")
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                self._set_setting("dimension", self.dimension)
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match collection dimensionality {self.dimension}")
+
+            first_row = self._row_count()
+            # "vectors" is written last: its size is what makes the new rows visible
+            for part, array in sorted(self._encode(vectors).items(), key=lambda item: item[0] == "vectors"):
+                with open(self._part_path(part), "ab") as f:
+                    f.write(array.tobytes())
+            try:
+                self._db.executemany(
+                    "INSERT INTO rows (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [(first_row + i, id_, document, json.dumps(metadata) if metadata is not None else None)
+                     for i, (id_, document, metadata) in enumerate(zip(ids, documents, metadatas))]
+                )
+                self._db.commit()
+            except sqlite3.IntegrityError as e:
+                self._db.rollback()
+                # The appended rows stay unreferenced and are dropped by the next compaction
+                raise ValueError(f"Duplicate id in add: {e}")
+
+    def get(self, ids=None, where=None, limit=None, include=("documents", "metadatas")):
+        with self._lock:
+            rows = self._select(ids, where, limit=limit)
+            result = {"ids": [row[1] for row in rows]}
+            if "documents" in include:
+                result["documents"] = [row[2] for row in rows]
+            if "metadatas" in include:
+                result["metadatas"] = [json.loads(row[3]) if row[3] else None for row in rows]
+            if "embeddings" in include:
+                self._load()
+                result["embeddings"] = self._exact([row[0] for row in rows])
+            return result
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("documents", "metadatas", "distances")):
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        with self._lock:
+            self._load()
+            if self.dimension is not None and queries.shape[1] != self.dimension:
+                raise ValueError(f"Embedding dimension {queries.shape[1]} does not match collection dimensionality {self.dimension}")
+
+            if where:
+                allowed = np.zeros(len(self._live), dtype=bool)
+                rows = np.array([row for (row,) in self._select(where=where, columns="row")], dtype=np.int64)
+                allowed[rows[rows < len(allowed)]] = True
+            else:
+                allowed = self._live
+
+            # Squared L2 distances: |x|^2 - 2 x.q + |q|^2, one matrix product per block
+            dots = np.concatenate([block @ queries.T for block in self._blocks()]) \
+                if len(self._live) else np.empty((0, len(queries)), dtype=np.float32)
+            query_norms = np.einsum("ij,ij->i", queries, queries)
+            distances = self._norms[:, None] - 2 * dots + query_norms[None, :]
+            distances[~allowed] = np.inf
+
+            k = min(n_results, int(allowed.sum()))
+            candidates = min(k * RESCORE_FACTOR, int(allowed.sum())) if "full" in self._maps else k
+            result = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+            for query, query_norm, column in zip(queries, query_norms, distances.T):
+                top = np.argpartition(column, candidates - 1)[:candidates] if k else np.empty(0, dtype=np.int64)
+                scores = column[top]
+                if "full" in self._maps and k:
+                    # Re-rank the candidates with their full-precision vectors
+                    exact = self._exact(top)
+                    scores = np.einsum("ij,ij->i", exact, exact) - 2 * exact @ query + query_norm
+                order = np.argsort(scores, kind="stable")[:k]
+                top, scores = top[order], scores[order]
+
+                by_row = {row[0]: row for row in self._db.execute(
+                    f"SELECT row, id, document, metadata FROM rows WHERE row IN ({', '.join('?' * len(top)) or 'NULL'})",
+                    [int(row) for row in top])}
+                rows = [by_row[int(row)] for row in top]
+                result["ids"].append([row[1] for row in rows])
+                result["documents"].append([row[2] for row in rows])
+                result["metadatas"].append([json.loads(row[3]) if row[3] else None for row in rows])
+                result["distances"].append([float(score) for score in scores])
+                if "embeddings" in include:
+                    result["embeddings"].append(self._exact(top))
+
+            return {key: value for key, value in result.items() if key == "ids" or key in include}
+
+    def delete(self, ids=None, where=None):
+        if ids is None and where is None:
+            raise ValueError("delete needs ids or where")
+        with self._lock:
+            rows = [row for (row,) in self._select(ids, where, columns="row")]
+            self._db.executemany("DELETE FROM rows WHERE row = ?", [(row,) for row in rows])
+            self._db.commit()
+            self._load()
+            self._live[[row for row in rows if row < len(self._live)]] = False
+            if len(self._live) and 1 - self._live.mean() > COMPACT_DEAD_RATIO:
+                self.compact()
+
+    def compact(self):
+        """Rewrite the matrix files without deleted rows and renumber the side table."""
+        with self._lock:
+            self._load()
+            live_rows = np.flatnonzero(self._live)
+            generation = self._generation + 1
+            for part in self._parts:
+                with open(self._part_path(part, generation), "wb") as f:
+                    for start in range(0, len(live_rows), QUERY_BLOCK_ROWS):
+                        f.write(np.asarray(self._maps[part][live_rows[start:start + QUERY_BLOCK_ROWS]]).tobytes())
+
+            # Renumber through negative values so the primary key never collides
+            self._db.executemany("UPDATE rows SET row = ? WHERE row = ?",
+                                 [(-(new + 1), int(old)) for new, old in enumerate(live_rows)])
+            self._db.execute("UPDATE rows SET row = -row - 1")
+            self._db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('generation', ?)", (str(generation),))
+            self._db.commit()
+
+            old_paths = [self._part_path(part) for part in self._parts]
+            self._generation = generation
+            self._maps = None
+            for path in old_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            logging.info(f"Compacted collection {self.name}: {len(self._live)} -> {len(live_rows)} rows")
+            self._load()
@@ -1,11 +1,176 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import chromadb
+import httpx
 from chromadb import HttpClient
 from chromadb import PersistentClient
-import os
+from prometheus_client import Counter, Histogram
+
+from database.numpy_store import NumpyVectorStore
 
 LOCAL = os.getenv("LOCAL", "false")
 
-if LOCAL == "false":    
-    client = HttpClient(host='74.243.233.220', port=8000)
+# "chroma" (HttpClient, or PersistentClient in LOCAL mode) or "numpy" (see numpy_store.py)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma")
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "vectors")
+# float32, float16 or int8 (scalar-quantized). With VECTOR_STORE_RESCORE=true, float16/int8
+# collections also keep float32 vectors on disk to re-rank the top candidates exactly.
+VECTOR_STORE_DTYPE = os.getenv("VECTOR_STORE_DTYPE", "float32")
+VECTOR_STORE_RESCORE = os.getenv("VECTOR_STORE_RESCORE", "false") == "true"
+
+CHROMA_HOST = os.getenv("CHROMA_HOST", "74.243.233.220")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
+CHROMA_SSL = os.getenv("CHROMA_SSL", "false") == "true"
+# Seconds to wait for a connection / for any other step of a request
+CHROMA_CONNECT_TIMEOUT = float(os.getenv("CHROMA_CONNECT_TIMEOUT", "5"))
+CHROMA_TIMEOUT = float(os.getenv("CHROMA_TIMEOUT", "60"))
+# Keep-alive connection pool shared by all request threads
+CHROMA_MAX_CONNECTIONS = int(os.getenv("CHROMA_MAX_CONNECTIONS", "32"))
+CHROMA_MAX_KEEPALIVE = int(os.getenv("CHROMA_MAX_KEEPALIVE", "16"))
+# Collection handles kept per process (least recently used are evicted)
+CHROMA_COLLECTION_CACHE_SIZE = int(os.getenv("CHROMA_COLLECTION_CACHE_SIZE", "256"))
+
+CHROMA_LATENCY = Histogram(
+    'eep_chroma_operation_seconds',
+    'Latency of Chroma operations',
+    ['operation'],
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+)
+CHROMA_ERRORS = Counter('eep_chroma_errors_total', 'Failed Chroma operations', ['operation'])
+CHROMA_COLLECTION_CACHE = Counter(
+    'eep_chroma_collection_cache_total',
+    'Collection handle lookups by result',
+    ['result']
+)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _create_client():
+    if VECTOR_STORE == "numpy":
+        return NumpyVectorStore(VECTOR_STORE_PATH, dtype=VECTOR_STORE_DTYPE, rescore=VECTOR_STORE_RESCORE)
+    if VECTOR_STORE != "chroma":
+        raise ValueError(f"Unknown vector store: '{VECTOR_STORE}'. Supported stores are chroma and numpy.")
+
+    if LOCAL != "false":
+        return PersistentClient(path="./")
+
+    client = HttpClient(host=CHROMA_HOST, port=CHROMA_PORT, ssl=CHROMA_SSL)
+    # Chroma's HTTP client already reuses one httpx session, but without timeouts
+    # or pool limits; swap in a configured one with the same headers. Chroma has
+    # no setting for this: the swap relies on the internals of the chromadb version
+    # pinned in requirements.txt, which test_vectordb.py checks.
+    server = getattr(client, "_server", None)
+    session = getattr(server, "_session", None)
+    if isinstance(session, httpx.Client):
+        verify = server._settings.chroma_server_ssl_verify
+        server._session = httpx.Client(
+            headers=session.headers,
+            verify=True if verify is None else verify,
+            timeout=httpx.Timeout(CHROMA_TIMEOUT, connect=CHROMA_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=CHROMA_MAX_CONNECTIONS,
+                                max_keepalive_connections=CHROMA_MAX_KEEPALIVE),
+        )
+        session.close()
+    else:
+        logging.warning(f"Unexpected internals in chromadb {chromadb.__version__}: "
+                        "CHROMA_TIMEOUT and the connection limits are not applied")
+    return client
+
+
+def get_client():
+    """The process-wide vector store client (Chroma or NumPy), created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _create_client()
+    return _client
+
+
+def timed(operation, function, *args, **kwargs):
+    """Call a Chroma function, recording its latency and failures under `operation`."""
+    started = time.perf_counter()
+    try:
+        return function(*args, **kwargs)
+    except Exception:
+        CHROMA_ERRORS.labels(operation=operation).inc()
+        raise
+    finally:
+        CHROMA_LATENCY.labels(operation=operation).observe(time.perf_counter() - started)
+
+
+class TimedCollection:
+    """
+    Wraps a Chroma collection so that data operations are timed, and a failing
+    handle is dropped from the cache (e.g. the collection was deleted and
+    recreated, so the cached id is stale).
+    """
+    OPERATIONS = {"add", "upsert", "update", "get", "query", "delete", "count", "peek", "modify"}
+
+    def __init__(self, collection, on_error):
+        self._collection = collection
+        self._on_error = on_error
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if name not in self.OPERATIONS:
+            return attribute
+
+        def operation(*args, **kwargs):
+            try:
+                return timed(name, attribute, *args, **kwargs)
+            except Exception:
+                self._on_error()
+                raise
+        return operation
+
+
+class CollectionCache:
+    """
+    Per-user collection handles, so requests skip the `get_or_create_collection`
+    round trip. LRU bounded by `max_size`; safe to use from several threads.
+    """
+
+    def __init__(self, client_factory, max_size):
+        self._client_factory = client_factory
+        self.max_size = max_size
+        self._handles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            handle = self._handles.get(name)
+            if handle is not None:
+                self._handles.move_to_end(name)
+                CHROMA_COLLECTION_CACHE.labels(result='hit').inc()
+                return handle
+
+        CHROMA_COLLECTION_CACHE.labels(result='miss').inc()
+        collection = timed("get_or_create_collection", self._client_factory().get_or_create_collection, name=name)
+        handle = TimedCollection(collection, on_error=lambda: self.forget(name, handle))
+        with self._lock:
+            self._handles[name] = handle
+            self._handles.move_to_end(name)
+            while len(self._handles) > self.max_size:
+                self._handles.popitem(last=False)
+        return handle
+
+    def forget(self, name, handle=None):
+        """Drop the cached handle of `name` (only if it is still `handle`, when given)."""
+        with self._lock:
+            if handle is None or self._handles.get(name) is handle:
+                self._handles.pop(name, None)
+
+
+collection_cache = CollectionCache(get_client, CHROMA_COLLECTION_CACHE_SIZE)
+
 
-else:
-    client = PersistentClient(path="./")
+def get_collection(username):
+    """The user's Chroma collection (created if missing), from the handle cache."""
+    return collection_cache.get(username)
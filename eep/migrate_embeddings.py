@@ -0,0 +1,37 @@
+import argparse
+import logging
+
+from app import app
+from database.vectordb import get_client
+from model.doc import Doc
+from tools.embeddings_client import EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, generate_embeddings
+from tools.embedding_space import MIGRATION_MODES, migrate_collection
+
+# Rebuilds users' collections for the current EMBEDDING_MODEL / EMBEDDING_DIMENSIONS,
+# e.g. after shortening embeddings:
+#
+#   EMBEDDING_DIMENSIONS=1024 python migrate_embeddings.py --mode truncate
+#
+# "truncate" re-projects the stored vectors without embedding calls (same model,
+# smaller size only); "reembed" sends the stored chunks to the embeddings IEP again.
+# Restart the EEP afterwards: its collection handles and query cache are per process.
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Migrate note collections to the current embedding settings")
+    parser.add_argument("--mode", choices=MIGRATION_MODES, required=True)
+    parser.add_argument("--users", nargs="+", help="only migrate these users' collections")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with app.app_context():
+        usernames = args.users or [owner for (owner,) in Doc.query.with_entities(Doc.owner_username).distinct()]
+
+    client = get_client()
+    for username in usernames:
+        migrated = migrate_collection(
+            client, username, args.mode,
+            model=EMBEDDING_MODEL,
+            dimensions=EMBEDDING_DIMENSIONS,
+            embed=lambda texts: generate_embeddings(texts, dimensions=EMBEDDING_DIMENSIONS),
+        )
+        logging.info(f"{username}: {migrated} chunks migrated to {EMBEDDING_DIMENSIONS} dimensions")
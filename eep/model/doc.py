@@ -6,3 +6,20 @@ class Doc(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     owner_username = db.Column(db.String(150), nullable=False)
     title = db.Column(db.String(255), nullable=False)
+    # SHA-256 of the uploaded file and how it was processed ("parsable" or
+    # "non_parsable"), used to reuse the chunks of identical uploads
+    content_hash = db.Column(db.String(64), nullable=True, index=True)
+    mode = db.Column(db.String(32), nullable=True)
+    # Number of chunks stored in Chroma under the ids `chunk_id(id, 0..chunk_count-1)`.
+    # NULL for documents ingested before chunk ids were deterministic.
+    chunk_count = db.Column(db.Integer, nullable=True)
+
+    def chunk_ids(self):
+        """Chroma ids of this document's chunks, or None for legacy documents."""
+        if self.chunk_count is None:
+            return None
+        return [chunk_id(self.id, index) for index in range(self.chunk_count)]
+
+
+def chunk_id(doc_id, index):
+    return f"doc-{doc_id}-{index}"
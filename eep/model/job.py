@@ -0,0 +1,38 @@
+from database.database import db
+from datetime import datetime
+
+class IngestionJob(db.Model):
+    __tablename__ = 'ingestion_job'
+
+    id = db.Column(db.String(36), primary_key=True)
+    owner_username = db.Column(db.String(150), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(512), nullable=False)
+    mode = db.Column(db.String(32), nullable=False)  # "parsable", "non_parsable" or "auto"
+    content_hash = db.Column(db.String(64), nullable=True)
+    status = db.Column(db.String(16), nullable=False, default="queued", index=True)  # queued, running, done, failed
+    stage = db.Column(db.String(32), nullable=False, default="queued")
+    progress_done = db.Column(db.Integer, nullable=False, default=0)
+    progress_total = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    doc_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "owner_username": self.owner_username,
+            "filename": self.filename,
+            "file_path": self.file_path,
+            "mode": self.mode,
+            "content_hash": self.content_hash,
+            "status": self.status,
+            "stage": self.stage,
+            "progress_done": self.progress_done,
+            "progress_total": self.progress_total,
+            "error": self.error,
+            "doc_id": self.doc_id,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+        }
@@ -0,0 +1,27 @@
+from database.database import db
+
+
+class LexicalChunk(db.Model):
+    """One indexed chunk of a document, with its length in terms (for BM25)."""
+    __tablename__ = 'lexical_chunk'
+
+    id = db.Column(db.Integer, primary_key=True)
+    owner_username = db.Column(db.String(150), nullable=False, index=True)
+    doc_id = db.Column(db.Integer, nullable=False, index=True)
+    chunk_index = db.Column(db.Integer, nullable=False)
+    length = db.Column(db.Integer, nullable=False)
+
+
+class LexicalPosting(db.Model):
+    """Occurrences of a term in one chunk of a user's documents."""
+    __tablename__ = 'lexical_posting'
+    __table_args__ = (
+        db.Index('ix_lexical_posting_owner_term', 'owner_username', 'term'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    owner_username = db.Column(db.String(150), nullable=False)
+    term = db.Column(db.String(64), nullable=False)
+    doc_id = db.Column(db.Integer, nullable=False, index=True)
+    chunk_index = db.Column(db.Integer, nullable=False)
+    term_frequency = db.Column(db.Integer, nullable=False)
@@ -5,20 +5,26 @@ import magic
 from werkzeug.utils import secure_filename
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import langchain.schema
-import base64
 import requests
-from pdf2image import convert_from_path
 from PIL import Image
-from io import BytesIO
 from datetime import datetime
 import os
-import PyPDF2
-from docx import Document
 from database.database import db
-from model.doc import Doc
+from model.doc import Doc, chunk_id
 from routes.auth_routes import token_required
-from database.vectordb import client
+from database.vectordb import get_collection
 from tools.file_processor_service import FileProcessorService
+from tools.embeddings_client import generate_embeddings, embed_query
+from tools.job_queue import create_job_queue
+from tools.upload_spool import take_upload
+from tools.doc_chunks import get_document_chunks, delete_document_chunks
+from tools.embedding_space import ensure_space, EmbeddingSpaceMismatch
+from tools import lexical_index
+from tools.rasterizer import iter_pdf_pages, encode_image, count_pages
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
 from chromadb.utils import embedding_functions
 from numpy import dot
 from numpy.linalg import norm
@@ -32,7 +38,24 @@ print(EMBEDDINGS_IEP)
 document_upload_route = Blueprint('document_upload_routes', __name__)
 
 ALLOWED_EXTENSIONS = {'pdf'}
-UPLOAD_FOLDER = ''
+# Number of chunks written to Chroma per collection.add call
+CHROMA_ADD_BATCH_SIZE = int(os.getenv("CHROMA_ADD_BATCH_SIZE", "500"))
+# Number of /get_image_description batches sent to the GPT IEP at once
+VISION_CONCURRENCY = int(os.getenv("VISION_CONCURRENCY", "4"))
+# Pages with fewer extractable characters than this are sent to GPT vision in "auto" mode
+HYBRID_MIN_TEXT_CHARS = int(os.getenv("HYBRID_MIN_TEXT_CHARS", "50"))
+# Notes taken from each of the vector and lexical rankings when searching
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "20"))
+# Reciprocal-rank fusion constant: higher values flatten the weight of top ranks
+RRF_K = int(os.getenv("RRF_K", "60"))
+# "memory" (workers in the API process) or "sql" (shared across processes)
+INGEST_QUEUE_BACKEND = os.getenv("INGEST_QUEUE_BACKEND", "memory")
+
+job_queue = create_job_queue(INGEST_QUEUE_BACKEND)
+
+
+class IngestionError(Exception):
+    """Raised when a queued document cannot be processed or stored."""
 
 def allowed_file_type(file_path):
     # Use magic to determine the file type
@@ -46,56 +69,69 @@ def allowed_file_type(file_path):
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def encode_document(file_path):
+def iter_encoded_document(file_path, pages=None):
     """
-    Converts a document (PDF or image) into a list of base64-encoded JPEG images.
+    Converts a document (PDF or image) into base64-encoded JPEG images, yielded one at a time.
+
+    Images are sized, compressed and given a detail level according to the
+    VISION_PROFILE settings (see tools/rasterizer.py).
 
     For PDF files:
-        - Converts each page of the PDF into a JPEG image.
-        - Encodes each image in base64.
+        - Pages are rendered in parallel by the streaming rasterizer (tools/rasterizer.py),
+          which keeps at most RASTER_WINDOW pages in memory.
+        - Each page is yielded as soon as it is encoded, in page order.
 
     For image files:
         - Converts the image to JPEG format if necessary (e.g., RGBA ➜ RGB).
-        - Encodes the image in base64.
+        - Yields the single encoded image.
 
     Args:
         file_path (str): The path to the document file (PDF or image).
+        pages (List[int], optional): 1-based PDF pages to convert. Defaults to every page.
 
-    Returns:
-        List[str]: A list of base64-encoded JPEG images as strings.
-                   Returns an empty list if the file cannot be processed.
+    Yields:
+        EncodedPage: A base64-encoded JPEG image and its detail level.
+
+    Raises:
+        Exception: If the file cannot be rasterized or opened.
     """
-    images_base64 = []
-    
     if file_path.lower().endswith(".pdf"):
-        try:               
-            # If no text or extraction failed, fall back to image conversion
-            images = convert_from_path(file_path, dpi=300)
-            for img in images:
-                buffer = BytesIO()
-                img.save(buffer, format="JPEG")
-                images_base64.append(base64.b64encode(buffer.getvalue()).decode("utf-8"))
-        except Exception as e:
-            logging.error(f"Failed to process PDF file: {e}")
-            return []
-        
+        yield from iter_pdf_pages(file_path, pages=pages)
     else:
-        try:
-            img = Image.open(file_path)
-            if img.mode == "RGBA":
-                img = img.convert("RGB")
-            buffer = BytesIO()
-            img.save(buffer, format="JPEG")
-            images_base64.append(base64.b64encode(buffer.getvalue()).decode("utf-8"))
-        except Exception as e:
-            logging.error(f"Failed to process image file: {e}")
-            return []
+        with Image.open(file_path) as img:
+            yield encode_image(img)
+
+def encode_document(file_path):
+    """
+    Converts a document (PDF or image) into a list of base64-encoded JPEG images.
+
+    Holds every page in memory; prefer `iter_encoded_document` for large documents.
+
+    Args:
+        file_path (str): The path to the document file (PDF or image).
+
+    Returns:
+        List[EncodedPage]: The base64-encoded JPEG image and detail level of each page.
+                           Returns an empty list if the file cannot be processed.
+    """
+    try:
+        return list(iter_encoded_document(file_path))
+    except Exception as e:
+        logging.error(f"Failed to process file {file_path}: {e}")
+        return []
+
+def document_page_count(file_path):
+    if file_path.lower().endswith(".pdf"):
+        return count_pages(file_path)
+    return 1
 
-    return images_base64
-    
 def batch_images(images, batch_size=5):
-    for i in range(0, len(images), batch_size):
-        yield images[i:i + batch_size]
+    images = iter(images)
+    while True:
+        batch = list(islice(images, batch_size))
+        if not batch:
+            return
+        yield batch
 
 @document_upload_route.route('/documents', methods=['GET'])
 @token_required
@@ -111,33 +147,151 @@ def get_all_documents(username):
 
     return jsonify(results)
 
-def process_nonparsable_document(file_path):
-    images_base64 = encode_document(file_path)
-    if not images_base64:
-        abort(503)
+def describe_image_batch(prompt, batch):
+    response = requests.post(
+        f"{GPT_IEP}/get_image_description",
+        json={
+            "prompt": prompt,
+            "images": [{"data": page.data, "detail": page.detail} for page in batch]
+        }
+    )
+    response.raise_for_status()
+    result = response.json()
+    usage = result.get('usage') or {}
+    logging.info(f"Described {len(batch)} pages ({', '.join(page.detail for page in batch)} detail) "
+                 f"using {usage.get('prompt_tokens')} prompt tokens")
+    return result.get('response', '')
+
+def _collect_descriptions(futures, pending, descriptions, report=None, total=0):
+    for future in futures:
+        index = pending.pop(future)
+        try:
+            descriptions[index] = future.result()
+        except Exception as e:
+            logging.error(f"Failed batch image description {index}: {e}")  # Skip bad batch
+            descriptions[index] = ""
+        if report:
+            report("describing", len(descriptions), total)
+
+def consecutive_batches(pages, batch_size=5):
+    """
+    Split sorted page numbers into batches of at most `batch_size` consecutive pages,
+    so each vision description covers one contiguous stretch of the document.
+    """
+    batches = []
+    for page in pages:
+        if batches and page == batches[-1][-1] + 1 and len(batches[-1]) < batch_size:
+            batches[-1].append(page)
+        else:
+            batches.append([page])
+    return batches
+
+def describe_page_batches(file_path, page_batches, report=None, concurrency=VISION_CONCURRENCY):
+    """
+    Describes batches of document pages with the GPT IEP, one request per batch.
 
+    Up to `concurrency` batches are sent at once. A failed batch is logged and
+    skipped without discarding the others.
+
+    Args:
+        file_path (str): The path to the document file (PDF or image).
+        page_batches (List[List[int]]): 1-based page numbers of each batch, in page order.
+
+    Returns:
+        List[str]: The description of each batch, aligned with `page_batches`
+                   ("" for batches that failed or returned nothing).
+
+    Raises:
+        IngestionError: If the pages cannot be converted to images.
+    """
     # Prepare request to GPT-4o image analysis endpoint
-    processed_chunks = []
     prompt = "Extract all key ideas from these images and create concise study notes from them."
+    descriptions = {}
+    pending = {}
 
-    for batch in batch_images(images_base64, batch_size=5):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
         try:
-            response = requests.post(
-                f"{GPT_IEP}/get_image_description",
-                json={
-                    "prompt": prompt,
-                    "images": batch
-                }
-            )
-            response.raise_for_status()
-            chunk = response.json().get('response', '')
-            if chunk:
-                processed_chunks.append(chunk)
+            # Pages are rasterized lazily, and at most `concurrency` batches are
+            # in flight, so memory stays bounded for long documents
+            images = iter_encoded_document(file_path, pages=[page for batch in page_batches for page in batch])
+            for index, batch_pages in enumerate(page_batches):
+                batch = list(islice(images, len(batch_pages)))
+                if not batch:
+                    raise IngestionError("The document has fewer pages than expected")
+                pending[pool.submit(describe_image_batch, prompt, batch)] = index
+                if len(pending) >= concurrency:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    _collect_descriptions(finished, pending, descriptions, report, len(page_batches))
         except Exception as e:
-            logging.error(f"Failed batch image description: {e}")
-            continue  # Skip bad batch
+            for future in pending:
+                future.cancel()
+            logging.error(f"Failed to convert {file_path} to images: {e}")
+            raise IngestionError("The document could not be converted to images")
+
+        _collect_descriptions(as_completed(list(pending)), pending, descriptions, report, len(page_batches))
+
+    return [descriptions.get(index, "") for index in range(len(page_batches))]
 
-    return processed_chunks
+def process_nonparsable_document(file_path, report=None, concurrency=VISION_CONCURRENCY):
+    """
+    Describes every page of a document with the GPT IEP, 5 pages per request.
+
+    Returns:
+        List[str]: The non-empty batch descriptions, in page order.
+    """
+    try:
+        page_count = document_page_count(file_path)
+    except Exception as e:
+        logging.error(f"Failed to read {file_path}: {e}")
+        raise IngestionError("The document could not be converted to images")
+    if not page_count:
+        raise IngestionError("The document could not be converted to images")
+
+    page_batches = consecutive_batches(range(1, page_count + 1), batch_size=5)
+    descriptions = describe_page_batches(file_path, page_batches, report, concurrency)
+    return [description for description in descriptions if description]
+
+def process_hybrid_document(file_path, report=None):
+    """
+    Extracts a PDF's text page by page, sending only the pages without a usable
+    text layer (fewer than HYBRID_MIN_TEXT_CHARS characters) to GPT vision.
+
+    Extracted pages and vision descriptions are merged in page order; each
+    description takes the place of the first page of its batch.
+
+    Returns:
+        str: The document's text.
+
+    Raises:
+        IngestionError: If the PDF is invalid or yields no text at all.
+    """
+    if report:
+        report("extracting")
+    try:
+        pages = FileProcessorService.extract_pdf_pages(file_path)
+    except ValueError as e:
+        raise IngestionError(str(e))
+
+    scanned = [page.number for page in pages if len(page.text.strip()) < HYBRID_MIN_TEXT_CHARS]
+    logging.info(f"{len(scanned)} of {len(pages)} pages of {file_path} routed to vision")
+
+    page_batches = consecutive_batches(scanned, batch_size=5)
+    descriptions = describe_page_batches(file_path, page_batches, report) if page_batches else []
+    description_at = {batch[0]: description for batch, description in zip(page_batches, descriptions)}
+
+    scanned = set(scanned)
+    parts = []
+    for page in pages:
+        if page.number in scanned:
+            if description_at.get(page.number):
+                parts.append(description_at[page.number])
+        else:
+            parts.append(page.text.strip())
+
+    text = "\n\n".join(parts)
+    if not text:
+        raise IngestionError("The uploaded PDF contains no extractable text.")
+    return text
 
 def process_parsable_document(file):
     try:
@@ -145,44 +299,42 @@ def process_parsable_document(file):
         text = file_processor.process_file(file)
         return text
     except ValueError as e:
-        abort(400)
+        raise IngestionError(str(e))
 
 @document_upload_route.route("/upload_document_parsable", methods=["POST"])
 @token_required
 def upload_document_parsable(username):
-    return upload_document(username, request, True)
+    return upload_document(username, request, "parsable")
 
 @document_upload_route.route("/upload_document_non_parsable", methods=["POST"])
 @token_required
 def upload_document_non_parsable(username):
-    return upload_document(username, request, False)
+    return upload_document(username, request, "non_parsable")
+
+@document_upload_route.route("/upload_document", methods=["POST"])
+@token_required
+def upload_document_auto(username):
+    """Upload a PDF and let the EEP choose text extraction or vision for each page."""
+    return upload_document(username, request, "auto")
 
 
-def upload_document(username, request, parsable):
+def upload_document(username, request, mode):
     """
-    Handles the upload, processing, and embedding of a document (PDF or image).
+    Validates an uploaded document (PDF), spools it to disk and queues it for ingestion.
 
-    Workflow:
-        1. Validates the uploaded file.
-        2. Saves the file securely to disk.
-        3. Checks the file type using libmagic.
-        4. Converts the document to base64-encoded JPEG images:
-            - PDFs are converted page-by-page.
-            - Image files are converted directly.
-        5. Sends the images in batches to a GPT-based endpoint for summarization.
-        6. Concatenates the GPT-generated summaries into a single text.
-        7. Splits the resulting text into chunks using RecursiveCharacterTextSplitter.
-        8. For each chunk:
-            - Sends it to an embedding endpoint to generate vector representations.
-            - Stores the embeddings in a ChromaDB collection named "general".
+    `mode` is "parsable" (text extraction), "non_parsable" (GPT vision on every page)
+    or "auto" (per-page choice, see `process_hybrid_document`).
+
+    The actual processing runs in the ingestion workers (see `ingest_document`);
+    its progress can be followed with GET /jobs/<job_id>.
 
     Returns:
-        Response: HTTP 200 on success, appropriate HTTP error codes on failure.
+        Response: HTTP 202 with {"job_id": "<id>"} once the document is queued.
 
     Errors:
         - 400: If no file is provided, or file type is not allowed.
-        - 503: If saving or processing the file fails.
-        - 502: If communication with GPT or embedding endpoints fails.
+        - 413: If the file is larger than MAX_UPLOAD_BYTES.
+        - 503: If saving or queueing the file fails.
 
     """
     if 'file' not in request.files:
@@ -196,65 +348,222 @@ def upload_document(username, request, parsable):
 
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
         try:
-            file.save(file_path)
+            # The upload was streamed into a unique spool file while the request was
+            # parsed (tools/upload_spool.py); the job takes that file over as is
+            file_path, content_hash = take_upload(file)
+        except RequestEntityTooLarge:
+            raise
         except Exception as e:
             logging.error(f'Error saving file: {filename}: {e}')
             abort(503)
-
-
     else:
         abort(400)
 
-    if parsable == False:
-        processed_chunks = process_nonparsable_document(file_path)
-        processed_text = "\n\n".join(processed_chunks)
-    else:
-        processed_text = process_parsable_document(file)
-        
-    os.remove(file_path)
-    
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,         
-        chunk_overlap=200,       
-        separators=["\n\n", "\n", ". ", " ", ""],  
-    )
+    try:
+        job_id = job_queue.submit(username, filename, file_path, mode, content_hash)
+    except Exception as e:
+        logging.error(f'Error queueing ingestion job for {filename}: {e}')
+        os.remove(file_path)
+        abort(503)
+
+    return jsonify({"job_id": job_id}), 202
+
+
+def ingest_document(job, report):
+    """
+    Runs the ingestion pipeline for a queued upload. Called by the ingestion workers.
+
+    Workflow:
+        1. If a document with the same content hash was already processed the same
+           way, copies its chunks and embeddings into the user's collection and stops.
+        2. Extracts the document's text:
+            - parsable documents: raw text extraction with FileProcessorService.
+            - non-parsable documents: pages are converted to base64-encoded JPEG images
+              and sent in batches to a GPT-based endpoint for summarization.
+            - auto: text extraction, with vision only for pages without a text layer.
+        3. Splits the resulting text into chunks using RecursiveCharacterTextSplitter.
+        4. Sends the chunks in batches to the embedding endpoint to generate vector representations.
+        5. Records the document in the SQL database.
+        6. Stores the chunks and embeddings in the user's ChromaDB collection
+           with a few bulk `collection.add` calls.
+        7. Adds the chunks to the user's lexical (BM25) index.
+
+    Args:
+        job (dict): The ingestion job (see `JobQueue`).
+        report (Callable): `report(stage, done=0, total=0)`, records the job's progress.
+
+    Returns:
+        int: The id of the created Doc.
+
+    Raises:
+        IngestionError: If the document cannot be processed or stored.
+        requests.RequestException: If communication with the GPT or embedding endpoints fails.
+    """
+    username = job["owner_username"]
+    filename = job["filename"]
+    file_path = job["file_path"]
 
-    document = langchain.schema.Document(page_content=processed_text)
-    data = text_splitter.split_documents([document])
-    collection = client.get_or_create_collection(name=username)
     try:
-        doc = Doc(owner_username=username, title=filename)
+        if job.get("content_hash"):
+            reused_doc_id = reuse_processed_document(username, filename, job["content_hash"], job["mode"], report)
+            if reused_doc_id is not None:
+                return reused_doc_id
+
+        if job["mode"] == "non_parsable":
+            processed_chunks = process_nonparsable_document(file_path, report)
+            processed_text = "\n\n".join(processed_chunks)
+        elif job["mode"] == "auto":
+            processed_text = process_hybrid_document(file_path, report)
+        else:
+            report("extracting")
+            with open(file_path, "rb") as stream:
+                processed_text = process_parsable_document(FileStorage(stream=stream, filename=filename))
+
+        report("splitting")
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=800,         
+            chunk_overlap=200,       
+            separators=["\n\n", "\n", ". ", " ", ""],  
+        )
+
+        document = langchain.schema.Document(page_content=processed_text)
+        data = text_splitter.split_documents([document])
+        texts = [item.page_content for item in data]
+
+        embeddings = generate_embeddings(
+            texts,
+            progress=lambda done, total: report("embedding", done, total)
+        )
+
+        return store_document(username, filename, job.get("content_hash"), job["mode"], texts, embeddings, report)
+    finally:
+        # The upload is kept until the job ends, so that a job requeued after its
+        # worker died can start over; a retried job may find it already removed
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+
+def store_document(username, filename, content_hash, mode, texts, embeddings, report):
+    """
+    Records a processed document in SQL and stores its chunks and embeddings in Chroma.
+
+    Returns:
+        int: The id of the created Doc.
+
+    Raises:
+        IngestionError: If the SQL record or the Chroma writes fail, or the user's
+            collection was built with other embedding settings.
+    """
+    collection = get_collection(username)
+    try:
+        ensure_space(collection)
+    except EmbeddingSpaceMismatch as e:
+        logging.error(str(e))
+        raise IngestionError("The notes collection must be migrated to the current embedding settings")
+    try:
+        doc = Doc(owner_username=username, title=filename, content_hash=content_hash, mode=mode,
+                  chunk_count=len(texts))
         db.session.add(doc)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
         logging.error("error while inserting doc record in SQL DB: "+str(e))
-        abort(502)
+        raise IngestionError("Failed to record the document")
 
-    for index, item in enumerate(data):
-        entry_id = f"{file_path}-{index}"
-        try:
-            response = requests.post(
-                f"{EMBEDDINGS_IEP}/generate_embeddings",
-                json={"text": item.page_content}
-            )
-            response.raise_for_status()
-            embeddings =  response.json()["embedding"]
+    date_added = datetime.now().isoformat()
+    try:
+        for start in range(0, len(texts), CHROMA_ADD_BATCH_SIZE):
+            report("storing", start, len(texts))
+            batch_texts = texts[start:start + CHROMA_ADD_BATCH_SIZE]
             collection.add(
-                ids=[entry_id],
-                embeddings = [embeddings],
-                documents=[item.page_content],
-                metadatas=[{"date_added": datetime.now().isoformat(), "original_doc": doc.id}]
+                ids=[chunk_id(doc.id, index) for index in range(start, start + len(batch_texts))],
+                embeddings=embeddings[start:start + len(batch_texts)],
+                documents=batch_texts,
+                metadatas=[{"date_added": date_added, "original_doc": doc.id} for _ in batch_texts]
             )
+    except Exception as e:
+        logging.error(f"Failed to store embeddings: {e}")
+        try:
+            delete_document_chunks(collection, doc)  # drop the batches already written
+        except Exception as cleanup_error:
+            logging.error(f"Failed to remove partial chunks of document {doc.id}: {cleanup_error}")
+        db.session.delete(doc)
+        db.session.commit()
+        raise IngestionError("Failed to store the document's embeddings")
 
-        except Exception as e:
-            # Log or handle error
-            print(f"Failed to get/store embedding: {e}")
-            abort(502)
+    try:
+        lexical_index.index_document(username, doc.id, texts)
+        db.session.commit()
+    except Exception as e:
+        # Search still works from the vector ranking alone
+        db.session.rollback()
+        logging.error(f"Failed to add document {doc.id} to the lexical index: {e}")
+
+    return doc.id
+
+
+def reuse_processed_document(username, filename, content_hash, mode, report):
+    """
+    Copies the chunks and embeddings of an identical, already processed upload
+    into the user's collection, without any GPT or embedding calls.
+
+    Returns:
+        int or None: The id of the new Doc, or None if no processed copy exists.
+    """
+    report("deduplicating")
+    candidates = (Doc.query
+                  .filter_by(content_hash=content_hash, mode=mode)
+                  .order_by(Doc.id)
+                  .all())
+    for source in candidates:
+        source_collection = get_collection(source.owner_username)
+        try:
+            ensure_space(source_collection)
+        except EmbeddingSpaceMismatch:
+            continue  # its embeddings cannot be mixed with current ones
+        results = get_document_chunks(source_collection, source, include=("documents", "embeddings"))
+        if not results["ids"]:
+            continue  # the source was deleted from Chroma or never fully stored
+        if source.chunk_count is not None and len(results["ids"]) != source.chunk_count:
+            continue  # some chunks are missing
+
+        texts = results["documents"]
+        embeddings = results["embeddings"]
+        logging.info(f"Reusing {len(texts)} chunks of document {source.id} for {filename}")
+        return store_document(username, filename, content_hash, mode, texts, embeddings, report)
+
+    return None
 
-    return "", 200
+
+@document_upload_route.route('/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_job_status(username, job_id):
+    """
+    Report the status and stage progress of an ingestion job.
+
+    Returns:
+        - 200: {"id", "filename", "status", "stage", "progress": {"done", "total"}, "error", "doc_id", ...}
+        - 404: If the job does not exist or belongs to another user.
+    """
+    job = job_queue.get(job_id)
+    if not job or job["owner_username"] != username:
+        return jsonify({"error": "Job not found"}), 404
+
+    return jsonify({
+        "id": job["id"],
+        "filename": job["filename"],
+        "mode": job["mode"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": {"done": job["progress_done"], "total": job["progress_total"]},
+        "error": job["error"],
+        "doc_id": job["doc_id"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }), 200
 
 
 
@@ -267,22 +576,13 @@ def delete_document(username, doc_id):
         if not document:
             return jsonify({"error": "Document not found or unauthorized"}), 404
 
-        # Delete from ChromaDB collection (assumed to be named after username)
-        collection = client.get_or_create_collection(name=username)
-        all_docs = collection.get(include=["metadatas"])
-        doc_ids = all_docs.get("ids", [])
-
-        ids_to_delete = [
-            doc_id_in_chroma
-            for doc_id_in_chroma, metadata in zip(doc_ids, all_docs['metadatas'])
-            if str(metadata.get("original_doc")) == str(doc_id)
-        ]
-
-        if ids_to_delete:
-            collection.delete(ids=ids_to_delete)
-
+        # Delete from ChromaDB collection (assumed to be named after username),
+        # touching only this document's chunks
+        collection = get_collection(username)
+        delete_document_chunks(collection, document)
 
         # Delete from SQL database
+        lexical_index.remove_document(document.id)
         db.session.delete(document)
         db.session.commit()
 
@@ -310,30 +610,16 @@ def fetch_notes_by_document(username):
         if not doc:
                 return jsonify({"error": "Document not found or access denied"}), 404
         
-        # Query ChromaDB for embeddings with the document name as metadata
-        collection = client.get_or_create_collection(name=username)
-        results = collection.get(where={"original_doc": doc.id})
+        # Fetch the document's chunks from ChromaDB, sorted by index
+        collection = get_collection(username)
+        results = get_document_chunks(collection, doc)
 
         if not results["documents"]:
             return jsonify({"error": "No notes found for this document"}), 404
 
-        # Step 4: Extract and sort notes by index
-        raw_notes = results["documents"]
-        raw_ids = results["ids"]
-
-        # Pair notes with their indices
-        notes_with_indices = []
-        for note, entry_id in zip(raw_notes, raw_ids):
-            # Extract the index from the entry_id (e.g., "example.pdf-0" -> 0)
-            index = int(entry_id.split("-")[-1])
-            notes_with_indices.append((index, note))
-
-        # Sort notes by index
-        notes_with_indices.sort(key=lambda x: x[0])
-
         # Remove overlaps and structure the notes
         structured_notes = []
-        for i, (_, note) in enumerate(notes_with_indices):
+        for i, note in enumerate(results["documents"]):
             if i == 0:
                 # Add the first chunk as is
                 structured_notes.append(note)
@@ -360,6 +646,11 @@ def fetch_notes_by_document(username):
 def search_similar_note(username):
     """
     Search for the most similar note to a user-provided query and return the associated document.
+
+    Notes are ranked twice, by embedding similarity (Chroma) and by BM25 over the
+    user's lexical index, and the two rankings are fused with reciprocal-rank
+    fusion, so exact terms (formulas, course codes, names) are found even when
+    their embeddings are not the closest.
     """
     try:
         # Step 1: Get the query from the request
@@ -368,29 +659,43 @@ def search_similar_note(username):
         if not query:
             return jsonify({"error": "note is required"}), 400
 
-        # Step 2: Generate embedding for the query
-        response = requests.post(
-            f"{EMBEDDINGS_IEP}/generate_embeddings",
-            json={"text": query}
-        )
-        response.raise_for_status()
-        query_embedding = response.json()["embedding"]
+        # Step 2: Generate embedding for the query (cached across requests)
+        query_embedding = embed_query(query)
 
-        # Step 3: Search ChromaDB for the most similar note
-        collection = client.get_or_create_collection(name=username)
+        # Step 3: Rank candidate notes by vector similarity and by exact terms
+        collection = get_collection(username)
+        try:
+            ensure_space(collection)
+        except EmbeddingSpaceMismatch as e:
+            logging.error(str(e))
+            return jsonify({"error": "Your notes must be migrated to the current embedding settings"}), 409
         results = collection.query(
             query_embeddings=[query_embedding],
-            n_results=1,  # Get the top 1 most similar note
+            n_results=SEARCH_CANDIDATES,
             include=["documents", "metadatas", "distances"]
         )
-
-        if not results["documents"]:
+        vector_ids = results["ids"][0] if results["ids"] else []
+        candidates = {
+            note_id: (note, metadata, distance)
+            for note_id, note, metadata, distance in zip(
+                vector_ids, results["documents"][0], results["metadatas"][0], results["distances"][0])
+        } if vector_ids else {}
+        lexical_ids = [note_id for note_id, _ in lexical_index.search(username, query, limit=SEARCH_CANDIDATES)]
+
+        fused = lexical_index.reciprocal_rank_fusion([vector_ids, lexical_ids], k=RRF_K)
+        if not fused:
             return jsonify({"error": "No similar notes found"}), 404
 
-        # Step 4: Extract the most similar note and its metadata
-        most_similar_note = results["documents"][0][0]
-        metadata = results["metadatas"][0][0]
-        similarity_score = results["distances"][0][0]
+        # Step 4: Extract the best note and its metadata
+        best_id, fusion_score = fused[0]
+        if best_id in candidates:
+            most_similar_note, metadata, similarity_score = candidates[best_id]
+        else:
+            # Only found by the lexical index: read it from Chroma by id
+            note = collection.get(ids=[best_id], include=["documents", "metadatas"])
+            if not note["ids"]:
+                return jsonify({"error": "No similar notes found"}), 404
+            most_similar_note, metadata, similarity_score = note["documents"][0], note["metadatas"][0], None
         original_doc_id = metadata["original_doc"]
 
         # Step 5: Retrieve the associated document from the SQL database
@@ -403,6 +708,7 @@ def search_similar_note(username):
             "query": query,
             "most_similar_note": most_similar_note,
             "similarity_score": similarity_score,
+            "fusion_score": fusion_score,
             "associated_document": {
                 "id": doc.id,
                 "title": doc.title,
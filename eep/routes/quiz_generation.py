@@ -4,7 +4,11 @@ from difflib import SequenceMatcher
 from chromadb import Client
 import openai
 from routes.auth_routes import token_required
-from database.vectordb import client
+from database.vectordb import get_collection
+from model.doc import Doc
+from tools.doc_chunks import get_document_chunks
+from tools.embeddings_client import embed_query
+from tools.embedding_space import ensure_space, EmbeddingSpaceMismatch
 import logging
 import requests
 import os
@@ -75,19 +79,19 @@ def generate_quiz(username):
     if document_id and topic:
         return jsonify({"error": "only specify one of 'document_id' and 'topic'"}), 400
 
-    collection = client.get_or_create_collection(name=username)
+    collection = get_collection(username)
 
     try:
         if document_id:
-            results = collection.get(where={"original_doc": document_id})
-            chunks = results["documents"]
+            doc = Doc.query.filter_by(id=document_id, owner_username=username).first()
+            chunks = get_document_chunks(collection, doc)["documents"] if doc else []
         else:
-            embeddings_response = requests.post(
-                f"{EMBEDDINGS_IEP}/generate_embeddings",
-                json={"text": topic}
-            )
-            embeddings_response.raise_for_status()
-            embeddings =  embeddings_response.json()["embedding"]
+            try:
+                ensure_space(collection)
+            except EmbeddingSpaceMismatch as e:
+                logging.error(str(e))
+                return jsonify({"error": "Your notes must be migrated to the current embedding settings"}), 409
+            embeddings = embed_query(topic)
 
             results = collection.query(query_embeddings=[embeddings], n_results=15,  where={"id": {"$ne": "none"}})
             system_message += f"The quiz should only be about concepts related to the following topic: {topic}. \n Ignore any context that is not related to this topic."
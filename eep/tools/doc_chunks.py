@@ -0,0 +1,38 @@
+def chunk_index(chunk_id):
+    # Both "doc-<id>-<index>" and the legacy "<filename>-<index>" end with the index
+    return int(chunk_id.rsplit("-", 1)[-1])
+
+
+def get_document_chunks(collection, doc, include=("documents",)):
+    """
+    Read the chunks of one document from its owner's collection, in chunk order.
+
+    Documents with a recorded chunk count are fetched by id; legacy documents
+    fall back to a metadata filter on `original_doc`.
+
+    Returns:
+        dict: Chroma `get` result ("ids" plus the included fields), sorted by chunk index.
+    """
+    ids = doc.chunk_ids()
+    if ids is not None:
+        if not ids:
+            return {"ids": [], **{field: [] for field in include}}
+        results = collection.get(ids=ids, include=list(include))
+    else:
+        results = collection.get(where={"original_doc": doc.id}, include=list(include))
+
+    order = sorted(range(len(results["ids"])), key=lambda i: chunk_index(results["ids"][i]))
+    return {field: [results[field][i] for i in order] for field in ["ids", *include]}
+
+
+def delete_document_chunks(collection, doc):
+    """
+    Delete the chunks of one document from its owner's collection, by id when
+    the chunk count is known, otherwise by `original_doc` metadata.
+    """
+    ids = doc.chunk_ids()
+    if ids is not None:
+        if ids:
+            collection.delete(ids=ids)
+    else:
+        collection.delete(where={"original_doc": doc.id})
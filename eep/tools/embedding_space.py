@@ -0,0 +1,163 @@
+import logging
+
+import numpy as np
+
+from tools.embeddings_client import EMBEDDING_MODEL, EMBEDDING_DIMENSIONS
+
+# Collection metadata keys recording how the collection's embeddings were made
+MODEL_KEY = "embedding_model"
+DIMENSIONS_KEY = "embedding_dimensions"
+# Model of collections created before the model was recorded
+LEGACY_MODEL = "text-embedding-3-large"
+
+MIGRATION_MODES = ("truncate", "reembed")
+MIGRATION_BATCH_SIZE = 500
+
+
+class EmbeddingSpaceMismatch(Exception):
+    """Raised when a collection holds embeddings of another model or dimensionality."""
+
+
+def collection_space(collection):
+    """
+    The (model, dimensions) recorded in the collection's metadata. For collections
+    that predate the record, they are inferred from a stored vector and recorded;
+    None if the collection is empty.
+    """
+    metadata = collection.metadata or {}
+    if DIMENSIONS_KEY in metadata:
+        return metadata.get(MODEL_KEY, LEGACY_MODEL), int(metadata[DIMENSIONS_KEY])
+
+    sample = collection.get(limit=1, include=["embeddings"])
+    if sample["embeddings"] is None or len(sample["embeddings"]) == 0:
+        return None
+    space = LEGACY_MODEL, len(sample["embeddings"][0])
+    record_space(collection, *space)
+    return space
+
+
+def record_space(collection, model, dimensions):
+    # Chroma refuses changes to the index settings ("hnsw:*") once a collection exists
+    metadata = {key: value for key, value in (collection.metadata or {}).items() if not key.startswith("hnsw:")}
+    collection.modify(metadata={**metadata, MODEL_KEY: model, DIMENSIONS_KEY: dimensions})
+
+
+def ensure_space(collection, model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS):
+    """
+    Check that `collection` can be written and queried with `model` embeddings of
+    `dimensions` size. Empty collections adopt them.
+
+    Raises:
+        EmbeddingSpaceMismatch: If the collection was built with other settings.
+    """
+    space = collection_space(collection)
+    if space is None:
+        record_space(collection, model, dimensions)
+    elif space != (model, dimensions):
+        raise EmbeddingSpaceMismatch(
+            f"Collection '{collection.name}' holds {space[0]} embeddings of {space[1]} dimensions, "
+            f"not {model} embeddings of {dimensions}; it must be migrated first"
+        )
+
+
+def truncate_embeddings(embeddings, dimensions):
+    """
+    Shorten embeddings to their first `dimensions` components and re-normalize them,
+    which is how text-embedding-3 models produce shortened embeddings themselves.
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)[:, :dimensions]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _find_collection(client, name):
+    try:
+        return client.get_collection(name=name)
+    except Exception:
+        return None
+
+
+def _copy_collection(source, target, batch_size):
+    results = source.get(include=["documents", "metadatas", "embeddings"])
+    for start in range(0, len(results["ids"]), batch_size):
+        end = start + batch_size
+        target.add(
+            ids=results["ids"][start:end],
+            embeddings=np.asarray(results["embeddings"][start:end], dtype=np.float32).tolist(),
+            documents=results["documents"][start:end],
+            metadatas=results["metadatas"][start:end],
+        )
+
+
+def _restore_from_staging(client, name, staging):
+    metadata = {key: value for key, value in staging.metadata.items() if key != "migration_complete"}
+    if _find_collection(client, name) is not None:
+        client.delete_collection(name=name)
+    target = client.get_or_create_collection(name=name, metadata=metadata)
+    _copy_collection(staging, target, MIGRATION_BATCH_SIZE)
+    client.delete_collection(name=staging.name)
+
+
+def migrate_collection(client, name, mode, model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS,
+                       embed=None, batch_size=MIGRATION_BATCH_SIZE):
+    """
+    Rebuild the collection `name` so it holds `model` embeddings of `dimensions` size.
+
+    Modes:
+        "truncate": re-project the stored vectors (see `truncate_embeddings`). Only
+            shrinks vectors of the same model; no embedding calls.
+        "reembed": embed the stored chunk texts again with `embed(texts)`.
+
+    A collection's dimensionality cannot change in place, so the rebuilt chunks are
+    written to a staging collection, which then replaces the original. A complete
+    staging collection left by an interrupted run is restored first.
+
+    Returns:
+        int: The number of chunks migrated (0 if the collection already matched).
+    """
+    if mode not in MIGRATION_MODES:
+        raise ValueError(f"Unknown migration mode: '{mode}'. Supported modes are {', '.join(MIGRATION_MODES)}.")
+
+    staging_name = f"{name}-migrating"
+    staging = _find_collection(client, staging_name)
+    if staging is not None:
+        if (staging.metadata or {}).get("migration_complete"):
+            logging.info(f"Restoring {name} from the staging collection of an interrupted migration")
+            _restore_from_staging(client, name, staging)
+        else:
+            client.delete_collection(name=staging_name)
+
+    collection = _find_collection(client, name)
+    if collection is None:
+        return 0
+    space = collection_space(collection)
+    if space is None or space == (model, dimensions):
+        if space is None:
+            record_space(collection, model, dimensions)
+        return 0
+
+    results = collection.get(include=["documents", "metadatas", "embeddings"])
+    if mode == "truncate":
+        if space[0] != model or space[1] < dimensions:
+            raise ValueError(f"Cannot truncate {space[0]} embeddings of {space[1]} dimensions "
+                             f"to {model} embeddings of {dimensions}; re-embed instead")
+        embeddings = truncate_embeddings(results["embeddings"], dimensions)
+    else:
+        embeddings = np.asarray(embed(results["documents"]), dtype=np.float32)
+        if embeddings.shape != (len(results["ids"]), dimensions):
+            raise ValueError(f"Expected {len(results['ids'])} embeddings of {dimensions} dimensions, "
+                             f"got an array of shape {embeddings.shape}")
+
+    staging = client.get_or_create_collection(name=staging_name)
+    for start in range(0, len(results["ids"]), batch_size):
+        end = start + batch_size
+        staging.add(
+            ids=results["ids"][start:end],
+            embeddings=embeddings[start:end].tolist(),
+            documents=results["documents"][start:end],
+            metadatas=results["metadatas"][start:end],
+        )
+    staging.modify(metadata={MODEL_KEY: model, DIMENSIONS_KEY: dimensions, "migration_complete": True})
+
+    _restore_from_staging(client, name, staging)
+    return len(results["ids"])
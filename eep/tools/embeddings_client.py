@@ -0,0 +1,151 @@
+import base64
+import os
+
+import numpy as np
+import requests
+
+from tools.query_cache import TTLCache, normalize_query
+
+EMBEDDINGS_IEP = os.getenv("EMBEDDINGS_IEP", "http://embeddings:5001")
+# Seconds to wait for the embeddings IEP to connect, and then to answer
+EMBEDDINGS_TIMEOUT = float(os.getenv("EMBEDDINGS_TIMEOUT", "60"))
+
+# Model and vector size every collection is written and queried with. Collections
+# built with other settings must be migrated first (see migrate_embeddings.py).
+# The model is chosen by the embeddings IEP; responses made with another are refused.
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "3072"))
+
+# Response format asked of the embeddings IEP: "binary" (raw float32), "base64"
+# (float32 bytes inside JSON) or "json" (float lists). IEPs that predate the binary
+# formats answer in JSON, which is decoded as well.
+EMBEDDINGS_TRANSPORT = os.getenv("EMBEDDINGS_TRANSPORT", "binary")
+ACCEPT_HEADERS = {
+    "binary": "application/octet-stream, application/json;q=0.5",
+    "base64": "application/vnd.embeddings.base64+json, application/json;q=0.5",
+    "json": "application/json",
+}
+
+# Number of chunks sent to the embeddings IEP per HTTP call
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# Embeddings of search queries and quiz topics, reused across requests
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "600"))
+# Seconds a query waits for the same query's embedding to arrive from another
+# request before asking the IEP itself
+QUERY_COALESCE_TIMEOUT = float(os.getenv("QUERY_COALESCE_TIMEOUT", "10"))
+
+query_cache = TTLCache(max_entries=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL, wait_timeout=QUERY_COALESCE_TIMEOUT)
+
+
+def batched(items, batch_size):
+    for i in range(0, len(items), batch_size):
+        yield items[i:i + batch_size]
+
+
+def check_dimensions(embeddings, dimensions):
+    if embeddings.shape[-1] != dimensions:
+        raise ValueError(f"Expected {dimensions}-dimensional embeddings, got {embeddings.shape[-1]}")
+
+
+def check_model(response):
+    # IEPs that predate the header are not checked
+    model = response.headers.get("X-Embedding-Model")
+    if model is not None and model != EMBEDDING_MODEL:
+        raise ValueError(f"Expected embeddings from {EMBEDDING_MODEL}, got {model}")
+
+
+def decode_embeddings(response, key):
+    """
+    Read the vectors of an embeddings IEP response, in whichever format it was sent.
+
+    Binary and base64 bodies are wrapped without copying: the result is a read-only
+    float32 array over the response bytes.
+
+    Args:
+        key (str): "embedding" or "embeddings", the JSON field of the vectors.
+
+    Returns:
+        np.ndarray: Shape (dimensions,) for "embedding", (texts, dimensions) for "embeddings".
+    """
+    if response.headers.get("Content-Type", "").split(";")[0].strip() == "application/octet-stream":
+        shape = [int(n) for n in response.headers["X-Embedding-Shape"].split(",")]
+        dtype = response.headers.get("X-Embedding-Dtype", "<f4")
+        return np.frombuffer(response.content, dtype=dtype).reshape(shape)
+
+    data = response.json()
+    if f"{key}_base64" in data:
+        return np.frombuffer(base64.b64decode(data[f"{key}_base64"]), dtype=data["dtype"]).reshape(data["shape"])
+    return np.asarray(data[key], dtype=np.float32)
+
+
+def post_embeddings(payload, key):
+    response = requests.post(
+        f"{EMBEDDINGS_IEP}/generate_embeddings",
+        json=payload,
+        headers={"Accept": ACCEPT_HEADERS[EMBEDDINGS_TRANSPORT]},
+        timeout=EMBEDDINGS_TIMEOUT
+    )
+    response.raise_for_status()
+    check_model(response)
+    return decode_embeddings(response, key)
+
+
+def generate_embedding(text, dimensions=EMBEDDING_DIMENSIONS):
+    """
+    Embed a single text through the embeddings IEP.
+
+    Returns:
+        np.ndarray: The float32 embedding.
+
+    Raises:
+        requests.RequestException: If the IEP call fails.
+    """
+    embedding = post_embeddings({"text": text, "dimensions": dimensions}, "embedding")
+    check_dimensions(embedding, dimensions)
+    return embedding
+
+
+def embed_query(text):
+    """
+    Embed an interactive query (note search, quiz topic), served from the query
+    cache when the same normalized text was embedded recently.
+
+    Raises:
+        requests.RequestException: If the IEP call fails.
+    """
+    text = normalize_query(text)
+    return query_cache.get_or_compute(text, lambda: generate_embedding(text))
+
+
+def generate_embeddings(texts, batch_size=EMBEDDING_BATCH_SIZE, progress=None, dimensions=EMBEDDING_DIMENSIONS):
+    """
+    Embed a list of texts through the embeddings IEP, `batch_size` texts per call.
+
+    Args:
+        texts (List[str]): The texts to embed.
+        batch_size (int): Maximum number of texts per request to the IEP.
+        progress (Callable[[int, int], None], optional): Called with (embedded, total) before each batch.
+        dimensions (int): Size of the returned vectors.
+
+    Returns:
+        np.ndarray: A (texts, dimensions) float32 matrix, one row per text in input order.
+
+    Raises:
+        requests.RequestException: If any IEP call fails.
+    """
+    batches = []
+    done = 0
+    for batch in batched(texts, batch_size):
+        if progress:
+            progress(done, len(texts))
+        batch_embeddings = post_embeddings({"texts": batch, "dimensions": dimensions}, "embeddings")
+        if len(batch_embeddings) != len(batch):
+            raise ValueError(f"Expected {len(batch)} embeddings, got {len(batch_embeddings)}")
+        check_dimensions(batch_embeddings, dimensions)
+        batches.append(batch_embeddings)
+        done += len(batch)
+    if not batches:
+        return np.empty((0, dimensions), dtype=np.float32)
+    return batches[0] if len(batches) == 1 else np.concatenate(batches)
@@ -0,0 +1,62 @@
+import logging
+import threading
+import time
+
+# Seconds a worker waits for a job before re-entering its loop
+CLAIM_TIMEOUT = 5.0
+
+
+def start_ingestion_workers(app, job_queue, handler, count):
+    """
+    Start `count` daemon threads that run queued ingestion jobs.
+
+    Args:
+        app (Flask): The app whose context the jobs run in (needed for SQL access).
+        job_queue (JobQueue): The queue to claim jobs from.
+        handler (Callable[[dict, Callable], int]): Runs one job. It receives the job and a
+            `report(stage, done=0, total=0)` callback and returns the id of the created Doc.
+        count (int): Number of worker threads.
+
+    Returns:
+        List[threading.Thread]: The started threads.
+    """
+    threads = []
+    for i in range(count):
+        thread = threading.Thread(
+            target=_work,
+            args=(app, job_queue, handler),
+            name=f"ingestion-worker-{i}",
+            daemon=True,
+        )
+        thread.start()
+        threads.append(thread)
+    logging.info(f"Started {count} ingestion workers")
+    return threads
+
+
+def _work(app, job_queue, handler):
+    while True:
+        with app.app_context():
+            try:
+                job = job_queue.claim(timeout=CLAIM_TIMEOUT)
+            except Exception as e:
+                logging.error(f"Failed to claim ingestion job: {e}")
+                time.sleep(CLAIM_TIMEOUT)
+                continue
+            if job is None:
+                continue
+            _run(job_queue, handler, job)
+
+
+def _run(job_queue, handler, job):
+    job_id = job["id"]
+
+    def report(stage, done=0, total=0):
+        job_queue.update(job_id, stage=stage, progress_done=done, progress_total=total)
+
+    try:
+        doc_id = handler(job, report)
+        job_queue.update(job_id, status="done", stage="done", doc_id=doc_id)
+    except Exception as e:
+        logging.error(f"Ingestion job {job_id} failed: {e}")
+        job_queue.update(job_id, status="failed", error=str(e))
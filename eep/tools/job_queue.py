@@ -0,0 +1,261 @@
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from database.database import db
+from model.job import IngestionJob
+
+# Seconds between polls of the SQL backend when no job is queued
+POLL_INTERVAL = 1.0
+# Finished (done or failed) jobs the in-memory backend keeps for status queries:
+# for at most this many seconds, and at most this many of them
+FINISHED_JOB_TTL = float(os.getenv("FINISHED_JOB_TTL", "3600"))
+MAX_FINISHED_JOBS = int(os.getenv("MAX_FINISHED_JOBS", "1000"))
+# Seconds a SQL worker holds a claimed job without renewing its lease; running jobs
+# whose lease lapsed (their worker died) are queued again
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+
+FINISHED_STATUSES = ("done", "failed")
+
+
+class JobQueue(ABC):
+    """
+    Queue of ingestion jobs plus the state of each job.
+
+    Jobs are plain dicts with the same keys as `IngestionJob.serialize()`.
+    Backends must be safe to use from several worker threads.
+    """
+
+    @abstractmethod
+    def submit(self, owner_username, filename, file_path, mode, content_hash=None):
+        """Queue a new job and return its id."""
+
+    @abstractmethod
+    def claim(self, timeout):
+        """
+        Take the oldest queued job and mark it as running.
+
+        Returns:
+            dict or None: The claimed job, or None if nothing was queued within `timeout` seconds.
+        """
+
+    @abstractmethod
+    def update(self, job_id, **fields):
+        """Update the stored fields of a job (status, stage, progress, error, doc_id)."""
+
+    @abstractmethod
+    def get(self, job_id):
+        """Return the job with the given id, or None."""
+
+
+class InMemoryJobQueue(JobQueue):
+    """
+    Process-local backend. Only usable when the workers run in the same
+    process as the API (the default INGEST_WORKERS setup). Finished jobs are
+    forgotten after `finished_ttl` seconds, or sooner past `max_finished` of them.
+    """
+
+    def __init__(self, finished_ttl=FINISHED_JOB_TTL, max_finished=MAX_FINISHED_JOBS, clock=time.monotonic):
+        self.finished_ttl = finished_ttl
+        self.max_finished = max_finished
+        self._clock = clock
+        self._jobs = {}
+        self._finished = OrderedDict()  # job id -> clock() when it finished, oldest first
+        self._pending = queue.Queue()
+        self._lock = threading.Lock()
+
+    def submit(self, owner_username, filename, file_path, mode, content_hash=None):
+        job_id = str(uuid.uuid4())
+        now = datetime.utcnow().isoformat()
+        with self._lock:
+            self._jobs[job_id] = {
+                "id": job_id,
+                "owner_username": owner_username,
+                "filename": filename,
+                "file_path": file_path,
+                "mode": mode,
+                "content_hash": content_hash,
+                "status": "queued",
+                "stage": "queued",
+                "progress_done": 0,
+                "progress_total": 0,
+                "error": None,
+                "doc_id": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+        self._pending.put(job_id)
+        return job_id
+
+    def claim(self, timeout):
+        try:
+            job_id = self._pending.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self.update(job_id, status="running", stage="starting")
+        return self.get(job_id)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job["updated_at"] = datetime.utcnow().isoformat()
+            if fields.get("status") in FINISHED_STATUSES:
+                self._finished[job_id] = self._clock()
+            self._evict_finished()
+
+    def get(self, job_id):
+        with self._lock:
+            self._evict_finished()
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _evict_finished(self):
+        expired = self._clock() - self.finished_ttl
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if finished_at > expired and len(self._finished) <= self.max_finished:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+
+
+class SqlJobQueue(JobQueue):
+    """
+    Backend storing jobs in the `ingestion_job` table.
+
+    Lets API replicas and separate worker processes (see worker.py) share one
+    queue. Every method must be called inside a Flask app context.
+
+    Claimed jobs are leased: a background thread renews the lease of the jobs
+    this process runs (by touching `updated_at`) every third of `lease` seconds,
+    and claim() first queues again running jobs whose lease has lapsed.
+    """
+
+    def __init__(self, lease=JOB_LEASE_SECONDS):
+        self.lease = lease
+        self._held = set()
+        self._lock = threading.Lock()
+        self._renewer = None
+
+    def submit(self, owner_username, filename, file_path, mode, content_hash=None):
+        job = IngestionJob(
+            id=str(uuid.uuid4()),
+            owner_username=owner_username,
+            filename=filename,
+            file_path=file_path,
+            mode=mode,
+            content_hash=content_hash,
+        )
+        try:
+            db.session.add(job)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return job.id
+
+    def claim(self, timeout):
+        self._requeue_abandoned()
+        deadline = time.monotonic() + timeout
+        while True:
+            job = (IngestionJob.query
+                   .filter_by(status="queued")
+                   .order_by(IngestionJob.created_at)
+                   .first())
+            if job is not None:
+                # Only one worker wins the conditional update for a given job
+                claimed = (IngestionJob.query
+                           .filter_by(id=job.id, status="queued")
+                           .update({"status": "running", "stage": "starting", "updated_at": datetime.utcnow()}))
+                db.session.commit()
+                if claimed:
+                    self._hold(job.id)
+                    return self.get(job.id)
+                continue
+            db.session.rollback()  # end the read transaction so new rows become visible
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(POLL_INTERVAL)
+
+    def update(self, job_id, **fields):
+        if fields.get("status") in FINISHED_STATUSES:
+            with self._lock:
+                self._held.discard(job_id)
+        fields["updated_at"] = datetime.utcnow()
+        try:
+            IngestionJob.query.filter_by(id=job_id).update(fields)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Failed to update ingestion job {job_id}: {e}")
+
+    def get(self, job_id):
+        job = db.session.get(IngestionJob, job_id)
+        return job.serialize() if job else None
+
+    def _requeue_abandoned(self):
+        now = datetime.utcnow()
+        try:
+            requeued = (IngestionJob.query
+                        .filter(IngestionJob.status == "running",
+                                IngestionJob.updated_at < now - timedelta(seconds=self.lease))
+                        .update({"status": "queued", "stage": "queued", "updated_at": now},
+                                synchronize_session=False))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Failed to requeue abandoned ingestion jobs: {e}")
+            return
+        if requeued:
+            logging.warning(f"Queued {requeued} abandoned ingestion job(s) again")
+
+    def _hold(self, job_id):
+        with self._lock:
+            self._held.add(job_id)
+            if self._renewer is None:
+                self._renewer = threading.Thread(
+                    target=self._renew_leases,
+                    args=(current_app._get_current_object(),),
+                    name="ingestion-job-leases",
+                    daemon=True,
+                )
+                self._renewer.start()
+
+    def _renew_leases(self, app):
+        while True:
+            time.sleep(self.lease / 3)
+            with self._lock:
+                held = list(self._held)
+            if not held:
+                continue
+            with app.app_context():
+                try:
+                    (IngestionJob.query
+                     .filter(IngestionJob.id.in_(held), IngestionJob.status == "running")
+                     .update({"updated_at": datetime.utcnow()}, synchronize_session=False))
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    logging.error(f"Failed to renew ingestion job leases: {e}")
+
+
+def create_job_queue(backend):
+    """
+    Build the job queue for the configured INGEST_QUEUE_BACKEND ("memory" or "sql").
+    """
+    if backend == "memory":
+        return InMemoryJobQueue()
+    if backend == "sql":
+        return SqlJobQueue()
+    raise ValueError(f"Unknown ingestion queue backend: '{backend}'. Supported backends are memory and sql.")
@@ -0,0 +1,120 @@
+import math
+import os
+import re
+from collections import Counter
+
+from sqlalchemy import func
+
+from database.database import db
+from model.doc import chunk_id
+from model.lexical import LexicalChunk, LexicalPosting
+
+# BM25 parameters
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+MAX_TERM_LENGTH = 64
+
+# Words, numbers and compounds such as "cs-101", "3.14", "x^2" or "c++"
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:[.\-+^/=_]+[^\W_]+)*\+*")
+COMPOUND_SEPARATORS = re.compile(r"[.\-+^/=_]+")
+
+
+def tokenize(text):
+    """
+    Lower-case terms of a text. Compounds (course codes, formulas, versions) are
+    kept whole and also split into their parts, so "CS-101" matches both
+    "cs-101" and "cs 101".
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        parts = [part for part in COMPOUND_SEPARATORS.split(token) if part]
+        if parts != [token]:
+            terms.extend(parts)
+    return [term[:MAX_TERM_LENGTH] for term in terms]
+
+
+def index_document(username, doc_id, texts):
+    """
+    Add the chunks of a newly stored document to the user's lexical index.
+
+    Only adds rows to the session; the caller commits.
+    """
+    chunk_rows = []
+    posting_rows = []
+    for index, text in enumerate(texts):
+        terms = tokenize(text)
+        chunk_rows.append({"owner_username": username, "doc_id": doc_id, "chunk_index": index, "length": len(terms)})
+        posting_rows.extend(
+            {"owner_username": username, "term": term, "doc_id": doc_id, "chunk_index": index, "term_frequency": count}
+            for term, count in Counter(terms).items()
+        )
+    if chunk_rows:
+        db.session.execute(LexicalChunk.__table__.insert(), chunk_rows)
+    if posting_rows:
+        db.session.execute(LexicalPosting.__table__.insert(), posting_rows)
+
+
+def remove_document(doc_id):
+    """Remove a document from the lexical index. The caller commits."""
+    LexicalPosting.query.filter_by(doc_id=doc_id).delete(synchronize_session=False)
+    LexicalChunk.query.filter_by(doc_id=doc_id).delete(synchronize_session=False)
+
+
+def search(username, query, limit=20):
+    """
+    Rank the user's chunks against a query with BM25.
+
+    Returns:
+        List[Tuple[str, float]]: (Chroma chunk id, score) pairs, best first.
+    """
+    terms = set(tokenize(query))
+    if not terms:
+        return []
+
+    chunk_count, average_length = (db.session.query(func.count(LexicalChunk.id), func.avg(LexicalChunk.length))
+                                   .filter(LexicalChunk.owner_username == username)
+                                   .one())
+    if not chunk_count:
+        return []
+    average_length = float(average_length) or 1.0
+
+    document_frequency = dict(
+        db.session.query(LexicalPosting.term, func.count(LexicalPosting.id))
+        .filter(LexicalPosting.owner_username == username, LexicalPosting.term.in_(terms))
+        .group_by(LexicalPosting.term)
+        .all()
+    )
+    if not document_frequency:
+        return []
+
+    postings = (db.session.query(LexicalPosting.term, LexicalPosting.doc_id, LexicalPosting.chunk_index,
+                                 LexicalPosting.term_frequency, LexicalChunk.length)
+                .join(LexicalChunk, (LexicalChunk.doc_id == LexicalPosting.doc_id)
+                      & (LexicalChunk.chunk_index == LexicalPosting.chunk_index))
+                .filter(LexicalPosting.owner_username == username, LexicalPosting.term.in_(terms))
+                .all())
+
+    scores = Counter()
+    for term, doc_id, chunk_index, term_frequency, length in postings:
+        frequency = document_frequency[term]
+        idf = math.log(1 + (chunk_count - frequency + 0.5) / (frequency + 0.5))
+        norm = term_frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+        scores[chunk_id(doc_id, chunk_index)] += idf * term_frequency * (BM25_K1 + 1) / norm
+    return scores.most_common(limit)
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse several rankings of ids (best first) into one: each id scores
+    sum(1 / (k + rank)) over the rankings it appears in.
+
+    Returns:
+        List[Tuple[str, float]]: (id, fused score) pairs, best first.
+    """
+    scores = Counter()
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] += 1 / (k + rank)
+    return sorted(scores.items(), key=lambda pair: (-pair[1], pair[0]))
@@ -0,0 +1,93 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from prometheus_client import Counter, Gauge
+
+QUERY_CACHE_REQUESTS = Counter(
+    'eep_query_embedding_cache_requests_total',
+    'Query embedding lookups by result (hit, miss, coalesced onto an in-flight miss, '
+    'or wait_timeout when that miss took too long and the lookup computed its own)',
+    ['result']
+)
+QUERY_CACHE_ENTRIES = Gauge('eep_query_embedding_cache_entries', 'Query embeddings currently cached')
+
+
+def normalize_query(text):
+    """Unicode NFC, surrounding whitespace stripped, inner whitespace runs collapsed."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+class TTLCache:
+    """
+    LRU cache whose entries also expire `ttl` seconds after being stored.
+
+    `get_or_compute` lets concurrent callers asking for the same missing key share
+    a single computation ("single flight"): the first caller computes, the others
+    wait for its result, for at most `wait_timeout` seconds before computing it
+    themselves. Failed computations are not cached.
+    """
+
+    def __init__(self, max_entries, ttl, wait_timeout=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self._clock():
+                    self._entries.move_to_end(key)
+                    QUERY_CACHE_REQUESTS.labels(result='hit').inc()
+                    return entry[1]
+                del self._entries[key]
+
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+
+        if not owner:
+            QUERY_CACHE_REQUESTS.labels(result='coalesced').inc()
+            try:
+                return future.result(timeout=self.wait_timeout)
+            except FutureTimeout:
+                QUERY_CACHE_REQUESTS.labels(result='wait_timeout').inc()
+                value = compute()
+                with self._lock:
+                    self._store(key, value)
+                return value
+
+        QUERY_CACHE_REQUESTS.labels(result='miss').inc()
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+            self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def _store(self, key, value):
+        # Called with the lock held
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        QUERY_CACHE_ENTRIES.set(len(self._entries))
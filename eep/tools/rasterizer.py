@@ -0,0 +1,189 @@
+import base64
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from itertools import islice
+from typing import NamedTuple, Optional
+
+from PIL import Image, ImageStat
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+RASTER_DPI = int(os.getenv("RASTER_DPI", "300"))
+# Threads rendering page ranges in parallel (each runs its own pdftoppm process)
+RASTER_WORKERS = int(os.getenv("RASTER_WORKERS", "4"))
+# Pages rendered by a single task
+RASTER_PAGES_PER_TASK = int(os.getenv("RASTER_PAGES_PER_TASK", "2"))
+# Maximum number of pages rendered but not yet consumed. Bounds peak memory.
+RASTER_WINDOW = int(os.getenv("RASTER_WINDOW", "8"))
+
+
+class VisionProfile(NamedTuple):
+    """
+    How pages are encoded for GPT vision.
+
+    long_edge: pixels of the longest side (None keeps the RASTER_DPI render size).
+    jpeg_quality: JPEG quality, 1-95.
+    grayscale: drop colour before encoding.
+    detail: OpenAI image detail, "low", "high", or "auto" to pick low/high per page
+            (see `choose_detail`).
+    """
+    long_edge: Optional[int]
+    jpeg_quality: int
+    grayscale: bool
+    detail: str
+
+
+VISION_PROFILES = {
+    # The default, as before profiles existed: full RASTER_DPI render at PIL's default quality.
+    # The others trade some extraction quality for smaller payloads and fewer tokens.
+    "original": VisionProfile(long_edge=None, jpeg_quality=75, grayscale=False, detail="high"),
+    "high": VisionProfile(long_edge=2048, jpeg_quality=85, grayscale=False, detail="high"),
+    "balanced": VisionProfile(long_edge=1536, jpeg_quality=80, grayscale=False, detail="auto"),
+    "economy": VisionProfile(long_edge=1024, jpeg_quality=70, grayscale=True, detail="low"),
+}
+
+
+def load_vision_profile():
+    """
+    Build the profile named by VISION_PROFILE, with any of VISION_LONG_EDGE,
+    VISION_JPEG_QUALITY, VISION_GRAYSCALE and VISION_DETAIL overriding its fields.
+    """
+    name = os.getenv("VISION_PROFILE", "original")
+    if name not in VISION_PROFILES:
+        raise ValueError(f"Unknown vision profile: '{name}'. Supported profiles are {', '.join(VISION_PROFILES)}.")
+    profile = VISION_PROFILES[name]
+
+    overrides = {}
+    if os.getenv("VISION_LONG_EDGE"):
+        overrides["long_edge"] = int(os.getenv("VISION_LONG_EDGE")) or None
+    if os.getenv("VISION_JPEG_QUALITY"):
+        overrides["jpeg_quality"] = int(os.getenv("VISION_JPEG_QUALITY"))
+    if os.getenv("VISION_GRAYSCALE"):
+        overrides["grayscale"] = os.getenv("VISION_GRAYSCALE").lower() in ("1", "true", "yes")
+    if os.getenv("VISION_DETAIL"):
+        overrides["detail"] = os.getenv("VISION_DETAIL")
+    profile = profile._replace(**overrides)
+
+    if profile.detail not in ("low", "high", "auto"):
+        raise ValueError(f"Unknown vision detail: '{profile.detail}'. Supported values are low, high and auto.")
+    return profile
+
+
+VISION_PROFILE = load_vision_profile()
+# With detail "auto", pages darker on average than this (0-1) are sent at high detail
+VISION_LOW_DETAIL_INK = float(os.getenv("VISION_LOW_DETAIL_INK", "0.002"))
+
+
+class EncodedPage(NamedTuple):
+    """A page ready for the GPT IEP: base64 JPEG plus the detail level to request."""
+    data: str
+    detail: str
+
+
+def choose_detail(img, ink_threshold=VISION_LOW_DETAIL_INK):
+    """
+    Pick the detail level of a page from its ink coverage (mean darkness):
+    blank and nearly blank pages read fine at "low", anything with real
+    content gets "high".
+    """
+    sample = img.convert("L")
+    sample.thumbnail((512, 512))  # averaging keeps the mean darkness
+    ink = 1 - ImageStat.Stat(sample).mean[0] / 255
+    return "low" if ink < ink_threshold else "high"
+
+
+def encode_image(img, profile=VISION_PROFILE):
+    """
+    Encode a PIL image for GPT vision following `profile`: resized so its longest
+    side is at most `profile.long_edge`, optionally converted to grayscale, and
+    saved as a base64 JPEG.
+
+    Returns:
+        EncodedPage: The encoded image and its detail level.
+    """
+    if profile.grayscale:
+        img = img.convert("L")
+    elif img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    if profile.long_edge and max(img.size) > profile.long_edge:
+        scale = profile.long_edge / max(img.size)
+        img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+
+    detail = choose_detail(img) if profile.detail == "auto" else profile.detail
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=profile.jpeg_quality)
+    return EncodedPage(base64.b64encode(buffer.getvalue()).decode("utf-8"), detail)
+
+
+def count_pages(file_path):
+    return pdfinfo_from_path(file_path)["Pages"]
+
+
+def page_ranges(pages, pages_per_task):
+    """
+    Group 1-based page numbers into inclusive (first, last) ranges of consecutive
+    pages, each at most `pages_per_task` pages long.
+    """
+    ranges = []
+    for page in sorted(pages):
+        if ranges and page == ranges[-1][1] + 1 and page - ranges[-1][0] < pages_per_task:
+            ranges[-1] = (ranges[-1][0], page)
+        else:
+            ranges.append((page, page))
+    return ranges
+
+
+def _render_range(file_path, first_page, last_page, dpi, profile):
+    # Let pdftoppm render straight at the target size instead of downscaling a full-DPI bitmap
+    images = convert_from_path(file_path, dpi=dpi, first_page=first_page, last_page=last_page,
+                               size=profile.long_edge, grayscale=profile.grayscale)
+    encoded = []
+    for img in images:
+        encoded.append(encode_image(img, profile))
+        img.close()
+    return encoded
+
+
+def iter_pdf_pages(file_path, pages=None, dpi=RASTER_DPI, workers=RASTER_WORKERS,
+                   pages_per_task=RASTER_PAGES_PER_TASK, window=RASTER_WINDOW, profile=VISION_PROFILE):
+    """
+    Rasterize a PDF and yield its pages one by one, encoded for GPT vision, in page order.
+
+    Page ranges are rendered in parallel on a thread pool, but only `window` pages
+    (rounded up to whole tasks) are ever rendered ahead of the consumer, so memory
+    stays bounded regardless of the document's length.
+
+    Args:
+        file_path (str): Path to the PDF.
+        pages (List[int], optional): 1-based numbers of the pages to render. Defaults to every page.
+        dpi (int): Rendering resolution, used when the profile has no long_edge.
+        workers (int): Number of rendering threads.
+        pages_per_task (int): Pages rendered per task.
+        window (int): Maximum number of pages in flight.
+        profile (VisionProfile): Size, quality, colour and detail of the encoded pages.
+
+    Yields:
+        EncodedPage: Base64-encoded JPEG and detail level of each page.
+    """
+    if pages is None:
+        pages = range(1, count_pages(file_path) + 1)
+    ranges = iter(page_ranges(pages, pages_per_task))
+    max_tasks = max(1, -(-window // pages_per_task))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque(
+            pool.submit(_render_range, file_path, first, last, dpi, profile)
+            for first, last in islice(ranges, max_tasks)
+        )
+        try:
+            while pending:
+                pages = pending.popleft().result()
+                next_range = next(ranges, None)
+                if next_range:
+                    pending.append(pool.submit(_render_range, file_path, *next_range, dpi, profile))
+                yield from pages
+        finally:
+            # The consumer stopped early or a page failed: drop work not yet started
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import tempfile
+
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+
+# Where uploads wait until an ingestion worker picks them up
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", "uploads")
+# Largest accepted upload, in bytes (HTTP 413 above it)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+# Size of the chunks read when copying a stream into a spool
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadSpool:
+    """
+    Writable, readable file for an uploaded document, stored under a unique
+    name in INGEST_SPOOL_DIR.
+
+    Content is hashed (SHA-256) and counted as it is written; writing more than
+    `max_bytes` removes the file and raises RequestEntityTooLarge (HTTP 413).
+
+    The file is deleted when the spool is closed, which Flask does for every
+    uploaded file at the end of the request, unless `detach()` handed it over
+    first (e.g. to an ingestion job).
+    """
+
+    def __init__(self, filename=None, spool_dir=INGEST_SPOOL_DIR, max_bytes=MAX_UPLOAD_BYTES):
+        os.makedirs(spool_dir, exist_ok=True)
+        suffix = f"-{secure_filename(filename)}" if filename else ""
+        fd, self.path = tempfile.mkstemp(dir=spool_dir, suffix=suffix)
+        self._file = os.fdopen(fd, "w+b")
+        self._sha256 = hashlib.sha256()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._detached = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.close()
+            raise RequestEntityTooLarge(f"Uploads are limited to {self.max_bytes} bytes.")
+        self._sha256.update(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+    def detach(self):
+        """
+        Flush the file and keep it on disk when the spool is closed.
+
+        Returns:
+            tuple: (path, hex SHA-256 of the content).
+        """
+        self._file.flush()
+        self._detached = True
+        return self.path, self.sha256
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self._detached and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        # read, readline, seek, tell, ... of the underlying file
+        return getattr(self._file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def spool_stream(stream, filename=None, spool_dir=INGEST_SPOOL_DIR, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Copy a readable stream into a new spool, chunk by chunk.
+
+    Returns:
+        tuple: (path, hex SHA-256) of the detached spool file.
+    """
+    with UploadSpool(filename, spool_dir, max_bytes) as spool:
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            spool.write(chunk)
+        return spool.detach()
+
+
+def take_upload(file):
+    """
+    Take ownership of an uploaded FileStorage's content on disk.
+
+    Uploads parsed by SpoolingRequest are already in the spool and are handed
+    over without another copy; anything else is streamed into a new spool.
+
+    Returns:
+        tuple: (path, hex SHA-256). The caller is responsible for removing the file.
+    """
+    if isinstance(file.stream, UploadSpool):
+        return file.stream.detach()
+    return spool_stream(file.stream, file.filename)
+
+
+class SpoolingRequest(Request):
+    """
+    Request class that streams uploaded files straight into UploadSpools
+    instead of Werkzeug's in-memory/anonymous temporary files.
+    """
+    spool_dir = INGEST_SPOOL_DIR
+    max_upload_bytes = MAX_UPLOAD_BYTES
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length > self.max_upload_bytes + UPLOAD_CHUNK_SIZE:
+            # Refuse before reading anything; the margin leaves room for the multipart framing
+            raise RequestEntityTooLarge(f"Uploads are limited to {self.max_upload_bytes} bytes.")
+        return UploadSpool(filename, self.spool_dir, self.max_upload_bytes)
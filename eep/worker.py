@@ -0,0 +1,14 @@
+import os
+import threading
+from app import app
+from routes.document_upload import job_queue, ingest_document
+from tools.ingestion_workers import start_ingestion_workers
+
+# Dedicated ingestion worker process, so ingestion can be scaled separately
+# from the API tier. Requires INGEST_QUEUE_BACKEND=sql and an INGEST_SPOOL_DIR
+# shared with the API pods.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+
+if __name__ == '__main__':
+    start_ingestion_workers(app, job_queue, ingest_document, INGEST_WORKERS)
+    threading.Event().wait()
@@ -1,12 +1,15 @@
 from flask import Flask, request, jsonify 
 from flask_cors import CORS
 import openai
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
-from prometheus_client import start_http_server, Counter, generate_latest, Histogram
+from prometheus_client import start_http_server, Counter, generate_latest, Histogram, Gauge
 import threading
 import os
 from dotenv import load_dotenv
+from embedding_cache import EmbeddingCache, cache_key
+from transport import negotiate, embeddings_response
+from token_packing import TokenCounter, InputTooLong, pack_requests
+from openai_limiter import RateLimiter
+import numpy as np
 load_dotenv()
 
 EMBED_CALLS = Counter(
@@ -26,8 +29,90 @@ EMBED_ERRORS = Counter(
     ['error_type']
 )
 
+EMBED_BATCH_SIZE = Histogram(
+    'gpt_iep_generate_embeddings_batch_size',
+    'Number of texts embedded per /generate_embeddings call',
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048]
+)
+
+EMBED_CACHE_HITS = Counter(
+    'gpt_iep_generate_embeddings_cache_hits_total',
+    'Number of texts served from the embedding cache',
+    ['tier']
+)
+
+EMBED_CACHE_MISSES = Counter(
+    'gpt_iep_generate_embeddings_cache_misses_total',
+    'Number of distinct texts sent to OpenAI after missing the embedding cache'
+)
+
+EMBED_RESPONSE_BYTES = Histogram(
+    'gpt_iep_generate_embeddings_response_bytes',
+    'Size of /generate_embeddings response bodies by format',
+    ['format'],
+    buckets=[1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7]
+)
+
+EMBED_REQUEST_TOKENS = Histogram(
+    'gpt_iep_embedding_request_tokens',
+    'Estimated tokens per embeddings request sent to OpenAI',
+    buckets=[100, 1000, 5000, 10000, 25000, 50000, 100000, 200000, 300000]
+)
+
+EMBED_REQUEST_FILL = Histogram(
+    'gpt_iep_embedding_request_fill_ratio',
+    'How full each OpenAI embeddings request was: the larger of its token and input counts relative to their limits',
+    buckets=[0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 1.0]
+)
+
+EMBED_TOKEN_ESTIMATE_RATIO = Histogram(
+    'gpt_iep_embedding_token_estimate_ratio',
+    'Estimated over billed tokens per OpenAI embeddings request',
+    buckets=[0.5, 0.8, 0.9, 0.95, 1.0, 1.05, 1.1, 1.25, 1.5, 2.0, 3.0]
+)
+
+EMBED_LONG_INPUTS = Counter(
+    'gpt_iep_embedding_long_inputs_total',
+    'Inputs over the per-input token limit',
+    ['action']
+)
+
+EMBED_CACHE_BYTES = Gauge(
+    'gpt_iep_generate_embeddings_cache_memory_bytes',
+    'Size of the vectors held in the in-memory embedding cache'
+)
+
+EMBEDDING_MODEL = "text-embedding-3-large"
+# Native size of EMBEDDING_MODEL's vectors
+MAX_EMBEDDING_DIMENSIONS = 3072
+# Shortened embeddings (the model's `dimensions` parameter); unset keeps the native size.
+# Requests may ask for another size with a "dimensions" field.
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+
+# OpenAI accepts at most 2048 inputs per embeddings request
+MAX_BATCH_INPUTS = int(os.getenv("MAX_BATCH_INPUTS", "2048"))
+# Token limits: per input (the model's context), per request, and the account's
+# tokens-per-minute quota, which no single request may exceed either
+MAX_INPUT_TOKENS = int(os.getenv("MAX_INPUT_TOKENS", "8191"))
+MAX_REQUEST_TOKENS = int(os.getenv("MAX_REQUEST_TOKENS", "300000"))
+EMBEDDING_TPM = int(os.getenv("EMBEDDING_TPM", "1000000"))
+REQUEST_TOKEN_LIMIT = min(MAX_REQUEST_TOKENS, EMBEDDING_TPM)
+# Inputs over MAX_INPUT_TOKENS: "reject" (400) or "split" (embed the pieces and
+# average them, weighted by their token counts)
+LONG_INPUTS = os.getenv("LONG_INPUTS", "reject")
+
+token_counter = TokenCounter()
+
+# In-memory cache budget, and optional directory for the on-disk tier
+embedding_cache = EmbeddingCache(
+    max_bytes=int(os.getenv("EMBED_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+    disk_dir=os.getenv("EMBED_CACHE_DIR") or None
+)
 
 openai.api_key = os.getenv('OPENAI_API_KEY')
+openai.max_retries = 0
+
+limiter = RateLimiter.from_env()
 
 
 app = Flask(__name__)
@@ -36,13 +121,20 @@ CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
 @app.route("/generate_embeddings", methods=["POST"])
 def generate_embeddings():
     """
-    Generate an embedding for a given text using OpenAI.
+    Generate embeddings for one or more texts using OpenAI.
 
     Expects:
-        JSON body with a "text" field (string).
+        JSON body with either a "text" field (string) or a "texts" field
+        (list of strings). A list is sent to OpenAI in a single call.
+        Optional "dimensions" (int): size of the returned vectors, defaults to
+        EMBEDDING_DIMENSIONS.
 
     Returns:
-        200: {"embedding": [...]}
+        200: {"embedding": [...]} for "text", {"embeddings": [[...], ...]} for "texts",
+             with the "model" and "dimensions" the vectors were made with.
+             Clients accepting application/octet-stream get the raw float32
+             vectors instead, and application/vnd.embeddings.base64+json gets
+             them base64-encoded (see transport.py).
         400: {"error": "Missing or invalid JSON with 'text' key"}
         500: {"error": "<error message from OpenAI>"}
     """
@@ -50,22 +142,146 @@ def generate_embeddings():
     with EMBED_LATENCY.time():
         data = request.get_json()
 
-        if not data or "text" not in data:
+        if not data or ("text" not in data and "texts" not in data):
             EMBED_ERRORS.labels(error_type="bad_request").inc()
             return jsonify({"error": "Missing or invalid JSON with 'text' key"}), 400
 
+        dimensions = data.get("dimensions", EMBEDDING_DIMENSIONS)
+        if dimensions is not None and (
+                type(dimensions) is not int or not 1 <= dimensions <= MAX_EMBEDDING_DIMENSIONS):
+            EMBED_ERRORS.labels(error_type="bad_request").inc()
+            return jsonify({"error": f"'dimensions' must be an integer between 1 and {MAX_EMBEDDING_DIMENSIONS}"}), 400
+        if dimensions == MAX_EMBEDDING_DIMENSIONS:
+            # The native size: same vectors and cache keys as not asking for a size
+            dimensions = None
+        space = {"model": EMBEDDING_MODEL, "dimensions": dimensions or MAX_EMBEDDING_DIMENSIONS}
+
+        if "texts" in data:
+            texts = data["texts"]
+            if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                EMBED_ERRORS.labels(error_type="bad_request").inc()
+                return jsonify({"error": "'texts' must be a list of strings"}), 400
+            if len(texts) > MAX_BATCH_INPUTS:
+                EMBED_ERRORS.labels(error_type="bad_request").inc()
+                return jsonify({"error": f"At most {MAX_BATCH_INPUTS} texts per request"}), 400
+            if not texts:
+                return send_embeddings([], space), 200
+
+            EMBED_BATCH_SIZE.observe(len(texts))
+            try:
+                embeddings = embed_texts(texts, dimensions)
+            except InputTooLong as e:
+                EMBED_ERRORS.labels(error_type="input_too_long").inc()
+                return jsonify({"error": str(e), "position": e.position, "tokens": e.tokens, "limit": e.limit}), 400
+            except Exception as e:
+                EMBED_ERRORS.labels(error_type=type(e).__name__).inc()
+                return jsonify({"error": str(e)}), 503
+
+            return send_embeddings(embeddings, space), 200
+
         text = data["text"]
 
         try:
-            response = openai.embeddings.create(input=text, model="text-embedding-3-large")
-            embedding = response.data[0].embedding
+            embedding = embed_texts([text], dimensions)[0]
+        except InputTooLong as e:
+            EMBED_ERRORS.labels(error_type="input_too_long").inc()
+            return jsonify({"error": str(e), "tokens": e.tokens, "limit": e.limit}), 400
         except Exception as e:
             EMBED_ERRORS.labels(error_type=type(e).__name__).inc()
             return jsonify({"error": str(e)}), 503
 
-        return jsonify({"embedding": embedding}), 200
+        return send_embeddings([embedding], space, single=True), 200
+
+
+def send_embeddings(embeddings, space, single=False):
+    response_format = negotiate(request.accept_mimetypes)
+    response = embeddings_response(embeddings, space, response_format, single=single)
+    EMBED_RESPONSE_BYTES.labels(format=response_format).observe(response.content_length or 0)
+    return response
+
+
+def embed_texts(texts, dimensions=None):
+    """
+    Embed a list of texts, serving repeated texts from the embedding cache.
+
+    Texts missing from the cache are embedded once per distinct cache key and
+    cached. Their token counts are checked against MAX_INPUT_TOKENS before any
+    call (see LONG_INPUTS), then they are packed into as few OpenAI requests as
+    MAX_BATCH_INPUTS and REQUEST_TOKEN_LIMIT allow, each sent through the rate
+    limiter. `dimensions` shortens the vectors (None: the model's native size)
+    and is part of the key.
+
+    Returns:
+        List[List[float]]: One embedding per text, in input order.
+
+    Raises:
+        InputTooLong: If a text is over MAX_INPUT_TOKENS and LONG_INPUTS is "reject".
+    """
+    embeddings = [None] * len(texts)
+    missing = {}  # cache key -> positions of the texts with that key
+    for position, text in enumerate(texts):
+        key = cache_key(EMBEDDING_MODEL, text, dimensions)
+        vector, tier = embedding_cache.get(key)
+        if vector is not None:
+            EMBED_CACHE_HITS.labels(tier=tier).inc()
+            embeddings[position] = vector.tolist()
+        else:
+            missing.setdefault(key, []).append(position)
+
+    if not missing:
+        return embeddings
+    EMBED_CACHE_MISSES.inc(len(missing))
+
+    pieces = {}  # cache key -> [(text, tokens), ...], several when a long text is split
+    for key, positions in missing.items():
+        text = texts[positions[0]]
+        tokens = token_counter.count(text)
+        if tokens <= MAX_INPUT_TOKENS:
+            pieces[key] = [(text, tokens)]
+        elif LONG_INPUTS == "split":
+            EMBED_LONG_INPUTS.labels(action="split").inc()
+            pieces[key] = [(piece, token_counter.count(piece))
+                           for piece in token_counter.split(text, MAX_INPUT_TOKENS)]
+        else:
+            EMBED_LONG_INPUTS.labels(action="rejected").inc()
+            raise InputTooLong(positions[0], tokens, MAX_INPUT_TOKENS)
+
+    items = [(tokens, (key, index, text))
+             for key, key_pieces in pieces.items()
+             for index, (text, tokens) in enumerate(key_pieces)]
+    vectors = {}  # (key, piece index) -> embedding
+    options = {"dimensions": dimensions} if dimensions else {}
+    for batch, batch_tokens in pack_requests(items, MAX_BATCH_INPUTS, REQUEST_TOKEN_LIMIT):
+        EMBED_REQUEST_TOKENS.observe(batch_tokens)
+        EMBED_REQUEST_FILL.observe(max(batch_tokens / REQUEST_TOKEN_LIMIT, len(batch) / MAX_BATCH_INPUTS))
+        response = limiter.call(EMBEDDING_MODEL, lambda: openai.embeddings.with_raw_response.create(
+            input=[text for _, _, text in batch],
+            model=EMBEDDING_MODEL,
+            **options
+        ), tokens=batch_tokens).parse()
+        billed = getattr(getattr(response, "usage", None), "total_tokens", None)
+        if isinstance(billed, int) and billed > 0:
+            EMBED_TOKEN_ESTIMATE_RATIO.observe(batch_tokens / billed)
+        # OpenAI tags each result with the index of its input
+        for item in response.data:
+            key, index, _ = batch[item.index]
+            vectors[(key, index)] = item.embedding
 
+    for key, key_pieces in pieces.items():
+        if len(key_pieces) == 1:
+            embedding = vectors[(key, 0)]
+        else:
+            # Average of the pieces weighted by their length, re-normalized like OpenAI's vectors
+            weights = np.array([max(tokens, 1) for _, tokens in key_pieces], dtype=np.float64)
+            combined = np.average([vectors[(key, index)] for index in range(len(key_pieces))],
+                                  axis=0, weights=weights)
+            embedding = (combined / np.linalg.norm(combined)).tolist()
+        embedding_cache.put(key, embedding)
+        for position in missing[key]:
+            embeddings[position] = embedding
+    EMBED_CACHE_BYTES.set(embedding_cache.size_bytes)
 
+    return embeddings
 
 
 @app.route("/metrics")
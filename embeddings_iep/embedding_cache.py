@@ -0,0 +1,103 @@
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_text(text):
+    """
+    Normalize text before hashing so trivially different inputs share a cache entry:
+    Unicode NFC, surrounding whitespace stripped, inner whitespace runs collapsed.
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(model, text, dimensions=None):
+    # Native-size keys are unchanged from before `dimensions` existed, so old disk entries stay valid
+    if dimensions:
+        model = f"{model}@{dimensions}"
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of embeddings keyed by `cache_key(model, text)`.
+
+    - Memory tier: LRU bounded by the total size of the stored vectors (`max_bytes`).
+    - Disk tier (optional): one file per vector under `disk_dir`, holding the raw
+      little-endian float32 values. Memory misses that hit on disk are promoted.
+
+    Safe to use from several request threads.
+    """
+
+    def __init__(self, max_bytes, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.size_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        """
+        Returns:
+            tuple: (vector, tier) where tier is "memory" or "disk", or (None, None) on a miss.
+        """
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                return vector, "memory"
+
+        vector = self._read_disk(key)
+        if vector is not None:
+            self._put_memory(key, vector)
+            return vector, "disk"
+        return None, None
+
+    def put(self, key, embedding):
+        vector = np.asarray(embedding, dtype="<f4")
+        self._put_memory(key, vector)
+        self._write_disk(key, vector)
+        return vector
+
+    def _put_memory(self, key, vector):
+        if vector.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= previous.nbytes
+            self._entries[key] = vector
+            self.size_bytes += vector.nbytes
+            while self.size_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size_bytes -= evicted.nbytes
+
+    def _disk_path(self, key):
+        # Shard by key prefix to keep directories small
+        return os.path.join(self.disk_dir, key[:2], f"{key}.f32")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            vector = np.fromfile(self._disk_path(key), dtype="<f4")
+        except (FileNotFoundError, ValueError):
+            return None
+        return vector if vector.size else None
+
+    def _write_disk(self, key, vector):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique per process and thread: workers of one server can share the directory
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        vector.tofile(tmp_path)
+        os.replace(tmp_path, path)  # readers never see a partially written file
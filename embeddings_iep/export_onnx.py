@@ -0,0 +1,78 @@
+import argparse
+import os
+import sys
+
+from onnx_encoder import OnnxSentenceEncoder, check_parity
+
+# Exports the SBERT model's transformer to ONNX for SBERT_BACKEND=onnx, optionally
+# with an int8 dynamically-quantized copy, and checks both against PyTorch:
+#
+#   python export_onnx.py [--quantize]
+#
+# Needs torch, sentence-transformers and the onnx package (for quantization).
+# Exits with status 1 if an exported model is not within tolerance of PyTorch.
+
+MODEL_DIR = "model/all-MiniLM-L6-v2"
+PARITY_TEXTS = [
+    "What is the derivative of x squared?",
+    "Photosynthesis converts light energy into chemical energy stored in glucose.",
+    "A hash table maps keys to values in expected constant time.",
+    "The mitochondria is the powerhouse of the cell.",
+    "",
+    "Gradient descent updates parameters in the direction of the negative gradient " * 20,
+]
+
+
+def export(model_dir, output_path):
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModel.from_pretrained(model_dir).eval()
+    sample = tokenizer(["an example sentence", "another one"], padding=True, return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    axes = {0: "batch", 1: "sequence"}
+    torch.onnx.export(
+        model,
+        tuple(sample[name] for name in names),
+        output_path,
+        input_names=names,
+        output_names=["last_hidden_state"],
+        dynamic_axes={**{name: axes for name in names}, "last_hidden_state": axes},
+        opset_version=17,
+    )
+
+
+def quantize(input_path, output_path):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(input_path, output_path, weight_type=QuantType.QInt8)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the SBERT model to ONNX")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--quantize", action="store_true", help="also write an int8 model_int8.onnx")
+    parser.add_argument("--tolerance", type=float, default=1e-4,
+                        help="maximum 1 - cosine between PyTorch and ONNX float32 embeddings")
+    parser.add_argument("--int8-tolerance", type=float, default=2e-2)
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    onnx_dir = os.path.join(args.model_dir, "onnx")
+    os.makedirs(onnx_dir, exist_ok=True)
+    exported = {os.path.join(onnx_dir, "model.onnx"): args.tolerance}
+    export(args.model_dir, os.path.join(onnx_dir, "model.onnx"))
+    if args.quantize:
+        quantize(os.path.join(onnx_dir, "model.onnx"), os.path.join(onnx_dir, "model_int8.onnx"))
+        exported[os.path.join(onnx_dir, "model_int8.onnx")] = args.int8_tolerance
+
+    reference = SentenceTransformer(args.model_dir)
+    failed = False
+    for path, tolerance in exported.items():
+        encoder = OnnxSentenceEncoder(args.model_dir, path)
+        ok, min_cosine, max_diff = check_parity(reference.encode, encoder.encode, PARITY_TEXTS, tolerance)
+        print(f"{path}: min cosine {min_cosine:.6f}, max abs diff {max_diff:.6f} -> {'ok' if ok else 'FAILED'}")
+        failed |= not ok
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,112 @@
+import queue
+import threading
+import time
+from concurrent import futures
+
+
+class _Request:
+    __slots__ = ("items", "future", "enqueued")
+
+    def __init__(self, items):
+        self.items = items
+        self.future = futures.Future()
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent calls into batched calls of `encode`.
+
+    Callers block in `submit(items)`. A single worker thread takes the oldest
+    pending request, keeps collecting requests until `max_wait` seconds have
+    passed since it arrived or `max_batch_size` items are gathered, then runs
+    `encode` once over all their items and hands each caller its own slice of
+    the result. Requests arriving while a batch is encoded form the next batch,
+    so under load batches grow on their own even with `max_wait=0`.
+
+    Args:
+        encode (Callable[[list], Sequence]): Returns one result per item, in order.
+        max_batch_size (int): Items per `encode` call. A request larger than
+            this is still encoded in one call.
+        max_wait (float): Seconds a request may wait for others to join its batch.
+        timeout (float, optional): Seconds a caller waits for its results.
+        batch_size_metric / queue_wait_metric (prometheus Histogram, optional):
+            observe the items per batch and each request's time in the queue.
+    """
+
+    def __init__(self, encode, max_batch_size=64, max_wait=0.005, timeout=None, batch_size_metric=None,
+                 queue_wait_metric=None):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.batch_size_metric = batch_size_metric
+        self.queue_wait_metric = queue_wait_metric
+        self._queue = queue.Queue()
+        self._carried = None  # request that did not fit in the previous batch
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, items):
+        """
+        Encode `items` as part of a batch. Returns their results; raises what `encode`
+        raised, or TimeoutError if they are not encoded within `timeout` seconds.
+        """
+        if not items:
+            return []
+        self._start()
+        request = _Request(list(items))
+        self._queue.put(request)
+        try:
+            return request.future.result(timeout=self.timeout)
+        except futures.TimeoutError:
+            raise TimeoutError(f"Encoding did not finish within {self.timeout}s") from None
+
+    def _start(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                    self._worker.start()
+
+    def _collect(self):
+        first, self._carried = self._carried or self._queue.get(), None
+        batch, size = [first], len(first.items)
+        deadline = first.enqueued + self.max_wait
+        while size < self.max_batch_size:
+            try:
+                # Requests already queued join the batch even once the window is over
+                request = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                break
+            if size + len(request.items) > self.max_batch_size:
+                self._carried = request  # opens the next batch
+                break
+            batch.append(request)
+            size += len(request.items)
+        return batch, size
+
+    def _run(self):
+        while True:
+            batch, size = self._collect()
+            try:
+                self._encode_batch(batch, size)
+            except BaseException as e:
+                # Whatever failed, no caller of the batch is left waiting, and the worker goes on
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _encode_batch(self, batch, size):
+        started = time.perf_counter()
+        if self.batch_size_metric is not None:
+            self.batch_size_metric.observe(size)
+        if self.queue_wait_metric is not None:
+            for request in batch:
+                self.queue_wait_metric.observe(started - request.enqueued)
+
+        results = self.encode([item for request in batch for item in request.items])
+        offset = 0
+        for request in batch:
+            request.future.set_result(results[offset:offset + len(request.items)])
+            offset += len(request.items)
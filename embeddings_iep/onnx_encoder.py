@@ -0,0 +1,105 @@
+import json
+import os
+
+import numpy as np
+
+
+class OnnxSentenceEncoder:
+    """
+    Runs an exported sentence-transformers model (see export_onnx.py) with ONNX
+    Runtime instead of PyTorch: tokenization with the model's `tokenizer.json`,
+    the transformer as an ONNX graph, then mean pooling and L2 normalization,
+    as configured by the model directory's `1_Pooling` and `modules.json`.
+
+    `encode` takes the arguments the service passes to SentenceTransformer.encode,
+    so the two backends are interchangeable.
+
+    Args:
+        model_dir (str): The sentence-transformers model directory.
+        onnx_path (str): The exported (or int8-quantized) ONNX model.
+        intra_op_threads (int): Threads used inside one operator; 0 lets ONNX Runtime decide.
+        inter_op_threads (int): Threads running independent operators in parallel.
+        session (optional): An `onnxruntime.InferenceSession`-like object to use instead
+            of loading `onnx_path`.
+    """
+
+    def __init__(self, model_dir, onnx_path=None, intra_op_threads=0, inter_op_threads=1, session=None):
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, "sentence_bert_config.json")) as f:
+            self.max_seq_length = json.load(f).get("max_seq_length", 256)
+        with open(os.path.join(model_dir, "1_Pooling", "config.json")) as f:
+            pooling = json.load(f)
+        if not pooling.get("pooling_mode_mean_tokens"):
+            raise ValueError("Only mean-pooling models are supported by the ONNX backend")
+        with open(os.path.join(model_dir, "modules.json")) as f:
+            self.normalize = any(module["type"].endswith("Normalize") for module in json.load(f))
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding()
+
+        if session is None:
+            import onnxruntime
+
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = intra_op_threads
+            options.inter_op_num_threads = inter_op_threads
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.session = session
+        self.input_names = {graph_input.name for graph_input in session.get_inputs()}
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, **kwargs):
+        """
+        Embed one text or a list of texts.
+
+        Returns:
+            np.ndarray: float32, shape (dimension,) for a single text, else (texts, dimension).
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        # Sorted by length so each batch pads as little as possible, as SentenceTransformer does
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        embeddings = [None] * len(texts)
+        for start in range(0, len(texts), batch_size):
+            positions = order[start:start + batch_size]
+            for position, embedding in zip(positions, self._encode_batch([texts[i] for i in positions])):
+                embeddings[position] = embedding
+        embeddings = np.stack(embeddings)
+        return embeddings[0] if single else embeddings
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {name: value for name, value in inputs.items()
+                                                   if name in self.input_names})[0]
+
+        mask = attention_mask[:, :, None].astype(np.float32)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings.astype(np.float32)
+
+
+def check_parity(reference, candidate, texts, tolerance):
+    """
+    Compare two encoders on `texts`.
+
+    Returns:
+        tuple: (ok, min_cosine, max_abs_diff), with ok when every pair of embeddings
+        has a cosine similarity of at least 1 - tolerance.
+    """
+    expected = np.asarray(reference(texts), dtype=np.float32)
+    actual = np.asarray(candidate(texts), dtype=np.float32)
+    cosines = (expected * actual).sum(axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1))
+    min_cosine = float(cosines.min())
+    return min_cosine >= 1 - tolerance, min_cosine, float(np.abs(expected - actual).max())
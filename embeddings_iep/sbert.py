@@ -1,17 +1,122 @@
-from sentence_transformers import SentenceTransformer , util
-from flask import jsonify, request , Flask 
+from flask import jsonify, request , Flask, Response
+import json
 from flask_cors import CORS
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
-# Load the SBERT model (e.g., 'all-MiniLM-L6-v2' is lightweight and CPU-friendly)
-model = SentenceTransformer('model/all-MiniLM-L6-v2')
+from prometheus_client import generate_latest, Histogram
+import numpy as np
+import logging
+import os
+import threading
+from micro_batcher import MicroBatcher
+from similarity import encode_unique, similarity_blocks
+
+MODEL_DIR = 'model/all-MiniLM-L6-v2'
+# "torch" (SentenceTransformer) or "onnx" (ONNX Runtime, see export_onnx.py)
+SBERT_BACKEND = os.getenv("SBERT_BACKEND", "torch")
+# model.onnx, or model_int8.onnx for the dynamically quantized export
+SBERT_ONNX_PATH = os.getenv("SBERT_ONNX_PATH", os.path.join(MODEL_DIR, "onnx", "model.onnx"))
+# ONNX Runtime threads inside one operator (0: one per core) and across operators
+SBERT_ONNX_INTRA_THREADS = int(os.getenv("SBERT_ONNX_INTRA_THREADS", "0"))
+SBERT_ONNX_INTER_THREADS = int(os.getenv("SBERT_ONNX_INTER_THREADS", "1"))
+# "background": start serving at once and load the model in a background thread
+# (/ready answers 503 until it is warmed up); "eager": load before serving
+SBERT_STARTUP = os.getenv("SBERT_STARTUP", "background")
+
+
+def load_model():
+    if SBERT_BACKEND == "onnx":
+        from onnx_encoder import OnnxSentenceEncoder
+        return OnnxSentenceEncoder(MODEL_DIR, SBERT_ONNX_PATH,
+                                   intra_op_threads=SBERT_ONNX_INTRA_THREADS,
+                                   inter_op_threads=SBERT_ONNX_INTER_THREADS)
+    if SBERT_BACKEND != "torch":
+        raise ValueError(f"Unknown SBERT backend: '{SBERT_BACKEND}'. Supported backends are torch and onnx.")
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MODEL_DIR)
+
+
+# The SBERT model (e.g., 'all-MiniLM-L6-v2' is lightweight and CPU-friendly), set by warm_up
+model = None
+model_lock = threading.Lock()
+startup_error = None
+
+
+def warm_up():
+    """
+    Load the model if needed and run one dummy encode, which pays for the lazy
+    initialization of the first real call. Requests arriving meanwhile wait here.
+
+    Returns:
+        The loaded model.
+    """
+    global model
+    if model is None:
+        with model_lock:
+            if model is None:
+                loaded = load_model()
+                loaded.encode(["warm-up"], batch_size=1, convert_to_numpy=True)
+                model = loaded
+    return model
+
+
+def warm_up_in_background():
+    global startup_error
+    try:
+        warm_up()
+    except Exception as e:
+        startup_error = e
+        logging.exception("Failed to load the SBERT model")
+
+# Concurrent requests are encoded together: a request waits at most SBERT_BATCH_WAIT_MS
+# for others to join its batch, and a batch holds at most SBERT_MAX_BATCH_SIZE texts
+SBERT_MAX_BATCH_SIZE = int(os.getenv("SBERT_MAX_BATCH_SIZE", "64"))
+SBERT_BATCH_WAIT_MS = float(os.getenv("SBERT_BATCH_WAIT_MS", "5"))
+# Seconds a request waits for its embeddings, model loading included
+SBERT_REQUEST_TIMEOUT = float(os.getenv("SBERT_REQUEST_TIMEOUT", "120"))
+
+SBERT_BATCH_SIZE = Histogram(
+    'sbert_encode_batch_size',
+    'Number of texts per model.encode call',
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256]
+)
+
+SBERT_QUEUE_WAIT = Histogram(
+    'sbert_queue_wait_seconds',
+    'Time a request waited for its batch to start encoding',
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+)
+
+# /similarity_matrix limits: texts per list, rows per computed (and streamed) block,
+# and matrix cells returned in one non-streamed JSON response
+SIMILARITY_MAX_TEXTS = int(os.getenv("SIMILARITY_MAX_TEXTS", "5000"))
+SIMILARITY_BLOCK_ROWS = int(os.getenv("SIMILARITY_BLOCK_ROWS", "256"))
+SIMILARITY_MAX_CELLS = int(os.getenv("SIMILARITY_MAX_CELLS", "1000000"))
+
+batcher = MicroBatcher(
+    lambda texts: warm_up().encode(texts, batch_size=len(texts), convert_to_numpy=True),
+    max_batch_size=SBERT_MAX_BATCH_SIZE,
+    max_wait=SBERT_BATCH_WAIT_MS / 1000,
+    timeout=SBERT_REQUEST_TIMEOUT,
+    batch_size_metric=SBERT_BATCH_SIZE,
+    queue_wait_metric=SBERT_QUEUE_WAIT,
+)
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-VAULT_URL = "https://vault503n.vault.azure.net/"
-credential = DefaultAzureCredential()
-client = SecretClient(vault_url=VAULT_URL, credential=credential)
+@app.route("/", methods=["GET"])
+def healthcheck():
+    return jsonify({"status": "ok"}), 200
+
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """200 once the model is loaded and warmed up, 503 while loading, 500 if loading failed."""
+    if model is not None:
+        return jsonify({"status": "ready", "backend": SBERT_BACKEND}), 200
+    if startup_error is not None:
+        return jsonify({"status": "failed", "error": str(startup_error)}), 500
+    return jsonify({"status": "loading"}), 503
+
 
 @app.route("/generate_embeddings", methods=["POST"])
 def generate_embeddings():
@@ -20,14 +125,18 @@ def generate_embeddings():
         return jsonify({"error": "Missing or invalid JSON with 'text' key"}), 400
 
     text = data["text"]
+    # One text gets one embedding, a list of texts one embedding per text
+    texts = [text] if isinstance(text, str) else text
+    if not isinstance(texts, list) or not all(isinstance(item, str) for item in texts):
+        return jsonify({"error": "'text' must be a string or a list of strings"}), 400
 
     try:
-        # Generate embeddings locally
-        embedding = model.encode(text).tolist()
+        # Generate embeddings locally, batched with concurrent requests
+        embeddings = [embedding.tolist() for embedding in batcher.submit(texts)]
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-    return jsonify({"embedding": embedding}), 200
+    return jsonify({"embedding": embeddings[0] if isinstance(text, str) else embeddings}), 200
 
 @app.route("/similarity", methods=["POST"])
 def sim():
@@ -37,18 +146,86 @@ def sim():
 
     text1 = data["text1"]
     text2 = data["text2"]
+    if not isinstance(text1, str) or not isinstance(text2, str):
+        return jsonify({"error": "'text1' and 'text2' must be strings"}), 400
 
     try:
-        # Generate embeddings locally
-        embedding1 = model.encode(text1)
-        embedding2 = model.encode(text2)
+        # Generate embeddings locally, batched with concurrent requests
+        embedding1, embedding2 = batcher.submit([text1, text2])
 
         # Compute cosine similarity
-        similarity = util.cos_sim(embedding1, embedding2).item()
+        similarity = float(np.dot(embedding1, embedding2) / (np.linalg.norm(embedding1) * np.linalg.norm(embedding2)))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
     return jsonify({"similarity": similarity}), 200
 
+
+@app.route("/similarity_matrix", methods=["POST"])
+def similarity_matrix():
+    """
+    Cosine similarities between two lists of texts, each distinct text encoded once.
+
+    Expects:
+        JSON body with "queries" (list of strings) and optionally "documents" (list
+        of strings; defaults to the queries themselves, e.g. to find duplicate notes,
+        in which case top_k skips each text's match with itself), "top_k" (int) and
+        "stream" (bool).
+
+    Returns:
+        200: {"matrix": [[...], ...]} with one row per query, or with "top_k"
+             {"top_k": [{"indices": [...], "scores": [...]}, ...]}.
+             With "stream" (or Accept: application/x-ndjson), NDJSON lines of
+             {"start": <first row>, "matrix" | "top_k": <rows>} per block of rows.
+        400: Invalid input.
+        413: The full matrix is too large for one response: stream it or use top_k.
+        500: {"error": "<encoding error>"}
+    """
+    data = request.get_json(silent=True)
+    if not data or "queries" not in data:
+        return jsonify({"error": "Missing or invalid JSON with 'queries' key"}), 400
+
+    queries = data["queries"]
+    documents = data.get("documents")
+    top_k = data.get("top_k")
+    self_similarity = documents is None
+    documents = queries if self_similarity else documents
+    for name, texts in (("queries", queries), ("documents", documents)):
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            return jsonify({"error": f"'{name}' must be a list of strings"}), 400
+        if len(texts) > SIMILARITY_MAX_TEXTS:
+            return jsonify({"error": f"At most {SIMILARITY_MAX_TEXTS} {name} per request"}), 400
+    if top_k is not None and (type(top_k) is not int or top_k < 1):
+        return jsonify({"error": "'top_k' must be a positive integer"}), 400
+
+    stream = data.get("stream", False) or request.accept_mimetypes.best == "application/x-ndjson"
+    if not stream and top_k is None and len(queries) * len(documents) > SIMILARITY_MAX_CELLS:
+        return jsonify({"error": "Similarity matrix too large; use 'stream' or 'top_k'"}), 413
+
+    try:
+        embeddings = encode_unique(queries + ([] if self_similarity else documents),
+                                   batcher.submit, SBERT_MAX_BATCH_SIZE)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    query_embeddings = embeddings[:len(queries)]
+    document_embeddings = query_embeddings if self_similarity else embeddings[len(queries):]
+
+    key = "matrix" if top_k is None else "top_k"
+    blocks = similarity_blocks(query_embeddings, document_embeddings, SIMILARITY_BLOCK_ROWS,
+                               top_k=top_k, exclude_self=self_similarity)
+    if stream:
+        lines = (json.dumps({"start": start, key: rows}) + "\n" for start, rows in blocks)
+        return Response(lines, mimetype="application/x-ndjson")
+    return jsonify({key: [row for _, rows in blocks for row in rows]}), 200
+
+
+@app.route("/metrics")
+def metrics():
+    return generate_latest(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
 if __name__ == '__main__':
+    if SBERT_STARTUP == "eager":
+        warm_up()
+    else:
+        threading.Thread(target=warm_up_in_background, name="sbert-warm-up", daemon=True).start()
     app.run(host="0.0.0.0", port=3001)
\ No newline at end of file
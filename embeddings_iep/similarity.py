@@ -0,0 +1,63 @@
+import numpy as np
+
+
+def encode_unique(texts, encode, batch_size):
+    """
+    Embed `texts`, running `encode` once per distinct text, `batch_size` texts per call.
+
+    Returns:
+        np.ndarray: One L2-normalized row per input text, in input order.
+    """
+    positions = {}
+    unique = []
+    for text in texts:
+        if text not in positions:
+            positions[text] = len(unique)
+            unique.append(text)
+
+    if not unique:
+        return np.empty((0, 0), dtype=np.float32)
+    embeddings = np.concatenate([
+        np.asarray(encode(unique[start:start + batch_size]), dtype=np.float32)
+        for start in range(0, len(unique), batch_size)
+    ])
+    embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+    return embeddings[[positions[text] for text in texts]]
+
+
+def similarity_blocks(queries, documents, block_rows, top_k=None, exclude_self=False):
+    """
+    Cosine similarities of normalized `queries` against normalized `documents`,
+    computed `block_rows` query rows at a time with one matrix product per block.
+
+    Args:
+        top_k (int, optional): Keep only the best `top_k` documents of each row.
+        exclude_self (bool): Skip the diagonal in top_k (queries and documents are
+            the same list).
+
+    Yields:
+        tuple: (first row, block) where block is a list of score rows, or with
+        top_k a list of {"indices": [...], "scores": [...]} sorted by score.
+    """
+    for start in range(0, len(queries), block_rows):
+        scores = queries[start:start + block_rows] @ documents.T
+        if top_k is None:
+            yield start, np.round(scores, 6).tolist()
+            continue
+
+        if exclude_self:
+            rows = np.arange(len(scores))
+            scores[rows, start + rows] = -np.inf
+        k = min(top_k, documents.shape[0] - (1 if exclude_self else 0))
+        if k <= 0:
+            yield start, [{"indices": [], "scores": []} for _ in range(len(scores))]
+            continue
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        yield start, [
+            {"indices": indices.tolist(), "scores": np.round(row_scores, 6).tolist()}
+            for indices, row_scores in zip(best, best_scores)
+        ]
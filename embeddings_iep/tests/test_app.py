@@ -1,6 +1,12 @@
 import pytest
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from ..app import app
+import base64
 import json
+from unittest.mock import patch
+import numpy as np
+from embedding_cache import EmbeddingCache, cache_key
 
 @pytest.fixture
 def client():
@@ -38,4 +44,142 @@ def test_generate_embeddings(client):
     assert response.status_code == 200 or response.status_code == 400  
     if response.status_code == 200:
         embedding = response.get_json().get("embedding", [])
-        assert isinstance(embedding, list)
\ No newline at end of file
+        assert isinstance(embedding, list)
+
+def test_generate_embeddings_batch(client):
+    class Item:
+        def __init__(self, index):
+            self.index = index
+            self.embedding = [float(index), 1.0]
+
+    with patch("embeddings_iep.app.openai.embeddings.with_raw_response.create") as mock_create:
+        # OpenAI may return results out of order; the IEP must restore input order
+        mock_create.return_value.parse.return_value.data = [Item(1), Item(0)]
+        response = client.post('/generate_embeddings', data=json.dumps({"texts": ["a", "b"]}), content_type='application/json')
+
+    assert response.status_code == 200
+    assert response.get_json()["embeddings"] == [[0.0, 1.0], [1.0, 1.0]]
+    mock_create.assert_called_once_with(input=["a", "b"], model="text-embedding-3-large")
+
+    # --- "texts" must be a list of strings ---
+    response = client.post('/generate_embeddings', data=json.dumps({"texts": "a"}), content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_generate_embeddings_uses_cache(client):
+    class Item:
+        index = 0
+        embedding = [0.5, 0.25]
+
+    with patch("embeddings_iep.app.openai.embeddings.with_raw_response.create") as mock_create:
+        mock_create.return_value.parse.return_value.data = [Item()]
+        first = client.post('/generate_embeddings', data=json.dumps({"text": "cached  text "}), content_type='application/json')
+        # Same text after whitespace normalization: served from the cache
+        second = client.post('/generate_embeddings', data=json.dumps({"text": "cached text"}), content_type='application/json')
+
+    assert first.get_json()["embedding"] == second.get_json()["embedding"] == [0.5, 0.25]
+    mock_create.assert_called_once()
+
+
+def test_embedding_cache_evicts_by_size(tmp_path):
+    vector_bytes = 4 * 4  # four float32 values
+    cache = EmbeddingCache(max_bytes=2 * vector_bytes, disk_dir=str(tmp_path))
+    for name in ["a", "b", "c"]:
+        cache.put(cache_key("m", name), [1.0, 2.0, 3.0, 4.0])
+
+    assert cache.size_bytes == 2 * vector_bytes
+    # "a" was evicted from memory but is still on disk
+    vector, tier = cache.get(cache_key("m", "a"))
+    assert tier == "disk"
+    assert vector.tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert cache.get(cache_key("m", "a"))[1] == "memory"
+    assert cache.get(cache_key("other-model", "a")) == (None, None)
+
+
+def test_generate_embeddings_with_dimensions(client):
+    class Item:
+        index = 0
+        embedding = [0.6, 0.8]
+
+    with patch("embeddings_iep.app.openai.embeddings.with_raw_response.create") as mock_create:
+        mock_create.return_value.parse.return_value.data = [Item()]
+        response = client.post('/generate_embeddings', data=json.dumps({"texts": ["short"], "dimensions": 2}), content_type='application/json')
+
+    assert response.status_code == 200
+    assert response.get_json()["dimensions"] == 2
+    mock_create.assert_called_once_with(input=["short"], model="text-embedding-3-large", dimensions=2)
+    # Shortened vectors are cached apart from native-size ones
+    assert cache_key("text-embedding-3-large", "short", 2) != cache_key("text-embedding-3-large", "short")
+
+    response = client.post('/generate_embeddings', data=json.dumps({"text": "a", "dimensions": 4096}), content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_generate_embeddings_native_dimensions_use_unsized_cache_entries(client):
+    from embeddings_iep.app import embedding_cache
+    embedding_cache.put(cache_key("text-embedding-3-large", "native size"), [0.25, 0.75])
+
+    with patch("embeddings_iep.app.openai.embeddings.with_raw_response.create") as mock_create:
+        response = client.post('/generate_embeddings', data=json.dumps({"text": "native size", "dimensions": 3072}), content_type='application/json')
+
+    assert response.status_code == 200
+    assert response.get_json()["embedding"] == [0.25, 0.75]
+    assert response.get_json()["dimensions"] == 3072
+    mock_create.assert_not_called()
+
+
+def test_generate_embeddings_binary_formats(client):
+    class Item:
+        def __init__(self, index):
+            self.index = index
+            self.embedding = [float(index), 0.5]
+
+    with patch("embeddings_iep.app.openai.embeddings.with_raw_response.create") as mock_create:
+        mock_create.return_value.parse.return_value.data = [Item(0), Item(1)]
+        binary = client.post('/generate_embeddings', data=json.dumps({"texts": ["x", "y"], "dimensions": 2}),
+                             content_type='application/json', headers={"Accept": "application/octet-stream"})
+        encoded = client.post('/generate_embeddings', data=json.dumps({"text": "x", "dimensions": 2}),
+                              content_type='application/json',
+                              headers={"Accept": "application/vnd.embeddings.base64+json"})
+        default = client.post('/generate_embeddings', data=json.dumps({"text": "x", "dimensions": 2}),
+                              content_type='application/json', headers={"Accept": "*/*"})
+
+    assert binary.mimetype == "application/octet-stream"
+    assert binary.headers["X-Embedding-Shape"] == "2,2"
+    assert np.frombuffer(binary.data, dtype="<f4").reshape(2, 2).tolist() == [[0.0, 0.5], [1.0, 0.5]]
+
+    body = encoded.get_json(force=True)
+    assert body["shape"] == [2]
+    assert np.frombuffer(base64.b64decode(body["embedding_base64"]), dtype=body["dtype"]).tolist() == [0.0, 0.5]
+
+    # Clients that ask for nothing specific keep getting float lists
+    assert default.get_json()["embedding"] == [0.0, 0.5]
+
+
+def test_generate_embeddings_long_inputs(client):
+    class Item:
+        def __init__(self, index, embedding):
+            self.index = index
+            self.embedding = embedding
+
+    with patch("embeddings_iep.app.MAX_INPUT_TOKENS", 4), \
+            patch("embeddings_iep.app.openai.embeddings.with_raw_response.create") as mock_create:
+        # Rejected up front, before any OpenAI call
+        response = client.post('/generate_embeddings', data=json.dumps({"texts": ["ok", "x" * 60]}),
+                               content_type='application/json')
+        assert response.status_code == 400
+        assert response.get_json()["position"] == 1
+        mock_create.assert_not_called()
+
+        # Split, embedded in one request, and averaged by token count
+        mock_create.return_value.parse.return_value.data = [Item(0, [1.0, 0.0]), Item(1, [0.0, 1.0])]
+        with patch("embeddings_iep.app.LONG_INPUTS", "split"), \
+                patch("embeddings_iep.app.token_counter._encoding", None):
+            response = client.post('/generate_embeddings', data=json.dumps({"text": "y" * 18}),
+                                   content_type='application/json')
+
+    assert response.status_code == 200
+    assert len(mock_create.call_args.kwargs["input"]) == 2
+    embedding = response.get_json()["embedding"]
+    assert embedding[0] > embedding[1] > 0
+    assert np.isclose(np.linalg.norm(embedding), 1.0)
@@ -0,0 +1,100 @@
+import sys, os
+import threading
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from micro_batcher import MicroBatcher
+
+
+def run_concurrently(batcher, requests):
+    results = [None] * len(requests)
+
+    def call(position):
+        results[position] = batcher.submit(requests[position])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return results
+
+
+def test_concurrent_requests_share_one_encode():
+    calls = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        return [text.upper() for text in texts]
+
+    batcher = MicroBatcher(encode, max_batch_size=16, max_wait=0.2)
+    results = run_concurrently(batcher, [["a"], ["b", "c"], ["d"]])
+
+    assert results == [["A"], ["B", "C"], ["D"]]
+    assert len(calls) == 1
+    assert sorted(calls[0]) == ["a", "b", "c", "d"]
+
+
+def test_batches_are_capped_and_keep_arrival_order():
+    calls = []
+    release = threading.Event()
+
+    def encode(texts):
+        release.wait(timeout=5)
+        calls.append(list(texts))
+        return texts
+
+    batcher = MicroBatcher(encode, max_batch_size=2, max_wait=0)
+    first = threading.Thread(target=batcher.submit, args=(["first"],))
+    first.start()
+    time.sleep(0.05)  # the worker is now blocked encoding "first"
+
+    waiting = [threading.Thread(target=batcher.submit, args=([name],)) for name in ["x", "y", "z"]]
+    for thread in waiting:
+        thread.start()
+        time.sleep(0.01)
+    release.set()
+    for thread in [first, *waiting]:
+        thread.join(timeout=5)
+
+    assert calls == [["first"], ["x", "y"], ["z"]]
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    def encode(texts):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher(encode, max_batch_size=8, max_wait=0.01)
+    with pytest.raises(RuntimeError):
+        batcher.submit(["a"])
+    # The worker survives a failed batch
+    batcher.encode = lambda texts: texts
+    assert batcher.submit(["b"]) == ["b"]
+
+
+def test_worker_survives_any_exception():
+    class Fatal(BaseException):
+        pass
+
+    def encode(texts):
+        raise Fatal()
+
+    batcher = MicroBatcher(encode, max_batch_size=8, max_wait=0, timeout=5)
+    with pytest.raises(Fatal):
+        batcher.submit(["a"])
+    batcher.encode = lambda texts: texts
+    assert batcher.submit(["b"]) == ["b"]
+
+
+def test_callers_stop_waiting_after_the_timeout():
+    release = threading.Event()
+
+    def encode(texts):
+        release.wait(timeout=5)
+        return texts
+
+    batcher = MicroBatcher(encode, max_batch_size=8, max_wait=0, timeout=0.05)
+    with pytest.raises(TimeoutError):
+        batcher.submit(["slow"])
+    release.set()
+    assert batcher.submit(["fast"]) == ["fast"]
@@ -0,0 +1,65 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+from onnx_encoder import OnnxSentenceEncoder, check_parity
+
+MODEL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'model', 'all-MiniLM-L6-v2'))
+
+
+class Input:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeSession:
+    """Stands in for the transformer: each token's embedding is a fixed function of its id."""
+
+    def __init__(self):
+        self.batches = []
+
+    def get_inputs(self):
+        return [Input("input_ids"), Input("attention_mask")]
+
+    def run(self, output_names, inputs):
+        assert set(inputs) == {"input_ids", "attention_mask"}
+        self.batches.append(inputs["input_ids"].shape)
+        ids = inputs["input_ids"].astype(np.float32)
+        return [np.stack([np.sin(ids), np.cos(ids), (ids % 7) / 7], axis=-1)]
+
+
+def test_mean_pooling_ignores_padding_and_keeps_order():
+    session = FakeSession()
+    encoder = OnnxSentenceEncoder(MODEL_DIR, session=session)
+    texts = ["short", "a much longer sentence about gradient descent", "mid length text"]
+
+    batched = encoder.encode(texts, batch_size=8)
+    alone = np.stack([encoder.encode(text) for text in texts])
+
+    assert batched.shape == (3, 3)
+    np.testing.assert_allclose(batched, alone, atol=1e-6)
+    # Normalized, as modules.json lists a Normalize module
+    np.testing.assert_allclose(np.linalg.norm(batched, axis=1), 1.0, rtol=1e-5)
+
+    ids = encoder.tokenizer.encode("short").ids
+    expected = np.stack([np.sin(ids), np.cos(ids), np.array(ids) % 7 / 7], axis=-1).mean(axis=0)
+    np.testing.assert_allclose(batched[0], expected / np.linalg.norm(expected), atol=1e-4)
+
+
+def test_batches_and_truncation():
+    session = FakeSession()
+    encoder = OnnxSentenceEncoder(MODEL_DIR, session=session)
+
+    encoder.encode(["word " * 1000] + ["x"] * 4, batch_size=2)
+
+    assert len(session.batches) == 3
+    assert max(shape[1] for shape in session.batches) == encoder.max_seq_length
+
+
+def test_check_parity():
+    reference = lambda texts: np.array([[1.0, 0.0], [0.0, 1.0]])
+    close = lambda texts: np.array([[1.0, 0.001], [0.0, 1.0]])
+    far = lambda texts: np.array([[0.0, 1.0], [0.0, 1.0]])
+
+    ok, min_cosine, _ = check_parity(reference, close, ["a", "b"], tolerance=1e-4)
+    assert ok and min_cosine > 0.9999
+    assert not check_parity(reference, far, ["a", "b"], tolerance=1e-4)[0]
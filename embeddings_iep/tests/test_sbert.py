@@ -0,0 +1,84 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import numpy as np
+import pytest
+import sbert
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        self.calls.append(list(texts))
+        return np.array([[len(text) + 1.0, text.count("a") + 1.0] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = FakeModel()
+    monkeypatch.setattr(sbert, "load_model", lambda: fake)
+    monkeypatch.setattr(sbert, "model", None)
+    monkeypatch.setattr(sbert, "startup_error", None)
+    sbert.app.config['TESTING'] = True
+    with sbert.app.test_client() as client:
+        client.fake = fake
+        yield client
+
+
+def test_ready_only_after_warm_up(client):
+    assert client.get('/').status_code == 200
+    assert client.get('/ready').status_code == 503
+
+    sbert.warm_up_in_background()
+
+    assert client.get('/ready').status_code == 200
+    assert client.fake.calls == [["warm-up"]]
+
+
+def test_failed_startup_is_reported(client, monkeypatch):
+    def broken():
+        raise OSError("model files missing")
+    monkeypatch.setattr(sbert, "load_model", broken)
+
+    sbert.warm_up_in_background()
+
+    response = client.get('/ready')
+    assert response.status_code == 500
+    assert "model files missing" in response.get_json()["error"]
+
+
+def test_generate_embeddings_accepts_a_text_or_a_list(client):
+    single = client.post('/generate_embeddings', data=json.dumps({"text": "aa"}), content_type='application/json')
+    assert single.status_code == 200
+    assert single.get_json()["embedding"] == [3.0, 3.0]
+
+    several = client.post('/generate_embeddings', data=json.dumps({"text": ["aa", "b"]}),
+                          content_type='application/json')
+    assert several.status_code == 200
+    assert several.get_json()["embedding"] == [[3.0, 3.0], [2.0, 1.0]]
+
+    for text in (42, ["aa", None]):
+        invalid = client.post('/generate_embeddings', data=json.dumps({"text": text}),
+                              content_type='application/json')
+        assert invalid.status_code == 400
+
+
+def test_requests_load_the_model_on_demand(client):
+    response = client.post('/similarity_matrix', data=json.dumps({
+        "queries": ["aa", "b", "aa"],
+        "documents": ["b", "aaa"],
+        "top_k": 1,
+    }), content_type='application/json')
+
+    assert response.status_code == 200
+    assert [row["indices"] for row in response.get_json()["top_k"]] == [[1], [0], [1]]
+    # Warm-up first, then the three distinct texts in one encode
+    assert client.fake.calls == [["warm-up"], ["aa", "b", "aaa"]]
+
+    streamed = client.post('/similarity_matrix', data=json.dumps({"queries": ["a", "bb"], "stream": True}),
+                           content_type='application/json')
+    lines = [json.loads(line) for line in streamed.get_data(as_text=True).splitlines()]
+    assert streamed.mimetype == "application/x-ndjson"
+    assert lines[0]["start"] == 0 and len(lines[0]["matrix"]) == 2
@@ -0,0 +1,50 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+from similarity import encode_unique, similarity_blocks
+
+
+def fake_encode(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[len(text), text.count("a") + 1.0, 1.0] for text in texts])
+    return encode
+
+
+def test_encode_unique_encodes_each_text_once():
+    calls = []
+    embeddings = encode_unique(["aa", "b", "aa", "ccc", "b"], fake_encode(calls), batch_size=2)
+
+    assert calls == [["aa", "b"], ["ccc"]]
+    assert embeddings.shape == (5, 3)
+    np.testing.assert_array_equal(embeddings[0], embeddings[2])
+    np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0, rtol=1e-6)
+
+
+def test_blocks_match_the_full_matrix():
+    queries = encode_unique(["a", "ab", "abc", "xyz", "aaaa"], fake_encode([]), batch_size=8)
+    documents = encode_unique(["a", "bb", "aaa"], fake_encode([]), batch_size=8)
+
+    blocks = list(similarity_blocks(queries, documents, block_rows=2))
+
+    assert [start for start, _ in blocks] == [0, 2, 4]
+    matrix = np.array([row for _, rows in blocks for row in rows])
+    np.testing.assert_allclose(matrix, queries @ documents.T, atol=1e-6)
+
+
+def test_top_k_is_sorted_and_can_skip_self_matches():
+    texts = encode_unique(["a", "aa", "bbbbbb", "a "], fake_encode([]), batch_size=8)
+    full = texts @ texts.T
+
+    rows = [row for _, rows in similarity_blocks(texts, texts, block_rows=3, top_k=2, exclude_self=True)
+            for row in rows]
+
+    for i, row in enumerate(rows):
+        assert i not in row["indices"]
+        expected = [j for j in np.argsort(-full[i], kind="stable") if j != i][:2]
+        assert row["indices"] == expected
+        assert row["scores"] == sorted(row["scores"], reverse=True)
+
+    # top_k larger than the documents returns every document
+    rows = [row for _, rows in similarity_blocks(texts[:1], texts, block_rows=3, top_k=10) for row in rows]
+    assert len(rows[0]["indices"]) == 4
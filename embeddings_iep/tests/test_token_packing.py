@@ -0,0 +1,42 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from token_packing import TokenCounter, pack_requests
+
+
+def estimating_counter():
+    counter = TokenCounter()
+    counter._encoding = None  # the length-based estimate, whether or not tiktoken is installed
+    return counter
+
+
+def test_pack_requests_respects_both_limits():
+    items = [(tokens, name) for name, tokens in
+             [("a", 60), ("b", 50), ("c", 40), ("d", 30), ("e", 20), ("f", 10), ("g", 10)]]
+
+    requests = pack_requests(items, max_inputs=3, max_tokens=100)
+
+    assert all(len(payloads) <= 3 and tokens <= 100 for payloads, tokens in requests)
+    assert sorted(name for payloads, _ in requests for name in payloads) == list("abcdefg")
+    # 220 tokens need at least three requests of 100
+    assert len(requests) == 3
+    assert requests[0] == (["a", "c"], 100)
+
+
+def test_estimate_and_split_without_tiktoken():
+    counter = estimating_counter()
+    assert counter.count("abcdef") == 2
+    assert counter.count("é") == 1  # two UTF-8 bytes
+
+    text = "word " * 100
+    pieces = counter.split(text, max_tokens=20)
+    assert "".join(pieces) == text
+    assert all(counter.count(piece) <= 20 for piece in pieces)
+    assert len(pieces) == 9
+
+
+def test_encoding_is_loaded_on_first_use():
+    counter = TokenCounter(encoding_name="no-such-encoding")
+    assert counter._encoding is TokenCounter._UNLOADED
+    # An encoding that cannot be loaded falls back to the estimate
+    assert counter.count("abcdef") == 2
+    assert not counter.exact
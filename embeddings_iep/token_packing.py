@@ -0,0 +1,102 @@
+import logging
+import math
+import threading
+
+# Without tiktoken, tokens are estimated as UTF-8 bytes / this. English prose averages
+# about 4.5 bytes per cl100k token, so the estimate errs on the high side.
+ESTIMATED_BYTES_PER_TOKEN = 3
+
+
+class InputTooLong(ValueError):
+    """Raised when an input exceeds the model's per-input token limit and splitting is off."""
+
+    def __init__(self, position, tokens, limit):
+        super().__init__(f"Text {position} has about {tokens} tokens; the embedding model accepts at most {limit}")
+        self.position = position
+        self.tokens = tokens
+        self.limit = limit
+
+
+class TokenCounter:
+    """
+    Counts tokens the way OpenAI will bill them, with tiktoken's `encoding_name`
+    when it can be loaded, otherwise with a conservative estimate from the UTF-8
+    length.
+
+    The encoding is loaded on first use: tiktoken downloads its vocabulary unless
+    it is in TIKTOKEN_CACHE_DIR, which must not hold up the service's startup.
+    """
+
+    _UNLOADED = object()
+
+    def __init__(self, encoding_name="cl100k_base"):
+        self.encoding_name = encoding_name
+        self._encoding = self._UNLOADED
+        self._lock = threading.Lock()
+
+    @property
+    def encoding(self):
+        """The tiktoken encoding, or None if it could not be loaded."""
+        if self._encoding is self._UNLOADED:
+            with self._lock:
+                if self._encoding is self._UNLOADED:
+                    try:
+                        import tiktoken
+                        self._encoding = tiktoken.get_encoding(self.encoding_name)
+                    except Exception as e:
+                        logging.warning(f"tiktoken unavailable ({e}); estimating token counts from text length")
+                        self._encoding = None
+        return self._encoding
+
+    @property
+    def exact(self):
+        return self.encoding is not None
+
+    def count(self, text):
+        encoding = self.encoding
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        return math.ceil(len(text.encode("utf-8")) / ESTIMATED_BYTES_PER_TOKEN)
+
+    def split(self, text, max_tokens):
+        """Cut `text` into consecutive pieces of at most `max_tokens` tokens each."""
+        encoding = self.encoding
+        if encoding is not None:
+            tokens = encoding.encode(text, disallowed_special=())
+            return [encoding.decode(tokens[start:start + max_tokens])
+                    for start in range(0, len(tokens), max_tokens)]
+
+        max_bytes = max_tokens * ESTIMATED_BYTES_PER_TOKEN
+        pieces, start, size = [], 0, 0
+        for end, character in enumerate(text):
+            width = len(character.encode("utf-8"))
+            if size + width > max_bytes:
+                pieces.append(text[start:end])
+                start, size = end, 0
+            size += width
+        pieces.append(text[start:])
+        return pieces
+
+
+def pack_requests(items, max_inputs, max_tokens):
+    """
+    Group inputs into as few requests as possible, each holding at most `max_inputs`
+    inputs and `max_tokens` tokens (first-fit decreasing).
+
+    Args:
+        items (List[tuple]): (token count, payload) per input; every count must be
+            at most `max_tokens`.
+
+    Returns:
+        List[Tuple[List, int]]: (payloads, token total) per request.
+    """
+    requests = []  # [payloads, tokens]
+    for tokens, payload in sorted(items, key=lambda item: -item[0]):
+        for request in requests:
+            if len(request[0]) < max_inputs and request[1] + tokens <= max_tokens:
+                request[0].append(payload)
+                request[1] += tokens
+                break
+        else:
+            requests.append([[payload], tokens])
+    return [(payloads, tokens) for payloads, tokens in requests]
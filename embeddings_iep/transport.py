@@ -0,0 +1,57 @@
+import base64
+
+import numpy as np
+from flask import Response, jsonify
+
+# Response formats of /generate_embeddings, chosen by the request's Accept header:
+# - JSON: lists of floats (the default, for clients that ask for nothing else)
+# - BINARY: the raw little-endian float32 matrix, its shape in SHAPE_HEADER
+# - BASE64_JSON: the same bytes base64-encoded in a JSON body, with "shape" and "dtype"
+JSON = "application/json"
+BINARY = "application/octet-stream"
+BASE64_JSON = "application/vnd.embeddings.base64+json"
+FORMATS = {JSON: "json", BINARY: "binary", BASE64_JSON: "base64"}
+
+SHAPE_HEADER = "X-Embedding-Shape"
+DTYPE_HEADER = "X-Embedding-Dtype"
+DTYPE = "<f4"
+
+
+def negotiate(accept):
+    """The response format ("json", "binary" or "base64") best matching a werkzeug `MIMEAccept`."""
+    return FORMATS[accept.best_match([JSON, BINARY, BASE64_JSON], default=JSON)]
+
+
+def embeddings_response(embeddings, space, response_format, single=False):
+    """
+    Build the /generate_embeddings response in `response_format`.
+
+    Args:
+        embeddings (List[List[float]]): One vector per text.
+        space (dict): The "model" and "dimensions" the vectors were made with.
+        single (bool): The request embedded one "text": the shape is (dimensions,)
+            and the JSON key is "embedding" instead of "embeddings".
+    """
+    key = "embedding" if single else "embeddings"
+    if response_format == "json":
+        response = jsonify({key: embeddings[0] if single else embeddings, **space})
+    else:
+        matrix = np.asarray(embeddings, dtype=DTYPE).reshape(len(embeddings), space["dimensions"])
+        shape = matrix.shape[1:] if single else matrix.shape
+        if response_format == "binary":
+            response = Response(matrix.tobytes(), mimetype=BINARY)
+        else:
+            response = jsonify({
+                f"{key}_base64": base64.b64encode(matrix.tobytes()).decode("ascii"),
+                "shape": list(shape),
+                "dtype": DTYPE,
+                **space,
+            })
+            response.mimetype = BASE64_JSON
+        response.headers[SHAPE_HEADER] = ",".join(str(n) for n in shape)
+        response.headers[DTYPE_HEADER] = DTYPE
+
+    response.headers["X-Embedding-Model"] = space["model"]
+    response.headers["X-Embedding-Dimensions"] = str(space["dimensions"])
+    response.vary.add("Accept")
+    return response
@@ -1,15 +1,17 @@
-from flask import Flask, request, jsonify 
-from flask_cors import CORS
-import openai
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
-import base64
-import requests
+from contextlib import asynccontextmanager
+import json
 import logging
-from prometheus_client import start_http_server, Counter, generate_latest, Histogram
-import threading
 import os
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+import httpx
+from prometheus_client import start_http_server, Counter, generate_latest, Histogram
+import uvicorn
 from dotenv import load_dotenv
+from openai_limiter import RateLimiter, estimate_tokens
+from openai_clients import ClientPool
 load_dotenv()
 
 # -------------------- Prometheus Metrics --------------------
@@ -27,6 +29,17 @@ IMG_ERRORS = Counter(
     ['error_type']
 )
 
+IMG_TOKENS = Counter(
+    'gpt_iep_image_tokens_total',
+    'OpenAI tokens used by /get_image_description',
+    ['kind']
+)
+IMG_DETAIL = Counter(
+    'gpt_iep_image_detail_total',
+    'Images sent to OpenAI by detail level',
+    ['detail']
+)
+
 # Endpoint 2: /get_response
 RESP_CALLS = Counter('gpt_iep_response_calls_total', 'Total calls to /get_response')
 RESP_LATENCY = Histogram(
@@ -40,98 +53,173 @@ RESP_ERRORS = Counter(
     ['error_type']
 )
 
-openai.api_key = os.getenv('OPENAI_API_KEY')
-
-
-app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
-
-from flask import Flask, request, jsonify
-import base64
-import requests
-import openai  # assumes openai.api_key is already set somewhere
-
-
-@app.route("/get_image_description", methods=['POST'])
-def get_image_description():
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+# OpenAI API root; point it at a stub for load tests
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+# Keep-alive connections to OpenAI shared by all requests: at most this many calls
+# are in flight, the rest wait for a free connection
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "256"))
+# Connections per pooled httpx client (see ClientPool), and seconds an idle one is kept
+OPENAI_CONNECTIONS_PER_CLIENT = int(os.getenv("OPENAI_CONNECTIONS_PER_CLIENT", "8"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+# Seconds to connect, and to wait for a completion or a free connection
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+# Multiplex calls over HTTP/2 when the server offers it (needs the h2 package)
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "true").lower() == "true"
+
+CHAT_MODEL = "gpt-4o"
+# Completion tokens counted against the tokens-per-minute budget for /get_response,
+# which sets no max_tokens
+RESPONSE_TOKEN_ESTIMATE = int(os.getenv("RESPONSE_TOKEN_ESTIMATE", "1000"))
+# Prompt tokens of one image by detail level (a 1024px image at high detail is 765)
+IMAGE_TOKEN_ESTIMATES = {"low": 85, "high": 765, "auto": 765}
+
+IMAGE_DETAILS = ("low", "high", "auto")
+
+limiter = RateLimiter.from_env()
+
+
+def create_openai_clients(transport=None):
+    """The connection pool every call to OpenAI goes through."""
+    return ClientPool(
+        OPENAI_BASE_URL,
+        headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
+        connections=OPENAI_MAX_CONNECTIONS,
+        connections_per_client=OPENAI_CONNECTIONS_PER_CLIENT,
+        http2=OPENAI_HTTP2,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+        transport=transport,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.openai = create_openai_clients()
+    yield
+    await app.state.openai.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True,
+                   allow_methods=["*"], allow_headers=["*"])
+
+
+async def chat_completion(payload, tokens):
+    """POST `payload` to /chat/completions within the rate limit and return the parsed body."""
+    openai = app.state.openai
+    response = await limiter.call_async(payload["model"], lambda: openai.post("/chat/completions", json=payload),
+                                        tokens=tokens)
+    response.raise_for_status()
+    return response.json()
+
+
+async def read_json(request):
+    """The request's JSON body, or None if it is missing or malformed."""
+    try:
+        return await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+
+@app.post("/get_image_description")
+async def get_image_description(request: Request):
     """
     Analyzes one or more images using the GPT-4o vision model and returns a text-based description.
 
     Expects:
         A JSON payload with:
         - "prompt" (str, optional): An instruction or question for GPT-4o to contextualize the image analysis.
-        - "images" (list of str): A list of base64-encoded JPEG images (without the data URL prefix).
+        - "images" (list): base64-encoded JPEG images (without the data URL prefix), either as
+          plain strings or as {"data": "<base64>", "detail": "low" | "high" | "auto"} objects.
+        - "detail" (str, optional): Detail level for images that do not set their own. Defaults to "auto".
 
     Behavior:
         - Builds a multi-modal request with the prompt and images.
-        - Sends the request to the OpenAI GPT-4o API.
+        - Sends the request to the OpenAI GPT-4o API through the rate limiter, which
+          waits for budget and retries 429s and 5xx errors.
         - Extracts the model's textual response and returns it.
 
     Returns:
-        - 200: {"response": "<GPT-4o generated description>"}
+        - 200: {"response": "<GPT-4o generated description>", "usage": <OpenAI token usage>}
         - 400: {"error": "No images provided"} if no image list is passed
+        - 400: {"error": "Invalid detail ..."} if a detail level is not low, high or auto
+        - 400: {"error": "Invalid JSON body"} if the body is not JSON
         - 500: {"error": "<exception message>"} if an error occurs during the API call
 
     Notes:
         - Images must be valid base64-encoded JPEGs.
-        - The OpenAI API key must be correctly configured via `openai.api_key`.
+        - The OpenAI API key must be correctly configured via OPENAI_API_KEY.
     """
     IMG_CALLS.inc()
     with IMG_LATENCY.time():
         try:
-            data = request.get_json()
+            data = await read_json(request)
+            if data is None:
+                IMG_ERRORS.labels(error_type='invalid_json').inc()
+                return JSONResponse({"error": "Invalid JSON body"}, status_code=400)
             prompt = data.get('prompt', '')
             images = data.get('images', [])
+            default_detail = data.get('detail', 'auto')
 
             if not images:
                 IMG_ERRORS.labels(error_type='missing_images').inc()
-                return jsonify({"error": "No images provided"}), 400
+                return JSONResponse({"error": "No images provided"}, status_code=400)
 
             # Build the message content with prompt and images
             message_content = [{"type": "text", "text": prompt}]
-            for img_b64 in images:
+            for image in images:
+                if isinstance(image, dict):
+                    img_b64, detail = image.get('data', ''), image.get('detail', default_detail)
+                else:
+                    img_b64, detail = image, default_detail
+                if detail not in IMAGE_DETAILS:
+                    IMG_ERRORS.labels(error_type='invalid_detail').inc()
+                    return JSONResponse(
+                        {"error": f"Invalid detail '{detail}'. Supported values are low, high and auto."},
+                        status_code=400
+                    )
+                IMG_DETAIL.labels(detail=detail).inc()
                 message_content.append({
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/jpeg;base64,{img_b64}"
+                        "url": f"data:image/jpeg;base64,{img_b64}",
+                        "detail": detail
                     }
                 })
 
-            # OpenAI API call
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {openai.api_key}"
-            }
-
             payload = {
-                "model": "gpt-4o",
+                "model": CHAT_MODEL,
                 "messages": [
                     {"role": "user", "content": message_content}
                 ],
                 "max_tokens": 500
             }
-
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=payload
+            tokens = estimate_tokens(prompt) + payload["max_tokens"] + sum(
+                IMAGE_TOKEN_ESTIMATES[part["image_url"]["detail"]]
+                for part in message_content if part["type"] == "image_url"
             )
-            response.raise_for_status()
 
-            reply = response.json()['choices'][0]['message']['content']
-            return jsonify({"response": reply})
+            result = await chat_completion(payload, tokens)
+            reply = result['choices'][0]['message']['content']
+            usage = result.get('usage', {})
+            IMG_TOKENS.labels(kind='prompt').inc(usage.get('prompt_tokens', 0))
+            IMG_TOKENS.labels(kind='completion').inc(usage.get('completion_tokens', 0))
+            return {"response": reply, "usage": usage}
 
-        except requests.exceptions.HTTPError as e:
+        except httpx.HTTPStatusError as e:
             IMG_ERRORS.labels(error_type='openai_http_error').inc()
             logging.error(e)
-            return jsonify({"error": str(e)}), 500
+            return JSONResponse({"error": str(e)}, status_code=500)
         except Exception as e:
             IMG_ERRORS.labels(error_type='internal_error').inc()
             logging.error(e)
-            return jsonify({"error": str(e)}), 500
+            return JSONResponse({"error": str(e)}, status_code=500)
 
-@app.route("/get_response", methods=['POST'])
-def get_response():
+
+@app.post("/get_response")
+async def get_response(request: Request):
     """
    returns a response to a prompt.
 
@@ -142,64 +230,50 @@ def get_response():
 
     Returns:
         - 200: {"response": "<GPT-4o generated response>"}
-        - 400: if no prompt is passed
+        - 400: if no prompt is passed, or the body is not JSON
         - 500: {"error": "<exception message>"} if an error occurs during the API call
 
     """
     RESP_CALLS.inc()
     with RESP_LATENCY.time():
         try:
-            data = request.get_json()
+            data = await read_json(request)
+            if data is None:
+                RESP_ERRORS.labels(error_type='invalid_json').inc()
+                return JSONResponse({"error": "Invalid JSON body"}, status_code=400)
             system_message = data.get('system_message', '')
             context = data.get('context', '')
 
             if not context or not system_message:
                 RESP_ERRORS.labels(error_type='missing_prompt').inc()
-                return jsonify({"error": "No prompt provided"}), 400
-
-
-            # OpenAI API call
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {openai.api_key}"
-            }
+                return JSONResponse({"error": "No prompt provided"}, status_code=400)
 
             payload = {
-                "model": "gpt-4o",
+                "model": CHAT_MODEL,
                 "messages": [
                     {"role": "system", "content": system_message},
                     {"role": "user", "content": context}
                 ],
             }
 
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-
-            reply = response.json()['choices'][0]['message']['content']
-            return jsonify({"response": reply})
+            result = await chat_completion(payload, estimate_tokens(system_message, context) + RESPONSE_TOKEN_ESTIMATE)
+            return {"response": result['choices'][0]['message']['content']}
 
-        except requests.exceptions.HTTPError as e:
+        except httpx.HTTPStatusError as e:
             RESP_ERRORS.labels(error_type='openai_http_error').inc()
             logging.info(e)
-            return jsonify({"error": str(e)}), 500
+            return JSONResponse({"error": str(e)}, status_code=500)
         except Exception as e:
             RESP_ERRORS.labels(error_type='internal_error').inc()
             logging.info(e)
-            return jsonify({"error": str(e)}), 500
+            return JSONResponse({"error": str(e)}, status_code=500)
 
 
-@app.route("/metrics")
+@app.get("/metrics")
 def metrics():
-    return generate_latest(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
-   
-def start_servers():
-    start_http_server(8000)
+    return Response(generate_latest(), media_type='text/plain; version=0.0.4')
 
 
 if __name__ == '__main__':
-    server_thread = threading.Thread(target=start_servers).start()
-    app.run(host="0.0.0.0", port=5002)
\ No newline at end of file
+    start_http_server(8000)
+    uvicorn.run(app, host="0.0.0.0", port=5002)
@@ -0,0 +1,65 @@
+import asyncio
+from contextlib import asynccontextmanager
+import logging
+
+import httpx
+
+
+class ClientPool:
+    """
+    Keep-alive HTTP clients shared by every call to one API, `connections` at most
+    in flight in total; further callers wait for a free slot in FIFO order.
+
+    The connections are split over several httpx clients of at most
+    `connections_per_client` each: httpx's pool rescans all of its connections for
+    every request it queues or releases, so its cost grows with every connection it holds.
+
+    Args:
+        base_url (str): Root of the API.
+        headers (dict): Sent with every request (e.g. Authorization).
+        http2 (bool): Multiplex requests over HTTP/2 connections when the server
+            offers it; falls back to HTTP/1.1 if the h2 package is missing.
+        keepalive_expiry (float): Seconds before an idle connection is closed.
+        timeout (httpx.Timeout): Connect, read, write and pool timeouts.
+        transport (httpx.AsyncBaseTransport, optional): Replaces the network, for tests.
+    """
+
+    def __init__(self, base_url, headers=None, connections=256, connections_per_client=8, http2=True,
+                 keepalive_expiry=60.0, timeout=None, transport=None):
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logging.warning("h2 is not installed; using HTTP/1.1 keep-alive connections")
+                http2 = False
+        per_client = max(1, min(connections, connections_per_client))
+        limits = httpx.Limits(max_connections=per_client, max_keepalive_connections=per_client,
+                              keepalive_expiry=keepalive_expiry)
+        # Loading the CA bundle takes tens of milliseconds; the clients share one context
+        ssl_context = httpx.create_ssl_context()
+        self.clients = [
+            httpx.AsyncClient(base_url=base_url, headers=headers, http2=http2, limits=limits,
+                              timeout=timeout, transport=transport, verify=ssl_context)
+            for _ in range(-(-connections // per_client))
+        ]
+        self._in_flight = [0] * len(self.clients)
+        self._slots = asyncio.Semaphore(connections)
+
+    @asynccontextmanager
+    async def client(self):
+        """Wait for a free slot and lend the least busy client."""
+        async with self._slots:
+            index = min(range(len(self.clients)), key=self._in_flight.__getitem__)
+            self._in_flight[index] += 1
+            try:
+                yield self.clients[index]
+            finally:
+                self._in_flight[index] -= 1
+
+    async def post(self, url, **kwargs):
+        async with self.client() as client:
+            return await client.post(url, **kwargs)
+
+    async def aclose(self):
+        for client in self.clients:
+            await client.aclose()
@@ -1,6 +1,10 @@
 import pytest
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import json
-from ..app import app
+import httpx
+from fastapi.testclient import TestClient
+from ..app import app, limiter, create_openai_clients
 
 # A small base64 string representing a 1x1 transparent PNG
 DUMMY_IMAGE_BASE64 = (
@@ -9,8 +13,7 @@ DUMMY_IMAGE_BASE64 = (
 
 @pytest.fixture
 def client():
-    app.config['TESTING'] = True
-    with app.test_client() as client:
+    with TestClient(app) as client:
         yield client
 
 def test_get_image_description_valid(client):
@@ -21,19 +24,18 @@ def test_get_image_description_valid(client):
 
     response = client.post(
         "/get_image_description",
-        data=json.dumps(payload),
-        content_type="application/json"
+        json=payload
     )
 
     assert response.status_code in [200, 500]  # API may error if OpenAI key is not valid or GPT fails
 
     if response.status_code == 200:
-        data = response.get_json()
+        data = response.json()
         assert "response" in data
         assert isinstance(data["response"], str)
 
     elif response.status_code == 500:
-        data = response.get_json()
+        data = response.json()
         assert "error" in data
 
 def test_get_image_description_missing_prompt(client):
@@ -41,7 +43,7 @@ def test_get_image_description_missing_prompt(client):
         "images": [DUMMY_IMAGE_BASE64]
     }
 
-    response = client.post("/get_image_description", data=json.dumps(payload), content_type="application/json")
+    response = client.post("/get_image_description", json=payload)
     assert response.status_code in [200, 500]
 
 def test_get_image_description_missing_images(client):
@@ -49,16 +51,16 @@ def test_get_image_description_missing_images(client):
         "prompt": "No image here."
     }
 
-    response = client.post("/get_image_description", data=json.dumps(payload), content_type="application/json")
+    response = client.post("/get_image_description", json=payload)
     assert response.status_code == 400
-    assert "error" in response.get_json()
+    assert "error" in response.json()
 
 def test_get_image_description_empty_payload(client):
-    response = client.post("/get_image_description", data="", content_type="application/json")
+    response = client.post("/get_image_description", content="", headers={"Content-Type": "application/json"})
     assert response.status_code == 500 or response.status_code == 400
 
 def test_get_image_description_invalid_json(client):
-    response = client.post("/get_image_description", data="not-a-json", content_type="application/json")
+    response = client.post("/get_image_description", content="not-a-json", headers={"Content-Type": "application/json"})
     assert response.status_code == 400 or response.status_code == 500
 
 def test_get_image_description_empty_prompt_and_images(client):
@@ -67,7 +69,7 @@ def test_get_image_description_empty_prompt_and_images(client):
         "images": [DUMMY_IMAGE_BASE64]
     }
 
-    response = client.post("/get_image_description", data=json.dumps(payload), content_type="application/json")
+    response = client.post("/get_image_description", json=payload)
     assert response.status_code in [200, 500]
 
 def test_get_image_description_invalid_base64(client):
@@ -76,9 +78,9 @@ def test_get_image_description_invalid_base64(client):
         "images": ["this-is-not-valid-base64"]
     }
 
-    response = client.post("/get_image_description", data=json.dumps(payload), content_type="application/json")
+    response = client.post("/get_image_description", json=payload)
     assert response.status_code == 500
-    assert "error" in response.get_json()
+    assert "error" in response.json()
 
 
 def test_get_image_description_multiple_images(client):
@@ -93,13 +95,12 @@ def test_get_image_description_multiple_images(client):
 
     response = client.post(
         "/get_image_description",
-        data=json.dumps(payload),
-        content_type="application/json"
+        json=payload
     )
 
     assert response.status_code in [200, 500]  # Allow for API error if OpenAI fails
 
-    json_data = response.get_json()
+    json_data = response.json()
     if response.status_code == 200:
         assert "response" in json_data
         assert isinstance(json_data["response"], str)
@@ -107,14 +108,40 @@ def test_get_image_description_multiple_images(client):
     else:
         assert "error" in json_data
 
-import json
-import pytest
+def test_get_image_description_detail_per_image(client):
+    completion = {
+        "choices": [{"message": {"content": "Notes"}}],
+        "usage": {"prompt_tokens": 340, "completion_tokens": 12, "total_tokens": 352}
+    }
+    payload = {
+        "prompt": "Describe the pages.",
+        "detail": "high",
+        "images": [{"data": DUMMY_IMAGE_BASE64, "detail": "low"}, DUMMY_IMAGE_BASE64]
+    }
 
-@pytest.fixture
-def client():
-    app.config['TESTING'] = True
-    with app.test_client() as client:
-        yield client
+    sent = []
+
+    def openai_stub(request):
+        sent.append(json.loads(request.content))
+        return httpx.Response(200, json=completion)
+
+    app.state.openai = create_openai_clients(transport=httpx.MockTransport(openai_stub))
+    response = client.post("/get_image_description", json=payload)
+
+    assert response.status_code == 200
+    assert response.json()["usage"]["prompt_tokens"] == 340
+    content = sent[0]["messages"][0]["content"]
+    assert [part["image_url"]["detail"] for part in content[1:]] == ["low", "high"]
+
+def test_get_image_description_invalid_detail(client):
+    payload = {
+        "prompt": "Describe the pages.",
+        "images": [{"data": DUMMY_IMAGE_BASE64, "detail": "ultra"}]
+    }
+
+    response = client.post("/get_image_description", json=payload)
+    assert response.status_code == 400
+    assert "error" in response.json()
 
 def test_get_response_valid(client):
     payload = {
@@ -122,17 +149,17 @@ def test_get_response_valid(client):
         "context": "What is the capital of France?"
     }
 
-    response = client.post("/get_response", data=json.dumps(payload), content_type="application/json")
+    response = client.post("/get_response", json=payload)
 
     assert response.status_code in [200, 500]
 
     if response.status_code == 200:
-        data = response.get_json()
+        data = response.json()
         assert "response" in data
         assert isinstance(data["response"], str)
 
     elif response.status_code == 500:
-        data = response.get_json()
+        data = response.json()
         assert "error" in data
 
 def test_get_response_missing_system_message(client):
@@ -140,25 +167,25 @@ def test_get_response_missing_system_message(client):
         "context": "This is a context-only input."
     }
 
-    response = client.post("/get_response", data=json.dumps(payload), content_type="application/json")
+    response = client.post("/get_response", json=payload)
     assert response.status_code == 400
-    assert "error" in response.get_json()
+    assert "error" in response.json()
 
 def test_get_response_missing_context(client):
     payload = {
         "system_message": "System message only."
     }
 
-    response = client.post("/get_response", data=json.dumps(payload), content_type="application/json")
+    response = client.post("/get_response", json=payload)
     assert response.status_code == 400
-    assert "error" in response.get_json()
+    assert "error" in response.json()
 
 def test_get_response_empty_payload(client):
-    response = client.post("/get_response", data="", content_type="application/json")
-    assert response.status_code in [400, 500]  # 400 for invalid payload, 500 if .get_json() fails
+    response = client.post("/get_response", content="", headers={"Content-Type": "application/json"})
+    assert response.status_code in [400, 500]  # 400 for invalid payload, 500 if .json() fails
 
 def test_get_response_invalid_json(client):
-    response = client.post("/get_response", data="not-a-valid-json", content_type="application/json")
+    response = client.post("/get_response", content="not-a-valid-json", headers={"Content-Type": "application/json"})
     assert response.status_code in [400, 500]
 
 def test_get_response_empty_values(client):
@@ -167,6 +194,20 @@ def test_get_response_empty_values(client):
         "context": ""
     }
 
-    response = client.post("/get_response", data=json.dumps(payload), content_type="application/json")
+    response = client.post("/get_response", json=payload)
     assert response.status_code == 400
-    assert "error" in response.get_json()
+    assert "error" in response.json()
+
+def test_get_response_retries_rate_limited_calls(client, monkeypatch):
+    monkeypatch.setattr(limiter, "backoff_base", 0.01)
+    replies = [
+        httpx.Response(429, headers={"retry-after-ms": "5"}, json={"error": {"message": "Rate limit reached"}}),
+        httpx.Response(200, json={"choices": [{"message": {"content": "Paris"}}]}),
+    ]
+    app.state.openai = create_openai_clients(transport=httpx.MockTransport(lambda request: replies.pop(0)))
+
+    response = client.post("/get_response", json={"system_message": "Answer briefly.", "context": "Capital of France?"})
+
+    assert response.status_code == 200
+    assert response.json() == {"response": "Paris"}
+    assert replies == []
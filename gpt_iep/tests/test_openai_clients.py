@@ -0,0 +1,44 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import asyncio
+import httpx
+from openai_clients import ClientPool
+
+
+def test_pool_bounds_calls_in_flight():
+    in_flight = peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json={"path": request.url.path})
+
+    async def run():
+        pool = ClientPool("https://api.test/v1", connections=10, connections_per_client=4, http2=False,
+                          transport=httpx.MockTransport(handler))
+        responses = await asyncio.gather(*(pool.post("/chat/completions", json={}) for _ in range(50)))
+        await pool.aclose()
+        return pool, responses
+
+    pool, responses = asyncio.run(run())
+
+    # 10 connections over clients of at most 4
+    assert len(pool.clients) == 3
+    assert peak == 10
+    assert {response.json()["path"] for response in responses} == {"/v1/chat/completions"}
+
+
+def test_pool_lends_the_least_busy_client():
+    async def run():
+        pool = ClientPool("https://api.test", connections=4, connections_per_client=2, http2=False)
+        async with pool.client() as first, pool.client() as second, pool.client() as third:
+            lent = [first, second, third]
+        await pool.aclose()
+        return pool, lent
+
+    pool, lent = asyncio.run(run())
+
+    assert lent == [pool.clients[0], pool.clients[1], pool.clients[0]]
@@ -0,0 +1,2 @@
+from .limiter import RateLimiter, estimate_tokens, parse_duration, parse_limits
+from .store import MemoryStore, SqliteStore
@@ -0,0 +1,278 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import math
+import os
+import random
+import re
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from .store import MemoryStore, SqliteStore
+
+# Per-model quotas as "model=requests per minute/tokens per minute", comma separated,
+# e.g. "gpt-4o=500/30000,text-embedding-3-large=3000/1000000"; either number may be
+# left out. Quotas not set here are taken from OpenAI's x-ratelimit-limit-* headers.
+OPENAI_RATE_LIMITS = os.getenv("OPENAI_RATE_LIMITS", "")
+# Retries of a call answered with 429 or 5xx, and the exponential backoff range in seconds
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "30"))
+# SQLite file for the buckets; processes that share it share one budget. Unset keeps them in memory.
+OPENAI_LIMITER_DB = os.getenv("OPENAI_LIMITER_DB", "")
+
+# Rough size of a token for budgeting; the quota headers correct the drift
+ESTIMATED_BYTES_PER_TOKEN = 4
+
+THROTTLE_WAIT = Histogram(
+    'openai_limiter_throttle_wait_seconds',
+    'Time OpenAI calls waited: for rate-limit budget before sending, or backing off before a retry',
+    ['model', 'reason'],
+    buckets=[0, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+)
+RETRIES = Counter(
+    'openai_limiter_retries_total',
+    'OpenAI calls retried, by the status that caused the retry',
+    ['model', 'status']
+)
+REMAINING = Gauge(
+    'openai_limiter_ratelimit_remaining',
+    'Remaining requests or tokens last reported by OpenAI',
+    ['model', 'limit']
+)
+
+LIMITS = ("requests", "tokens")
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_limits(spec):
+    """
+    Read an OPENAI_RATE_LIMITS string.
+
+    Returns:
+        Dict[str, dict]: model -> {"requests": per minute, "tokens": per minute},
+        leaving out the numbers not given.
+    """
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        model, separator, quotas = entry.partition("=")
+        values = quotas.split("/")
+        if not model or not separator or len(values) > 2:
+            raise ValueError(f"Invalid rate limit '{entry}'; expected model=requests/tokens")
+        limits[model.strip()] = {limit: float(value) for limit, value in zip(LIMITS, values) if value.strip()}
+    return limits
+
+
+def parse_duration(value):
+    """Seconds in a reset header such as "20ms", "1.5s" or "6m0s"; None if unreadable."""
+    if not isinstance(value, str):
+        return None
+    parts = DURATION_PART.findall(value.strip())
+    if not parts or "".join(number + unit for number, unit in parts) != value.strip():
+        return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+
+def _number(value):
+    try:
+        return float(value) if isinstance(value, (str, int, float)) else None
+    except ValueError:
+        return None
+
+
+def retry_after(headers):
+    """Seconds the server asked to wait (retry-after-ms or retry-after), or None."""
+    if headers is None:
+        return None
+    milliseconds = _number(headers.get("retry-after-ms"))
+    if milliseconds is not None:
+        return milliseconds / 1000
+    return _number(headers.get("retry-after"))
+
+
+def estimate_tokens(*texts):
+    """Approximate token count of `texts` for the tokens-per-minute budget."""
+    return sum(math.ceil(len(text.encode("utf-8")) / ESTIMATED_BYTES_PER_TOKEN) for text in texts if text)
+
+
+def _retryable(status):
+    return isinstance(status, int) and (status == 429 or 500 <= status < 600)
+
+
+def _status(response, error):
+    """HTTP status and headers of a response, or of the response attached to an error."""
+    if error is None:
+        return getattr(response, "status_code", None), getattr(response, "headers", None)
+    failed = getattr(error, "response", None)
+    return getattr(error, "status_code", getattr(failed, "status_code", None)), getattr(failed, "headers", None)
+
+
+class RateLimiter:
+    """
+    Client-side limits for OpenAI calls: per model, a token bucket for requests per
+    minute and one for tokens per minute, synced with the quota headers of every
+    response, and retries of 429s and 5xx errors with jittered exponential backoff.
+
+    Waiting is done before a call is sent, so concurrent callers queue up on the
+    bucket instead of all failing with 429. Retries are the limiter's too, paced
+    against the quota: the OpenAI clients it wraps are built with max_retries=0.
+    """
+
+    def __init__(self, limits=None, store=None, max_retries=OPENAI_MAX_RETRIES,
+                 backoff_base=OPENAI_BACKOFF_BASE, backoff_max=OPENAI_BACKOFF_MAX,
+                 sleep=time.sleep, async_sleep=asyncio.sleep):
+        self.limits = limits or {}
+        self.learned = {}  # model -> quotas from x-ratelimit-limit-* headers
+        self.store = store or MemoryStore()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+        self._async_sleep = async_sleep
+        # call_async() updates the store from this thread: SQLite may wait on other processes' locks
+        self._store_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="openai-limiter")
+
+    @classmethod
+    def from_env(cls):
+        store = SqliteStore(OPENAI_LIMITER_DB) if OPENAI_LIMITER_DB else MemoryStore()
+        return cls(parse_limits(OPENAI_RATE_LIMITS), store)
+
+    def capacity(self, model, limit):
+        """Per-minute quota of `model` for `limit` ("requests" or "tokens"), None if unknown."""
+        return self.limits.get(model, {}).get(limit) or self.learned.get(model, {}).get(limit)
+
+    def reserve(self, model, tokens=0):
+        """Take one request and `tokens` tokens from the model's budget; returns the seconds until they are available."""
+        wait = 0.0
+        for limit, amount in (("requests", 1), ("tokens", tokens)):
+            wait = max(wait, self.store.update(f"{model}:{limit}", self._take(amount, self.capacity(model, limit))))
+        THROTTLE_WAIT.labels(model=model, reason="budget").observe(wait)
+        return wait
+
+    def acquire(self, model, tokens=0):
+        """reserve(), then sleep until the budget is available."""
+        wait = self.reserve(model, tokens)
+        if wait > 0:
+            self._sleep(wait)
+
+    @staticmethod
+    def _take(amount, capacity):
+        # Levels go negative: later callers then wait for the refill of what earlier ones reserved
+        def take(state, now):
+            level, updated, blocked_until = state or (capacity, now, 0.0)
+            wait = max(0.0, blocked_until - now)
+            if capacity:
+                rate = capacity / 60
+                level = capacity if level is None else min(capacity, level + (now - updated) * rate)
+                level -= min(amount, capacity)
+                wait = max(wait, -level / rate)
+            return (level, now, blocked_until), wait
+        return take
+
+    def observe(self, model, headers):
+        """Sync the model's buckets with the x-ratelimit-* headers of an OpenAI response."""
+        for limit in LIMITS:
+            quota = _number(headers.get(f"x-ratelimit-limit-{limit}"))
+            if quota:
+                self.learned.setdefault(model, {})[limit] = quota
+            remaining = _number(headers.get(f"x-ratelimit-remaining-{limit}"))
+            if remaining is None:
+                continue
+            REMAINING.labels(model=model, limit=limit).set(remaining)
+            self.store.update(f"{model}:{limit}", self._sync(
+                remaining, parse_duration(headers.get(f"x-ratelimit-reset-{limit}")), self.capacity(model, limit)))
+
+    @staticmethod
+    def _sync(remaining, reset, capacity):
+        def sync(state, now):
+            level, updated, blocked_until = state or (capacity, now, 0.0)
+            if capacity:
+                level = capacity if level is None else min(capacity, level + (now - updated) * capacity / 60)
+                level = min(level, remaining)
+            if remaining <= 0 and reset:
+                blocked_until = max(blocked_until, now + reset)
+            return (level, now, blocked_until), None
+        return sync
+
+    def block(self, model, seconds):
+        """Hold every call to `model` for `seconds`, e.g. after a 429."""
+        def hold(state, now):
+            level, updated, blocked_until = state or (None, now, 0.0)
+            return (level, updated, max(blocked_until, now + seconds)), None
+        self.store.update(f"{model}:requests", hold)
+
+    def backoff(self, attempt, headers=None):
+        """Seconds to wait before retry number `attempt` + 1: full jitter, but no less than retry-after."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after(headers) or 0.0)
+
+    def call(self, model, send, tokens=0):
+        """
+        Send an OpenAI request within the model's budget, retrying 429s and 5xx errors.
+
+        Args:
+            model (str): The model the request is billed to.
+            send (callable): Makes the request and returns the response (anything
+                with `status_code` and `headers`, e.g. a requests.Response or an
+                openai raw response). Errors may also be raised, as the openai
+                client does; their status and headers are read from the exception.
+            tokens (int): Estimated tokens the request counts against the
+                tokens-per-minute quota (prompt plus completion).
+
+        Returns:
+            The last response; once retries are exhausted a failed response is
+            returned as is, and an exception is re-raised.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(model, tokens)
+            try:
+                response, error = send(), None
+            except Exception as e:
+                response, error = None, e
+
+            delay = self._retry_delay(model, attempt, *_status(response, error))
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            self._sleep(delay)
+
+    async def call_async(self, model, send, tokens=0):
+        """
+        call() for coroutines: `send` returns an awaitable. Neither the waits nor the
+        store updates block the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            wait = await loop.run_in_executor(self._store_thread, self.reserve, model, tokens)
+            if wait > 0:
+                await self._async_sleep(wait)
+            try:
+                response, error = await send(), None
+            except Exception as e:
+                response, error = None, e
+
+            delay = await loop.run_in_executor(
+                self._store_thread, self._retry_delay, model, attempt, *_status(response, error))
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            await self._async_sleep(delay)
+
+    def _retry_delay(self, model, attempt, status, headers):
+        """Record the outcome of an attempt; returns the seconds to back off before retrying, None if it is final."""
+        if headers is not None:
+            self.observe(model, headers)
+        if not _retryable(status) or attempt == self.max_retries:
+            return None
+
+        delay = self.backoff(attempt, headers)
+        logging.warning(f"OpenAI answered {status} for {model}; retrying in {delay:.2f}s")
+        RETRIES.labels(model=model, status=str(status)).inc()
+        if status == 429:
+            self.block(model, delay)
+        THROTTLE_WAIT.labels(model=model, reason="backoff").observe(delay)
+        return delay
@@ -0,0 +1,59 @@
+import sqlite3
+import threading
+import time
+
+
+class MemoryStore:
+    """Bucket states kept in this process."""
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, change):
+        """
+        Atomically replace the state under `key` by `change(state, now)`.
+
+        States are (level, updated, blocked_until) tuples, None for a bucket never
+        used; `change` returns (new state, result) and the result is returned.
+        """
+        with self._lock:
+            state, result = change(self._states.get(key), self._clock())
+            self._states[key] = state
+            return result
+
+
+class SqliteStore:
+    """
+    Bucket states in a SQLite file. Every process that opens the same file (for
+    instance replicas with a common volume on one host) draws on the same budget.
+    """
+
+    def __init__(self, path, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        # Readers do not wait for writers, and commits are not fsynced (checkpoints are)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, level REAL, updated REAL, blocked_until REAL)"
+        )
+
+    def update(self, key, change):
+        """See MemoryStore.update; the read and write share one write transaction."""
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                state = cursor.execute(
+                    "SELECT level, updated, blocked_until FROM buckets WHERE key = ?", (key,)
+                ).fetchone()
+                state, result = change(state, self._clock())
+                cursor.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?)", (key, *state))
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            return result
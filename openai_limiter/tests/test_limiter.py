@@ -0,0 +1,184 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+import asyncio
+import sqlite3
+import threading
+import pytest
+from openai_limiter import MemoryStore, RateLimiter, SqliteStore, parse_duration, parse_limits
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class RateLimitError(Exception):
+    # Shaped like openai.APIStatusError
+    def __init__(self, headers):
+        super().__init__("rate limited")
+        self.status_code = 429
+        self.response = Response(429, headers)
+
+
+def make_limiter(clock, limits=None, store=None, **options):
+    async def async_sleep(seconds):
+        clock.sleep(seconds)
+    return RateLimiter(limits, store or MemoryStore(clock=clock), sleep=clock.sleep, async_sleep=async_sleep, **options)
+
+
+def test_parsing():
+    assert parse_limits("gpt-4o=500/30000, text-embedding-3-large=/1000000") == {
+        "gpt-4o": {"requests": 500.0, "tokens": 30000.0},
+        "text-embedding-3-large": {"tokens": 1000000.0},
+    }
+    with pytest.raises(ValueError):
+        parse_limits("gpt-4o")
+    assert parse_duration("20ms") == 0.02
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("1h2m3.5s") == 3723.5
+    assert parse_duration("soon") is None
+
+
+def test_buckets_throttle_requests_and_tokens():
+    clock = Clock()
+    limiter = make_limiter(clock, {"gpt-4o": {"requests": 60}, "text-embedding-3-large": {"tokens": 600}})
+
+    # A full bucket lets a burst through, then one request per second
+    for _ in range(60):
+        limiter.acquire("gpt-4o")
+    assert clock.sleeps == []
+    limiter.acquire("gpt-4o")
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+    # 600 tokens per minute: after 550, the next 100 wait for 50 to refill
+    limiter.acquire("text-embedding-3-large", tokens=550)
+    limiter.acquire("text-embedding-3-large", tokens=100)
+    assert clock.sleeps[-1] == pytest.approx(5.0)
+
+    # Other models are not limited until their quotas are known
+    limiter.acquire("whisper-1", tokens=10 ** 9)
+    assert len(clock.sleeps) == 2
+
+
+def test_quota_headers_sync_the_buckets():
+    clock = Clock()
+    limiter = make_limiter(clock)
+
+    limiter.observe("gpt-4o", {
+        "x-ratelimit-limit-requests": "60",
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "2s",
+        "x-ratelimit-limit-tokens": "600",
+        "x-ratelimit-remaining-tokens": "600",
+    })
+
+    assert limiter.capacity("gpt-4o", "requests") == 60
+    limiter.acquire("gpt-4o", tokens=10)
+    # Blocked until the reset OpenAI announced
+    assert clock.sleeps == [pytest.approx(2.0)]
+
+
+def test_call_retries_429_and_5xx_with_backoff():
+    clock = Clock()
+    limiter = make_limiter(clock, backoff_base=0.5, backoff_max=4)
+    responses = iter([RateLimitError({"retry-after-ms": "1500"}), Response(503), Response(200)])
+
+    def send():
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert limiter.call("gpt-4o", send).status_code == 200
+    # At least the server's retry-after, then jitter within 0.5 * 2
+    assert clock.sleeps[0] >= 1.5
+    assert 0 <= clock.sleeps[-1] <= 1.0
+
+
+def test_call_async_retries_without_blocking():
+    clock = Clock()
+    limiter = make_limiter(clock, {"gpt-4o": {"requests": 60}})
+    statuses = iter([500, 200])
+
+    async def send():
+        return Response(next(statuses))
+
+    for _ in range(60):
+        limiter.acquire("gpt-4o")
+    response = asyncio.run(limiter.call_async("gpt-4o", send))
+
+    assert response.status_code == 200
+    # Waited for the budget, backed off once, then waited for the budget again
+    assert len(clock.sleeps) >= 2 and clock.sleeps[0] == pytest.approx(1.0)
+
+
+def test_call_async_keeps_the_loop_running_while_the_store_is_locked(tmp_path):
+    path = str(tmp_path / "buckets.db")
+    limiter = RateLimiter(store=SqliteStore(path))
+    # Another replica holding the write lock
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    finished = []
+
+    async def send():
+        return Response(200)
+
+    async def run():
+        call = asyncio.create_task(limiter.call_async("gpt-4o", send))
+        for _ in range(5):
+            await asyncio.sleep(0.02)
+            finished.append(call.done())
+        holder.execute("COMMIT")
+        return await asyncio.wait_for(call, 5)
+
+    assert asyncio.run(run()).status_code == 200
+    assert finished == [False] * 5
+
+
+def test_call_gives_up_after_max_retries():
+    clock = Clock()
+    limiter = make_limiter(clock, max_retries=2)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise RateLimitError({})
+
+    with pytest.raises(RateLimitError):
+        limiter.call("gpt-4o", failing)
+    assert len(calls) == 3
+
+    # Client errors are returned without retrying
+    assert limiter.call("gpt-4o", lambda: Response(400)).status_code == 400
+
+
+def test_sqlite_store_shares_one_budget(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "buckets.db")
+    replicas = [make_limiter(clock, {"gpt-4o": {"requests": 60}}, SqliteStore(path, clock=clock)) for _ in range(2)]
+
+    threads = [threading.Thread(target=lambda limiter=limiter: [limiter.acquire("gpt-4o") for _ in range(30)])
+               for limiter in replicas]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert clock.sleeps == []
+
+    # The 61st request, from either replica, waits for the refill
+    replicas[0].acquire("gpt-4o")
+    assert clock.sleeps == [pytest.approx(1.0)]
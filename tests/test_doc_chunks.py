@@ -0,0 +1,61 @@
+import unittest
+import os
+import sys
+from unittest.mock import MagicMock
+
+eep_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'eep')
+if eep_root not in sys.path:
+    sys.path.insert(0, eep_root)
+
+from model.doc import Doc
+from tools.doc_chunks import get_document_chunks, delete_document_chunks
+
+
+class TestDocChunks(unittest.TestCase):
+
+    def test_reads_recorded_chunks_by_id_in_order(self):
+        collection = MagicMock()
+        collection.get.return_value = {
+            "ids": ["doc-7-2", "doc-7-0", "doc-7-10", "doc-7-1"],
+            "documents": ["c", "a", "k", "b"],
+        }
+        doc = Doc(id=7, owner_username="alice", title="notes.pdf", chunk_count=11)
+
+        results = get_document_chunks(collection, doc)
+
+        ids = collection.get.call_args.kwargs["ids"]
+        self.assertEqual(ids[0], "doc-7-0")
+        self.assertEqual(len(ids), 11)
+        self.assertNotIn("where", collection.get.call_args.kwargs)
+        self.assertEqual(results["documents"], ["a", "b", "c", "k"])
+
+    def test_legacy_documents_fall_back_to_metadata_filter(self):
+        collection = MagicMock()
+        collection.get.return_value = {
+            "ids": ["notes.pdf-1", "notes.pdf-0"],
+            "documents": ["b", "a"],
+            "embeddings": [[0.2], [0.1]],
+        }
+        doc = Doc(id=3, owner_username="alice", title="notes.pdf")
+
+        results = get_document_chunks(collection, doc, include=("documents", "embeddings"))
+
+        collection.get.assert_called_once_with(where={"original_doc": 3}, include=["documents", "embeddings"])
+        self.assertEqual(results["documents"], ["a", "b"])
+        self.assertEqual(results["embeddings"], [[0.1], [0.2]])
+
+    def test_delete_targets_only_the_document(self):
+        collection = MagicMock()
+
+        delete_document_chunks(collection, Doc(id=4, owner_username="alice", title="a.pdf", chunk_count=3))
+        collection.delete.assert_called_once_with(ids=["doc-4-0", "doc-4-1", "doc-4-2"])
+        collection.get.assert_not_called()
+
+        collection.reset_mock()
+        delete_document_chunks(collection, Doc(id=5, owner_username="alice", title="b.pdf"))
+        collection.delete.assert_called_once_with(where={"original_doc": 5})
+        collection.get.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,242 @@
+import unittest
+import importlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from collections import namedtuple
+from unittest.mock import patch
+from flask import Flask
+
+# The EEP modules import each other relative to the eep/ directory
+eep_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'eep')
+if eep_root not in sys.path:
+    sys.path.insert(0, eep_root)
+
+
+def import_document_upload():
+    # auth_routes reads SECRET_KEY from eep/secrets.py, which the standard library
+    # module of the same name (already imported by other tests) hides
+    stdlib_secrets = sys.modules.pop("secrets", None)
+    try:
+        return importlib.import_module("routes.document_upload")
+    finally:
+        if stdlib_secrets is not None:
+            sys.modules["secrets"] = stdlib_secrets
+
+
+document_upload = import_document_upload()
+
+from database.database import db
+from model.doc import Doc
+from model.job import IngestionJob
+from tools.file_processor_service import PageText
+from tools.job_queue import SqlJobQueue
+
+EncodedPage = namedtuple("EncodedPage", "data detail")
+
+
+class FakeCollection:
+    """The parts of a Chroma collection used by ingestion."""
+
+    def __init__(self):
+        self.items = {}
+
+    def add(self, ids, embeddings, documents, metadatas):
+        for id, embedding, document in zip(ids, embeddings, documents):
+            self.items[id] = (document, embedding)
+
+    def get(self, ids, include):
+        found = [id for id in ids if id in self.items]
+        return {
+            "ids": found,
+            "documents": [self.items[id][0] for id in found],
+            "embeddings": [self.items[id][1] for id in found],
+        }
+
+    def delete(self, ids):
+        for id in ids:
+            self.items.pop(id, None)
+
+
+class TestDescribePageBatches(unittest.TestCase):
+
+    def setUp(self):
+        self.pages = patch.object(
+            document_upload, "iter_encoded_document",
+            side_effect=lambda file_path, pages: (EncodedPage(f"page-{page}", "low") for page in pages))
+        self.pages.start()
+        self.addCleanup(self.pages.stop)
+
+    def test_keeps_batch_order_and_blanks_failed_batches(self):
+        def describe(prompt, batch):
+            first = int(batch[0].data.split("-")[1])
+            time.sleep(0.05 if first == 1 else 0.01)  # the first batch finishes last
+            if first == 3:
+                raise RuntimeError("GPT IEP unavailable")
+            return f"notes from page {first}"
+
+        reports = []
+        with patch.object(document_upload, "describe_image_batch", side_effect=describe):
+            descriptions = document_upload.describe_page_batches(
+                "notes.pdf", [[1, 2], [3], [4, 5], [6]], report=lambda *args: reports.append(args), concurrency=2)
+
+        self.assertEqual(descriptions, ["notes from page 1", "", "notes from page 4", "notes from page 6"])
+        # One report per finished batch, the last one included
+        self.assertEqual(reports, [("describing", done, 4) for done in range(1, 5)])
+
+    def test_reports_batches_collected_after_the_last_submission(self):
+        reports = []
+        # Fewer batches than `concurrency`: all of them are collected once submitted
+        with patch.object(document_upload, "describe_image_batch", side_effect=lambda prompt, batch: batch[0].data):
+            descriptions = document_upload.describe_page_batches(
+                "notes.pdf", [[1], [2], [3]], report=lambda *args: reports.append(args), concurrency=4)
+
+        self.assertEqual(descriptions, ["page-1", "page-2", "page-3"])
+        self.assertEqual(reports, [("describing", done, 3) for done in range(1, 4)])
+
+
+class IngestionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.collections = {}
+        for target, replacement in [
+            ("get_collection", lambda username: self.collections.setdefault(username, FakeCollection())),
+            ("ensure_space", lambda collection: None),
+        ]:
+            patcher = patch.object(document_upload, target, side_effect=replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def make_upload(self):
+        handle, path = tempfile.mkstemp(suffix=".pdf")
+        os.close(handle)
+        self.addCleanup(lambda: os.path.exists(path) and os.remove(path))
+        return path
+
+
+class TestReuseProcessedDocument(IngestionTestCase):
+
+    def test_identical_upload_reuses_chunks_without_model_calls(self):
+        content_hash = "ab" * 32
+        source_id = document_upload.store_document(
+            "alice", "notes.pdf", content_hash, "parsable", ["first chunk", "second chunk"],
+            [[1.0, 0.0], [0.0, 1.0]], report=lambda *args: None)
+
+        job = {"owner_username": "bob", "filename": "copy.pdf", "file_path": self.make_upload(),
+               "mode": "parsable", "content_hash": content_hash}
+        with patch.object(document_upload, "generate_embeddings") as embed, \
+                patch.object(document_upload, "process_parsable_document") as extract:
+            doc_id = document_upload.ingest_document(job, report=lambda *args: None)
+
+        embed.assert_not_called()
+        extract.assert_not_called()
+        self.assertNotEqual(doc_id, source_id)
+        doc = db.session.get(Doc, doc_id)
+        self.assertEqual((doc.owner_username, doc.title, doc.chunk_count), ("bob", "copy.pdf", 2))
+        self.assertEqual(
+            document_upload.get_document_chunks(self.collections["bob"], doc, include=("documents", "embeddings")),
+            {"ids": doc.chunk_ids(), "documents": ["first chunk", "second chunk"],
+             "embeddings": [[1.0, 0.0], [0.0, 1.0]]})
+        self.assertFalse(os.path.exists(job["file_path"]))
+
+    def test_upload_processed_another_way_is_not_reused(self):
+        content_hash = "cd" * 32
+        document_upload.store_document("alice", "notes.pdf", content_hash, "non_parsable", ["chunk"], [[1.0]],
+                                       report=lambda *args: None)
+
+        self.assertIsNone(document_upload.reuse_processed_document(
+            "bob", "notes.pdf", content_hash, "parsable", report=lambda *args: None))
+
+
+class TestRequeuedIngestion(IngestionTestCase):
+
+    def test_job_requeued_after_extraction_starts_over(self):
+        path = self.make_upload()
+        queue = SqlJobQueue(lease=60)
+        job_id = queue.submit("alice", "notes.pdf", path, "parsable")
+        first_attempt = queue.claim(timeout=0)
+
+        # The first worker extracts the text, then hangs while embedding
+        embedding, release = threading.Event(), threading.Event()
+
+        def hang(texts, progress):
+            embedding.set()
+            release.wait(5)
+            raise RuntimeError("worker gone")
+
+        def run_first_attempt():
+            try:
+                document_upload.ingest_document(first_attempt, report=lambda *args: None)
+            except RuntimeError:
+                pass
+
+        with patch.object(document_upload, "process_parsable_document", return_value="notes text"):
+            with patch.object(document_upload, "generate_embeddings", side_effect=hang):
+                worker = threading.Thread(target=run_first_attempt)
+                worker.start()
+                embedding.wait(5)
+            self.assertTrue(os.path.exists(path))
+
+            # Its lease runs out and another worker takes the job over
+            IngestionJob.query.filter_by(id=job_id).update({"updated_at": datetime.utcnow() - timedelta(hours=1)})
+            db.session.commit()
+            second_attempt = queue.claim(timeout=0)
+            self.assertEqual(second_attempt["id"], job_id)
+            with patch.object(document_upload, "generate_embeddings", return_value=[[1.0, 0.0]]):
+                doc_id = document_upload.ingest_document(second_attempt, report=lambda *args: None)
+
+        self.assertEqual(db.session.get(Doc, doc_id).chunk_count, 1)
+        self.assertFalse(os.path.exists(path))
+        # The first worker's cleanup finds the upload already removed
+        release.set()
+        worker.join()
+
+
+class TestProcessHybridDocument(unittest.TestCase):
+
+    def test_routes_pages_without_text_to_vision_in_page_order(self):
+        text = "x" * document_upload.HYBRID_MIN_TEXT_CHARS
+        pages = [
+            PageText(1, f"page one {text}", 0.0),
+            PageText(2, "", 0.0),
+            PageText(3, "  short  ", 0.0),
+            PageText(4, f"page four {text}", 0.0),
+            PageText(5, "", 0.0),
+        ]
+
+        with patch.object(document_upload.FileProcessorService, "extract_pdf_pages", return_value=pages), \
+                patch.object(document_upload, "describe_page_batches",
+                             return_value=["scanned pages 2-3", "scanned page 5"]) as describe:
+            result = document_upload.process_hybrid_document("notes.pdf")
+
+        self.assertEqual(describe.call_args.args[1], [[2, 3], [5]])
+        self.assertEqual(result, "\n\n".join(
+            [f"page one {text}", "scanned pages 2-3", f"page four {text}", "scanned page 5"]))
+
+    def test_failed_vision_batch_is_left_out(self):
+        pages = [PageText(1, "", 0.0), PageText(2, "y" * document_upload.HYBRID_MIN_TEXT_CHARS, 0.0)]
+
+        with patch.object(document_upload.FileProcessorService, "extract_pdf_pages", return_value=pages), \
+                patch.object(document_upload, "describe_page_batches", return_value=[""]):
+            result = document_upload.process_hybrid_document("notes.pdf")
+
+        self.assertEqual(result, "y" * document_upload.HYBRID_MIN_TEXT_CHARS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+eep_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'eep')
+if eep_root not in sys.path:
+    sys.path.insert(0, eep_root)
+
+from database.numpy_store import NumpyVectorStore
+from tools.embedding_space import (
+    ensure_space, migrate_collection, collection_space, truncate_embeddings, EmbeddingSpaceMismatch
+)
+
+MODEL = "text-embedding-3-large"
+
+
+class TestEmbeddingSpace(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = NumpyVectorStore(self.path)
+        self.vectors = np.sin(np.arange(3 * 8).reshape(3, 8) * 0.37).astype(np.float32)
+        self.collection = self.store.get_or_create_collection(name="alice")
+        self.collection.add(
+            ids=["doc-1-0", "doc-1-1", "doc-2-0"],
+            embeddings=self.vectors.tolist(),
+            documents=["first", "second", "third"],
+            metadatas=[{"original_doc": 1}, {"original_doc": 1}, {"original_doc": 2}],
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_legacy_collections_record_their_space(self):
+        self.assertEqual(collection_space(self.collection), (MODEL, 8))
+        self.assertEqual(self.collection.metadata, {"embedding_model": MODEL, "embedding_dimensions": 8})
+
+        ensure_space(self.collection, MODEL, 8)
+        with self.assertRaises(EmbeddingSpaceMismatch):
+            ensure_space(self.collection, MODEL, 4)
+
+        empty = self.store.get_or_create_collection(name="bob")
+        ensure_space(empty, MODEL, 4)
+        self.assertEqual(collection_space(empty), (MODEL, 4))
+
+    def test_truncate_migration_reprojects_vectors(self):
+        self.assertEqual(migrate_collection(self.store, "alice", "truncate", MODEL, 4), 3)
+
+        collection = self.store.get_collection("alice")
+        self.assertEqual(collection_space(collection), (MODEL, 4))
+        results = collection.get(include=["documents", "metadatas", "embeddings"])
+        self.assertEqual(results["ids"], ["doc-1-0", "doc-1-1", "doc-2-0"])
+        self.assertEqual(results["metadatas"][2], {"original_doc": 2})
+        np.testing.assert_allclose(results["embeddings"], truncate_embeddings(self.vectors, 4), rtol=1e-6)
+        np.testing.assert_allclose(np.linalg.norm(results["embeddings"], axis=1), 1.0, rtol=1e-6)
+        with self.assertRaises(ValueError):
+            self.store.get_collection("alice-migrating")
+
+        # Already migrated: nothing to do
+        self.assertEqual(migrate_collection(self.store, "alice", "truncate", MODEL, 4), 0)
+        # Truncation cannot grow vectors
+        with self.assertRaises(ValueError):
+            migrate_collection(self.store, "alice", "truncate", MODEL, 8)
+
+    def test_reembed_migration_and_interrupted_runs(self):
+        embedded = []
+
+        def embed(texts):
+            embedded.extend(texts)
+            return [[float(len(text)), 1.0] for text in texts]
+
+        # A complete staging collection from an interrupted run is restored first
+        staging = self.store.get_or_create_collection(name="alice-migrating")
+        staging.add(ids=["doc-1-0"], embeddings=[[0.5, 0.5]], documents=["first"], metadatas=[{"original_doc": 1}])
+        staging.modify(metadata={"embedding_model": MODEL, "embedding_dimensions": 2, "migration_complete": True})
+
+        self.assertEqual(migrate_collection(self.store, "alice", "reembed", MODEL, 2, embed=embed), 0)
+        self.assertEqual(embedded, [])
+        self.assertEqual(self.store.get_collection("alice").get()["ids"], ["doc-1-0"])
+
+        self.assertEqual(migrate_collection(self.store, "alice", "reembed", "other-model", 2, embed=embed), 1)
+        self.assertEqual(embedded, ["first"])
+        self.assertEqual(collection_space(self.store.get_collection("alice")), ("other-model", 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
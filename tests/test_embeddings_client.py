@@ -0,0 +1,90 @@
+import unittest
+import base64
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import numpy as np
+import requests
+
+eep_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'eep')
+if eep_root not in sys.path:
+    sys.path.insert(0, eep_root)
+
+from tools.embeddings_client import decode_embeddings, generate_embeddings
+
+
+def make_response(body, headers):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    response.headers.update(headers)
+    return response
+
+
+class TestEmbeddingsTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.matrix = np.array([[0.25, -1.5, 3.0], [1.0, 0.0, -0.125]], dtype="<f4")
+
+    def test_decodes_raw_float32_without_copying(self):
+        response = make_response(self.matrix.tobytes(), {
+            "Content-Type": "application/octet-stream",
+            "X-Embedding-Shape": "2,3",
+            "X-Embedding-Dtype": "<f4",
+        })
+
+        embeddings = decode_embeddings(response, "embeddings")
+
+        np.testing.assert_array_equal(embeddings, self.matrix)
+        self.assertFalse(embeddings.flags.owndata)
+
+    def test_decodes_base64_and_plain_json(self):
+        encoded = make_response(json.dumps({
+            "embedding_base64": base64.b64encode(self.matrix[0].tobytes()).decode("ascii"),
+            "shape": [3],
+            "dtype": "<f4",
+        }).encode(), {"Content-Type": "application/vnd.embeddings.base64+json"})
+        plain = make_response(json.dumps({"embedding": self.matrix[0].tolist()}).encode(),
+                              {"Content-Type": "application/json"})
+
+        np.testing.assert_array_equal(decode_embeddings(encoded, "embedding"), self.matrix[0])
+        np.testing.assert_array_equal(decode_embeddings(plain, "embedding"), self.matrix[0])
+
+    def test_generate_embeddings_stacks_batches(self):
+        def post(url, json, headers, timeout):
+            self.assertIn("application/octet-stream", headers["Accept"])
+            self.assertIsNotNone(timeout)
+            rows = self.matrix[:len(json["texts"])]
+            return make_response(rows.tobytes(), {
+                "Content-Type": "application/octet-stream",
+                "X-Embedding-Shape": f"{len(rows)},3",
+            })
+
+        with patch("tools.embeddings_client.requests.post", side_effect=post) as mock_post:
+            embeddings = generate_embeddings(["a", "b", "c"], batch_size=2, dimensions=3)
+
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(embeddings.shape, (3, 3))
+        np.testing.assert_array_equal(embeddings[2], self.matrix[0])
+
+        with self.assertRaises(ValueError):
+            with patch("tools.embeddings_client.requests.post", side_effect=post):
+                generate_embeddings(["a"], dimensions=4)
+
+    def test_refuses_embeddings_from_another_model(self):
+        def post(url, json, headers, timeout):
+            return make_response(self.matrix[:1].tobytes(), {
+                "Content-Type": "application/octet-stream",
+                "X-Embedding-Shape": "1,3",
+                "X-Embedding-Model": "text-embedding-3-small",
+            })
+
+        with patch("tools.embeddings_client.requests.post", side_effect=post):
+            with self.assertRaises(ValueError):
+                generate_embeddings(["a"], dimensions=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import io
+import os
+import sys
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
+from werkzeug.datastructures import FileStorage
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (project_root, os.path.join(project_root, 'eep')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from benchmarks.synthetic import make_text_pdf
+import tools.file_processor_service as file_processor_service
+from tools.file_processor_service import FileProcessorService
+
+
+class TestPdfExtraction(unittest.TestCase):
+
+    def setUp(self):
+        self.pdf = make_text_pdf(7, lines_per_page=3)
+
+    def test_parallel_matches_serial(self):
+        serial = FileProcessorService.extract_pdf_pages(self.pdf, workers=1)
+        with patch('tools.file_processor_service.PDF_PARALLEL_MIN_PAGES', 1):
+            parallel = FileProcessorService.extract_pdf_pages(self.pdf, workers=2, pages_per_task=2)
+
+        self.assertEqual([page.number for page in parallel], list(range(1, 8)))
+        self.assertEqual([page.text for page in parallel], [page.text for page in serial])
+        self.assertTrue(all(page.seconds >= 0 for page in parallel))
+
+    def test_broken_pool_is_replaced(self):
+        class BrokenPool:
+            shut_down = False
+
+            def submit(self, *args, **kwargs):
+                raise BrokenProcessPool("a worker died")
+
+            def shutdown(self, wait=True, cancel_futures=False):
+                self.shut_down = True
+
+        broken = BrokenPool()
+        with patch('tools.file_processor_service.PDF_PARALLEL_MIN_PAGES', 1), \
+                patch('tools.file_processor_service._pool', broken):
+            pages = FileProcessorService.extract_pdf_pages(self.pdf, workers=2, pages_per_task=4)
+            replacement = file_processor_service._pool
+        replacement.shutdown()
+
+        self.assertTrue(broken.shut_down)
+        self.assertIsNot(replacement, broken)
+        self.assertEqual([page.number for page in pages], list(range(1, 8)))
+
+    def test_process_file_joins_pages_in_order(self):
+        file = FileStorage(stream=io.BytesIO(self.pdf), filename="notes.pdf")
+        text = FileProcessorService.process_file(file)
+        pages = FileProcessorService.extract_pdf_pages(self.pdf, workers=1)
+        self.assertEqual(text, "\n".join(page.text for page in pages).strip())
+
+    def test_invalid_pdf(self):
+        file = FileStorage(stream=io.BytesIO(b"not a pdf"), filename="notes.pdf")
+        with self.assertRaises(ValueError):
+            FileProcessorService.process_file(file)
+
+
+if __name__ == '__main__':
+    unittest.main()
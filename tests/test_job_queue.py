@@ -0,0 +1,132 @@
+import unittest
+import os
+import sys
+from datetime import datetime, timedelta
+from flask import Flask
+
+# The EEP modules import each other relative to the eep/ directory
+eep_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'eep')
+if eep_root not in sys.path:
+    sys.path.insert(0, eep_root)
+
+from database.database import db
+from model.job import IngestionJob
+from tools.job_queue import InMemoryJobQueue, JobQueue, SqlJobQueue, create_job_queue
+from tools.ingestion_workers import _run
+
+
+class JobQueueContract:
+    """Checks shared by every queue backend."""
+
+    def test_submit_and_claim(self):
+        job_id = self.queue.submit("alice", "notes.pdf", "uploads/x-notes.pdf", "parsable", "ab" * 32)
+        self.assertEqual(self.queue.get(job_id)["status"], "queued")
+        self.assertEqual(self.queue.get(job_id)["content_hash"], "ab" * 32)
+
+        job = self.queue.claim(timeout=0)
+        self.assertEqual(job["id"], job_id)
+        self.assertEqual(job["status"], "running")
+        self.assertEqual(job["owner_username"], "alice")
+        self.assertIsNone(self.queue.claim(timeout=0))
+
+    def test_claim_is_fifo(self):
+        first = self.queue.submit("alice", "a.pdf", "uploads/a.pdf", "parsable")
+        second = self.queue.submit("bob", "b.pdf", "uploads/b.pdf", "non_parsable")
+        self.assertEqual(self.queue.claim(timeout=0)["id"], first)
+        self.assertEqual(self.queue.claim(timeout=0)["id"], second)
+
+    def test_run_records_success_and_progress(self):
+        job_id = self.queue.submit("alice", "notes.pdf", "uploads/x-notes.pdf", "parsable")
+        job = self.queue.claim(timeout=0)
+
+        def handler(job, report):
+            report("embedding", 3, 10)
+            self.assertEqual(self.queue.get(job["id"])["progress_done"], 3)
+            return 42
+
+        _run(self.queue, handler, job)
+        job = self.queue.get(job_id)
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["doc_id"], 42)
+
+    def test_run_records_failure(self):
+        job_id = self.queue.submit("alice", "notes.pdf", "uploads/x-notes.pdf", "parsable")
+
+        def handler(job, report):
+            raise ValueError("no text")
+
+        _run(self.queue, handler, self.queue.claim(timeout=0))
+        job = self.queue.get(job_id)
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["error"], "no text")
+
+
+class TestInMemoryJobQueue(JobQueueContract, unittest.TestCase):
+
+    def setUp(self):
+        self.queue = InMemoryJobQueue()
+
+
+    def test_finished_jobs_are_evicted(self):
+        clock = [0.0]
+        self.queue = InMemoryJobQueue(finished_ttl=60, max_finished=2, clock=lambda: clock[0])
+        jobs = [self.queue.submit("alice", f"{n}.pdf", f"uploads/{n}.pdf", "parsable") for n in range(3)]
+        for job_id in jobs:
+            self.queue.claim(timeout=0)
+            self.queue.update(job_id, status="done")
+
+        # Past max_finished, the oldest finished job goes first
+        self.assertIsNone(self.queue.get(jobs[0]))
+        self.assertEqual(self.queue.get(jobs[2])["status"], "done")
+
+        running = self.queue.submit("bob", "b.pdf", "uploads/b.pdf", "parsable")
+        clock[0] = 61
+        self.assertIsNone(self.queue.get(jobs[2]))
+        # Unfinished jobs are kept
+        self.assertEqual(self.queue.get(running)["status"], "queued")
+
+
+class TestSqlJobQueue(JobQueueContract, unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.queue = SqlJobQueue()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_abandoned_jobs_are_queued_again(self):
+        job_id = self.queue.submit("alice", "notes.pdf", "uploads/x-notes.pdf", "parsable")
+        # Claimed by a worker that died an hour ago
+        IngestionJob.query.filter_by(id=job_id).update(
+            {"status": "running", "updated_at": datetime.utcnow() - timedelta(hours=1)})
+        db.session.commit()
+
+        job = self.queue.claim(timeout=0)
+        self.assertEqual(job["id"], job_id)
+        self.assertEqual(job["status"], "running")
+
+        # A job whose lease is current stays with its worker
+        self.assertIsNone(self.queue.claim(timeout=0))
+
+
+class TestCreateJobQueue(unittest.TestCase):
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_job_queue("redis")
+
+    def test_backends_implement_the_interface(self):
+        with self.assertRaises(TypeError):
+            JobQueue()
+
+
+if __name__ == '__main__':
+    unittest.main()
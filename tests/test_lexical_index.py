@@ -0,0 +1,69 @@
+import unittest
+import os
+import sys
+from flask import Flask
+
+eep_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'eep')
+if eep_root not in sys.path:
+    sys.path.insert(0, eep_root)
+
+from database.database import db
+from model.lexical import LexicalChunk, LexicalPosting
+from tools import lexical_index
+
+
+class TestLexicalIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_tokenize_keeps_compounds_and_parts(self):
+        self.assertEqual(lexical_index.tokenize("CS-101: E=mc^2"),
+                         ["cs-101", "cs", "101", "e=mc^2", "e", "mc", "2"])
+
+    def test_search_ranks_exact_terms_per_user(self):
+        lexical_index.index_document("alice", 1, [
+            "Photosynthesis converts light into chemical energy.",
+            "The course EECE-503N covers machine learning operations.",
+        ])
+        lexical_index.index_document("alice", 2, ["Machine learning needs data and energy."])
+        lexical_index.index_document("bob", 3, ["EECE-503N project notes."])
+        db.session.commit()
+
+        results = lexical_index.search("alice", "eece-503n")
+
+        self.assertEqual([chunk for chunk, _ in results], ["doc-1-1"])
+        top = lexical_index.search("alice", "machine learning energy")
+        self.assertEqual(top[0][0], "doc-2-0")
+        self.assertEqual(lexical_index.search("alice", "?!"), [])
+
+    def test_remove_document(self):
+        lexical_index.index_document("alice", 1, ["alpha beta"])
+        lexical_index.index_document("alice", 2, ["alpha gamma"])
+        db.session.commit()
+
+        lexical_index.remove_document(1)
+        db.session.commit()
+
+        self.assertEqual([chunk for chunk, _ in lexical_index.search("alice", "alpha")], ["doc-2-0"])
+        self.assertEqual(LexicalChunk.query.filter_by(doc_id=1).count(), 0)
+        self.assertEqual(LexicalPosting.query.filter_by(doc_id=1).count(), 0)
+
+    def test_reciprocal_rank_fusion(self):
+        fused = lexical_index.reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]], k=60)
+        self.assertEqual([item for item, _ in fused], ["c", "a", "b", "d"])
+        self.assertAlmostEqual(fused[0][1], 1 / 63 + 1 / 61)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import os
+import sys
+from flask import Flask
+from sqlalchemy import inspect, text
+
+eep_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'eep')
+if eep_root not in sys.path:
+    sys.path.insert(0, eep_root)
+
+from database.database import db
+from database.migrations import add_missing_columns
+from model.doc import Doc
+
+
+class TestAddMissingColumns(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_adds_new_nullable_columns_to_existing_table(self):
+        # The document table as created before content hashes were recorded
+        with db.engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE document (id INTEGER PRIMARY KEY, owner_username VARCHAR(150) NOT NULL, title VARCHAR(255) NOT NULL)"
+            ))
+            connection.execute(text("INSERT INTO document (owner_username, title) VALUES ('alice', 'notes.pdf')"))
+        db.create_all()
+
+        add_missing_columns(db)
+
+        columns = {column["name"] for column in inspect(db.engine).get_columns("document")}
+        self.assertIn("content_hash", columns)
+        doc = Doc.query.filter_by(owner_username="alice").first()
+        self.assertIsNone(doc.content_hash)
+
+        # Running it again is a no-op
+        add_missing_columns(db)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+eep_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'eep')
+if eep_root not in sys.path:
+    sys.path.insert(0, eep_root)
+
+from database.numpy_store import NumpyVectorStore
+
+
+class TestNumpyVectorStore(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = NumpyVectorStore(self.path)
+        self.collection = self.store.get_or_create_collection(name="alice")
+        self.collection.add(
+            ids=["doc-1-0", "doc-1-1", "doc-2-0"],
+            embeddings=[[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]],
+            documents=["first", "second", "third"],
+            metadatas=[{"original_doc": 1}, {"original_doc": 1}, {"original_doc": 2}],
+        )
+
+    def test_query_returns_nearest_with_squared_l2(self):
+        results = self.collection.query(query_embeddings=[[0.0, 0.9, 0.1]], n_results=2,
+                                        include=["documents", "metadatas", "distances"])
+
+        self.assertEqual(results["ids"], [["doc-1-1", "doc-2-0"]])
+        self.assertEqual(results["documents"][0][0], "second")
+        self.assertEqual(results["metadatas"][0][0], {"original_doc": 1})
+        self.assertAlmostEqual(results["distances"][0][0], 0.02, places=5)
+
+    def test_query_with_where(self):
+        results = self.collection.query(query_embeddings=[[0.0, 0.0, 1.0]], n_results=5,
+                                        where={"original_doc": {"$ne": 2}})
+        self.assertEqual(sorted(results["ids"][0]), ["doc-1-0", "doc-1-1"])
+
+    def test_get_by_ids_and_where(self):
+        by_doc = self.collection.get(where={"original_doc": 1}, include=["documents", "embeddings"])
+        self.assertEqual(by_doc["ids"], ["doc-1-0", "doc-1-1"])
+        np.testing.assert_array_equal(by_doc["embeddings"][1], [0.0, 1.0, 0.0])
+
+        by_id = self.collection.get(ids=["doc-2-0"])
+        self.assertEqual(by_id["documents"], ["third"])
+
+    def test_delete_compacts_and_survives_reopen(self):
+        self.collection.delete(where={"original_doc": 1})
+        self.assertEqual(self.collection.count(), 1)
+
+        reopened = NumpyVectorStore(self.path).get_or_create_collection(name="alice")
+        results = reopened.query(query_embeddings=[[1.0, 0.0, 0.0]], n_results=3)
+        self.assertEqual(results["ids"], [["doc-2-0"]])
+        np.testing.assert_array_equal(reopened.get(ids=["doc-2-0"], include=["embeddings"])["embeddings"][0],
+                                      [0.0, 0.0, 1.0])
+
+    def test_rejects_other_dimensions_and_duplicate_ids(self):
+        with self.assertRaises(ValueError):
+            self.collection.query(query_embeddings=[[1.0, 0.0]], n_results=1)
+        with self.assertRaises(ValueError):
+            self.collection.add(ids=["doc-2-0"], embeddings=[[1.0, 1.0, 1.0]])
+
+    def test_float16_storage(self):
+        collection = NumpyVectorStore(tempfile.mkdtemp(), dtype="float16").get_or_create_collection(name="bob")
+        collection.add(ids=["a", "b"], embeddings=[[0.6, 0.8], [0.8, 0.6]])
+        results = collection.query(query_embeddings=[[0.8, 0.6]], n_results=1)
+        self.assertEqual(results["ids"], [["b"]])
+
+
+    def test_int8_quantization_with_rescoring(self):
+        # Deterministic "random" data (numpy.random cannot be imported next to eep/secrets.py)
+        vectors = np.sin(np.arange(200 * 64).reshape(200, 64) * 0.7311).astype(np.float32)
+        queries = vectors[:20] + 0.05 * np.cos(np.arange(20 * 64).reshape(20, 64) * 1.37).astype(np.float32)
+        ids = [f"doc-0-{i}" for i in range(len(vectors))]
+
+        int8 = NumpyVectorStore(tempfile.mkdtemp(), dtype="int8").get_or_create_collection(name="q")
+        rescored = NumpyVectorStore(tempfile.mkdtemp(), dtype="int8", rescore=True).get_or_create_collection(name="q")
+        for collection in (int8, rescored):
+            collection.add(ids=ids, embeddings=vectors)
+
+        # Dequantized vectors stay within half a quantization step per component
+        stored = int8.get(ids=ids[:5], include=["embeddings"])["embeddings"]
+        steps = np.abs(vectors[:5]).max(axis=1, keepdims=True) / 127
+        self.assertTrue(np.all(np.abs(stored - vectors[:5]) <= steps / 2 + 1e-6))
+        self.assertLess(int8.storage_bytes(), vectors.nbytes / 3)
+
+        results = rescored.query(query_embeddings=queries, n_results=3)
+        self.assertEqual([row[0] for row in results["ids"]], ids[:20])
+        # Rescored distances are exact
+        expected = float(np.sum((vectors[0] - queries[0]) ** 2))
+        self.assertAlmostEqual(results["distances"][0][0], expected, places=3)
+        np.testing.assert_array_equal(rescored.get(ids=[ids[0]], include=["embeddings"])["embeddings"][0], vectors[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
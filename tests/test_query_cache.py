@@ -0,0 +1,110 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+eep_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'eep')
+if eep_root not in sys.path:
+    sys.path.insert(0, eep_root)
+
+from tools.query_cache import TTLCache, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_hits_until_ttl_expires(self):
+        clock = FakeClock()
+        cache = TTLCache(max_entries=10, ttl=60, clock=clock)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return [0.1, 0.2]
+
+        self.assertEqual(cache.get_or_compute("q", compute), [0.1, 0.2])
+        clock.now = 59
+        cache.get_or_compute("q", compute)
+        self.assertEqual(len(calls), 1)
+
+        clock.now = 61
+        cache.get_or_compute("q", compute)
+        self.assertEqual(len(calls), 2)
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(max_entries=2, ttl=60)
+        cache.get_or_compute("a", lambda: 1)
+        cache.get_or_compute("b", lambda: 2)
+        cache.get_or_compute("a", lambda: 1)  # "b" is now the oldest
+        cache.get_or_compute("c", lambda: 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get_or_compute("a", lambda: "recomputed"), 1)
+        self.assertEqual(cache.get_or_compute("b", lambda: "recomputed"), "recomputed")
+
+    def test_concurrent_misses_share_one_computation(self):
+        cache = TTLCache(max_entries=10, ttl=60)
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return "embedding"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("q", compute)))
+                   for _ in range(5)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["embedding"] * 5)
+
+    def test_stuck_computation_is_not_waited_on_forever(self):
+        cache = TTLCache(max_entries=10, ttl=60, wait_timeout=0.05)
+        started, release = threading.Event(), threading.Event()
+
+        def stuck():
+            started.set()
+            release.wait(5)
+            return "late"
+
+        leader = threading.Thread(target=cache.get_or_compute, args=("q", stuck))
+        leader.start()
+        started.wait()
+        try:
+            self.assertEqual(cache.get_or_compute("q", lambda: "own"), "own")
+        finally:
+            release.set()
+            leader.join()
+
+    def test_failures_are_not_cached(self):
+        cache = TTLCache(max_entries=10, ttl=60)
+
+        def fail():
+            raise RuntimeError("IEP down")
+
+        with self.assertRaises(RuntimeError):
+            cache.get_or_compute("q", fail)
+        self.assertEqual(cache.get_or_compute("q", lambda: "ok"), "ok")
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query("  what is\n\tBM25 "), "what is BM25")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import base64
+import unittest
+import os
+import sys
+import threading
+from io import BytesIO
+from unittest.mock import patch
+from PIL import Image, ImageDraw
+
+eep_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'eep')
+if eep_root not in sys.path:
+    sys.path.insert(0, eep_root)
+
+from tools.rasterizer import iter_pdf_pages, page_ranges, encode_image, choose_detail, VisionProfile
+
+
+class TestRasterizer(unittest.TestCase):
+
+    def test_page_ranges(self):
+        self.assertEqual(page_ranges(range(1, 6), 2), [(1, 2), (3, 4), (5, 5)])
+        self.assertEqual(page_ranges([], 2), [])
+        self.assertEqual(page_ranges([7, 2, 3, 4, 9], 5), [(2, 4), (7, 7), (9, 9)])
+
+    @patch('tools.rasterizer.encode_image', side_effect=lambda img, profile: img.info["page"])
+    @patch('tools.rasterizer.pdfinfo_from_path', return_value={"Pages": 23})
+    @patch('tools.rasterizer.convert_from_path')
+    def test_yields_pages_in_order_within_window(self, mock_convert, mock_info, mock_encode):
+        lock = threading.Lock()
+        in_flight = {"now": 0, "max": 0}
+
+        def render(file_path, dpi, first_page, last_page, **kwargs):
+            pages = []
+            for number in range(first_page, last_page + 1):
+                img = Image.new("RGB", (1, 1))
+                img.info["page"] = number
+                pages.append(img)
+            with lock:
+                in_flight["now"] += len(pages)
+                in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            return pages
+
+        mock_convert.side_effect = render
+
+        pages = []
+        for page in iter_pdf_pages("doc.pdf", dpi=72, workers=3, pages_per_task=2, window=6):
+            with lock:
+                in_flight["now"] -= 1
+            pages.append(page)
+
+        self.assertEqual(pages, list(range(1, 24)))
+        # 3 tasks of 2 pages ahead of the consumer, plus the task being consumed
+        self.assertLessEqual(in_flight["max"], 8)
+
+    @patch('tools.rasterizer.encode_image', side_effect=lambda img, profile: img.info["page"])
+    @patch('tools.rasterizer.convert_from_path')
+    def test_renders_only_selected_pages(self, mock_convert, mock_encode):
+        def render(file_path, dpi, first_page, last_page, **kwargs):
+            pages = [Image.new("RGB", (1, 1)) for _ in range(first_page, last_page + 1)]
+            for number, img in zip(range(first_page, last_page + 1), pages):
+                img.info["page"] = number
+            return pages
+
+        mock_convert.side_effect = render
+        pages = list(iter_pdf_pages("doc.pdf", pages=[2, 3, 8], workers=2, pages_per_task=4))
+        self.assertEqual(pages, [2, 3, 8])
+
+    @patch('tools.rasterizer.pdfinfo_from_path', return_value={"Pages": 4})
+    @patch('tools.rasterizer.convert_from_path', side_effect=RuntimeError("pdftoppm failed"))
+    def test_render_errors_propagate(self, mock_convert, mock_info):
+        with self.assertRaises(RuntimeError):
+            list(iter_pdf_pages("doc.pdf", workers=2, pages_per_task=1, window=2))
+
+
+    def test_encode_image_applies_profile(self):
+        img = Image.new("RGB", (3000, 1500), "white")
+        profile = VisionProfile(long_edge=1000, jpeg_quality=60, grayscale=True, detail="low")
+
+        page = encode_image(img, profile)
+
+        with Image.open(BytesIO(base64.b64decode(page.data))) as decoded:
+            self.assertEqual(decoded.size, (1000, 500))
+            self.assertEqual(decoded.mode, "L")
+        self.assertEqual(page.detail, "low")
+
+    def test_choose_detail_by_ink(self):
+        blank = Image.new("RGB", (800, 1000), "white")
+        dense = Image.new("RGB", (800, 1000), "white")
+        draw = ImageDraw.Draw(dense)
+        for y in range(0, 1000, 20):
+            draw.rectangle((50, y, 750, y + 8), fill="black")
+
+        self.assertEqual(choose_detail(blank), "low")
+        self.assertEqual(choose_detail(dense), "high")
+        profile = VisionProfile(long_edge=None, jpeg_quality=75, grayscale=False, detail="auto")
+        self.assertEqual(encode_image(dense, profile).detail, "high")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+from flask import Flask, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
+
+eep_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'eep')
+if eep_root not in sys.path:
+    sys.path.insert(0, eep_root)
+
+from tools.upload_spool import UploadSpool, SpoolingRequest, spool_stream, take_upload
+
+
+class TestUploadSpool(unittest.TestCase):
+
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+
+    def test_hashes_while_writing_and_removes_on_close(self):
+        spool = UploadSpool("notes.pdf", spool_dir=self.spool_dir, max_bytes=100)
+        spool.write(b"hello ")
+        spool.write(b"world")
+        spool.seek(0)
+
+        self.assertEqual(spool.read(), b"hello world")
+        self.assertEqual(spool.sha256, hashlib.sha256(b"hello world").hexdigest())
+        self.assertTrue(spool.path.endswith("-notes.pdf"))
+
+        spool.close()
+        self.assertFalse(os.path.exists(spool.path))
+
+    def test_detached_file_survives_close(self):
+        path, content_hash = spool_stream(io.BytesIO(b"%PDF-1.4"), "a.pdf", spool_dir=self.spool_dir)
+
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(content_hash, hashlib.sha256(b"%PDF-1.4").hexdigest())
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"%PDF-1.4")
+
+    def test_oversized_upload_is_refused_and_removed(self):
+        spool = UploadSpool("big.pdf", spool_dir=self.spool_dir, max_bytes=10)
+        spool.write(b"x" * 10)
+        with self.assertRaises(RequestEntityTooLarge):
+            spool.write(b"x")
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    def test_same_filename_gets_unique_spools(self):
+        first = UploadSpool("same.pdf", spool_dir=self.spool_dir)
+        second = UploadSpool("same.pdf", spool_dir=self.spool_dir)
+        self.assertNotEqual(first.path, second.path)
+        first.close()
+        second.close()
+
+
+class TestSpoolingRequest(unittest.TestCase):
+
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        self.app.request_class = type("TestSpoolingRequest", (SpoolingRequest,), {
+            "spool_dir": self.spool_dir,
+            "max_upload_bytes": 1024,
+        })
+
+        @self.app.route("/upload", methods=["POST"])
+        def upload():
+            file = request.files["file"]
+            if request.form.get("keep"):
+                path, content_hash = take_upload(file)
+                return jsonify({"path": path, "hash": content_hash})
+            return jsonify({"path": file.stream.path})
+
+        self.client = self.app.test_client()
+
+    def post(self, content, keep):
+        data = {"file": (io.BytesIO(content), "doc.pdf")}
+        if keep:
+            data["keep"] = "1"
+        return self.client.post("/upload", data=data, content_type="multipart/form-data")
+
+    def test_upload_is_spooled_without_copy(self):
+        response = self.post(b"%PDF-1.4 content", keep=True)
+
+        body = response.get_json()
+        self.assertEqual(os.path.dirname(body["path"]), self.spool_dir)
+        self.assertEqual(body["hash"], hashlib.sha256(b"%PDF-1.4 content").hexdigest())
+        self.assertTrue(os.path.exists(body["path"]))
+
+    def test_spool_removed_when_request_ends(self):
+        response = self.post(b"%PDF-1.4 content", keep=False)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    def test_oversized_upload_returns_413(self):
+        response = self.post(b"x" * 1500, keep=False)
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import httpx
+from chromadb.api.client import Client
+from chromadb.api.fastapi import FastAPI
+
+eep_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'eep')
+if eep_root not in sys.path:
+    sys.path.insert(0, eep_root)
+
+import database.vectordb as vectordb
+from database.vectordb import CollectionCache, CHROMA_LATENCY
+
+
+class TestCollectionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.get_or_create_collection.side_effect = lambda name: MagicMock(name=f"collection-{name}")
+        self.cache = CollectionCache(lambda: self.client, max_size=2)
+
+    def test_reuses_handles(self):
+        first = self.cache.get("alice")
+        second = self.cache.get("alice")
+
+        self.assertIs(first, second)
+        self.client.get_or_create_collection.assert_called_once_with(name="alice")
+
+    def test_evicts_least_recently_used(self):
+        self.cache.get("alice")
+        self.cache.get("bob")
+        self.cache.get("alice")
+        self.cache.get("carol")  # evicts bob
+
+        self.cache.get("alice")
+        self.cache.get("bob")
+        self.assertEqual(
+            [call.kwargs["name"] for call in self.client.get_or_create_collection.call_args_list],
+            ["alice", "bob", "carol", "bob"],
+        )
+
+    def test_operations_are_timed_and_failures_drop_the_handle(self):
+        handle = self.cache.get("alice")
+        before = CHROMA_LATENCY.labels(operation="query")._sum.get()
+
+        handle.query(query_embeddings=[[0.1]], n_results=1)
+        handle._collection.query.assert_called_once_with(query_embeddings=[[0.1]], n_results=1)
+        self.assertGreater(CHROMA_LATENCY.labels(operation="query")._sum.get(), before)
+
+        handle._collection.delete.side_effect = RuntimeError("Collection does not exist")
+        with self.assertRaises(RuntimeError):
+            handle.delete(ids=["doc-1-0"])
+        self.assertIsNot(self.cache.get("alice"), handle)
+
+
+class TestChromaHttpClient(unittest.TestCase):
+
+    def test_requests_use_the_configured_timeouts(self):
+        # Fails when a chromadb upgrade moves the HTTP session the EEP replaces
+        with patch.object(vectordb, "LOCAL", "false"), patch.object(vectordb, "VECTOR_STORE", "chroma"), \
+                patch.object(Client, "get_user_identity"), patch.object(Client, "_validate_tenant_database"):
+            client = vectordb._create_client()
+
+        self.assertIsInstance(client._server, FastAPI)
+        session = client._server._session
+        self.assertEqual(session.timeout, httpx.Timeout(vectordb.CHROMA_TIMEOUT, connect=vectordb.CHROMA_CONNECT_TIMEOUT))
+        session.close()
+
+
+if __name__ == '__main__':
+    unittest.main()